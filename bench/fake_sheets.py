@@ -0,0 +1,214 @@
+"""
+Stand-in HTTP local da Google Sheets API v4 (só o que o pipeline usa), com a planilha em memória:
+
+    GET  /v4/spreadsheets/{id}                         (metadados: abas)
+    POST /v4/spreadsheets/{id}:batchUpdate             (formatação; aceita e ignora)
+    GET  /v4/spreadsheets/{id}/values/{range}
+    GET  /v4/spreadsheets/{id}/values:batchGet?ranges=...  (valueRenderOption=UNFORMATTED_VALUE suportado)
+    PUT  /v4/spreadsheets/{id}/values/{range}          (values.update)
+    POST /v4/spreadsheets/{id}/values:batchUpdate
+    POST /v4/spreadsheets/{id}/values/{range}:append
+
+Conta requests e bytes por endpoint em `servidor.stats`.
+
+    srv = iniciar_fake_sheets(tab="BET7K", linhas_existentes=365)
+    service = sheets_service_local(srv)   # client googleapiclient apontando para o stand-in
+"""
+import json
+import re
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+RE_A1 = re.compile(r"^(?:'?(?P<tab>[^'!]+)'?!)?(?P<c1>[A-Z]+)(?P<r1>\d*)(?::(?P<c2>[A-Z]+)(?P<r2>\d*))?$")
+
+
+def col_idx(letras: str) -> int:
+    n = 0
+    for ch in letras:
+        n = n * 26 + (ord(ch) - 64)
+    return n - 1
+
+
+def parse_a1(rng: str):
+    m = RE_A1.match(rng)
+    if not m:
+        raise ValueError(f"range inválido: {rng}")
+    c1 = col_idx(m.group("c1"))
+    c2 = col_idx(m.group("c2")) if m.group("c2") else c1
+    r1 = int(m.group("r1")) if m.group("r1") else 1
+    r2 = int(m.group("r2")) if m.group("r2") else None
+    return m.group("tab"), c1, r1, c2, r2
+
+
+def formatar(v, col: int, row: int):
+    """Emula FORMATTED_VALUE: serial de data na coluna A (fora do cabeçalho) volta como dd/mm/yyyy."""
+    if col == 0 and row > 1 and isinstance(v, (int, float)) and not isinstance(v, bool):
+        return (datetime(1899, 12, 30) + timedelta(days=int(v))).strftime("%d/%m/%Y")
+    return v
+
+
+class Planilha:
+    """Grade em memória: {aba: [[...linha 1...], [...linha 2...], ...]}"""
+
+    def __init__(self):
+        self.abas: dict[str, list[list]] = {}
+        self.lock = threading.Lock()
+
+    def ler(self, rng: str, formatado: bool = True) -> dict:
+        tab, c1, r1, c2, r2 = parse_a1(rng)
+        grid = self.abas.setdefault(tab, [])
+        r2 = r2 or len(grid)
+        values = []
+        for r in range(r1, r2 + 1):
+            row = grid[r - 1] if r - 1 < len(grid) else []
+            if formatado:
+                values.append([formatar(v, c, r) for c, v in enumerate(row[c1:c2 + 1], start=c1)])
+            else:
+                values.append(list(row[c1:c2 + 1]))
+        while values and not any(v not in ("", None) for v in values[-1]):
+            values.pop()
+        return {"range": rng, "majorDimension": "ROWS", "values": values}
+
+    def escrever(self, rng: str, values: list[list]) -> dict:
+        tab, c1, r1, _, _ = parse_a1(rng)
+        grid = self.abas.setdefault(tab, [])
+        for i, row in enumerate(values):
+            r = r1 - 1 + i
+            while len(grid) <= r:
+                grid.append([])
+            linha = grid[r]
+            while len(linha) < c1 + len(row):
+                linha.append("")
+            linha[c1:c1 + len(row)] = row
+        return {"updatedRange": rng, "updatedRows": len(values)}
+
+    def apendar(self, rng: str, values: list[list]) -> dict:
+        tab, _, _, _, _ = parse_a1(rng)
+        grid = self.abas.setdefault(tab, [])
+        while grid and not any(v not in ("", None) for v in grid[-1]):
+            grid.pop()
+        first = len(grid) + 1
+        self.escrever(f"'{tab}'!A{first}", values)
+        last = first + len(values) - 1
+        return {"updates": {"updatedRange": f"'{tab}'!A{first}:H{last}", "updatedRows": len(values)}}
+
+
+class FakeSheetsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _json(self, obj, status=200):
+        data = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        return len(data)
+
+    def _body(self) -> dict:
+        n = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(n) if n else b""
+        self._bytes_in = len(raw)
+        return json.loads(raw or b"{}")
+
+    def _contar(self, endpoint: str, bytes_out: int):
+        with self.server.planilha.lock:
+            st = self.server.stats.setdefault(endpoint, {"requests": 0, "bytes_in": 0, "bytes_out": 0})
+            st["requests"] += 1
+            st["bytes_in"] += getattr(self, "_bytes_in", 0)
+            st["bytes_out"] += bytes_out
+
+    def _responder(self, endpoint: str, obj):
+        # conta antes de responder: o cliente pode ler as estatísticas assim que recebe a resposta
+        self._contar(endpoint, len(json.dumps(obj).encode("utf-8")))
+        self._json(obj)
+
+    def _rota(self, method: str):
+        url = urlparse(self.path)
+        path = unquote(url.path)
+        qs = parse_qs(url.query)
+        pl = self.server.planilha
+
+        m = re.match(r"^/v4/spreadsheets/([^/:]+)(.*)$", path)
+        if not m:
+            return self._json({"error": "not found"}, 404)
+        resto = m.group(2)
+
+        if method == "GET" and resto == "":
+            abas = [{"properties": {"sheetId": i, "title": t}} for i, t in enumerate(pl.abas)]
+            return self._responder("get", {"sheets": abas})
+        if method == "POST" and resto == ":batchUpdate":
+            body = self._body()
+            return self._responder("batchUpdate", {"replies": [{} for _ in body.get("requests", [])]})
+        if method == "GET" and resto == "/values:batchGet":
+            with pl.lock:
+                formatado = qs.get("valueRenderOption", ["FORMATTED_VALUE"])[0] == "FORMATTED_VALUE"
+                vrs = [pl.ler(r, formatado) for r in qs.get("ranges", [])]
+            return self._responder("values.batchGet", {"valueRanges": vrs})
+        if method == "POST" and resto == "/values:batchUpdate":
+            body = self._body()
+            with pl.lock:
+                for d in body.get("data", []):
+                    pl.escrever(d["range"], d["values"])
+            return self._responder("values.batchUpdate", {"totalUpdatedRows": len(body.get("data", []))})
+        if method == "POST" and resto.startswith("/values/") and resto.endswith(":append"):
+            body = self._body()
+            with pl.lock:
+                out = pl.apendar(resto[len("/values/"):-len(":append")], body.get("values", []))
+            return self._responder("values.append", out)
+        if method == "PUT" and resto.startswith("/values/"):
+            body = self._body()
+            with pl.lock:
+                out = pl.escrever(resto[len("/values/"):], body.get("values", []))
+            return self._responder("values.update", out)
+        if method == "GET" and resto.startswith("/values/"):
+            with pl.lock:
+                out = pl.ler(resto[len("/values/"):])
+            return self._responder("values.get", out)
+        return self._json({"error": f"rota não suportada: {method} {resto}"}, 404)
+
+    def do_GET(self):
+        self._rota("GET")
+
+    def do_POST(self):
+        self._rota("POST")
+
+    def do_PUT(self):
+        self._rota("PUT")
+
+
+def popular(planilha: Planilha, tab: str, colunas: list[str], linhas: int, inicio: datetime = datetime(2025, 1, 1)):
+    """Header + `linhas` dias já existentes (Time como serial, lido formatado como DD/MM/YYYY)."""
+    grid = [list(colunas)]
+    base = (inicio - datetime(1899, 12, 30)).days
+    for i in range(linhas):
+        grid.append([base + i] + [0] * (len(colunas) - 1))
+    planilha.abas[tab] = grid
+
+
+def iniciar_fake_sheets(tab: str = "BET7K", colunas: list[str] | None = None, linhas_existentes: int = 0,
+                        porta: int = 0) -> ThreadingHTTPServer:
+    srv = ThreadingHTTPServer(("127.0.0.1", porta), FakeSheetsHandler)
+    srv.planilha = Planilha()
+    srv.stats = {}
+    popular(srv.planilha, tab, colunas or ["Time"], linhas_existentes)
+    srv.base_url = f"http://127.0.0.1:{srv.server_address[1]}/"
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def sheets_service_local(srv):
+    """Client googleapiclient (discovery estático) apontando para o stand-in, sem credencial real."""
+    from google.auth.credentials import AnonymousCredentials
+    from googleapiclient.discovery import build
+
+    return build(
+        "sheets", "v4",
+        credentials=AnonymousCredentials(),
+        client_options={"api_endpoint": srv.base_url},
+        cache_discovery=False,
+        static_discovery=True,
+    )
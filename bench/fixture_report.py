@@ -0,0 +1,241 @@
+"""
+Stand-in local do app.7k.partners para benchmark: login, menu Report, datepicker no markup do
+Element UI (el-date-editor / el-picker-panel / el-year-table / el-month-table / el-date-table)
+e o grid div.my_table / div.table_row preenchido por XHR em /api/report.
+
+    servidor = iniciar_fixture(linhas=1000)   # http://127.0.0.1:<porta>/
+    ...
+    servidor.linhas = 10000                   # muda o tamanho do report sem reiniciar
+    servidor.layout = "virtual"               # e o layout do grid (vale a partir do próximo /pt/report)
+    servidor.shutdown()
+
+Layouts do grid (LAYOUTS):
+- "simples":  todas as linhas no DOM;
+- "virtual":  lista virtualizada (container rolável dentro do my_table, só as linhas visíveis no DOM);
+- "paginado": `por_pagina` linhas por página, com .el-pagination ("Total N" + botão próxima);
+- "pagina_rolavel": todas as linhas no DOM, mas a página inteira rola dentro de um wrapper
+  (overflow: auto fora do my_table): não pode ser confundida com lista virtualizada.
+"""
+import json
+import random
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+LOGIN_HTML = """<!doctype html><html><body>
+<form onsubmit="return false">
+  <input type="email" name="email">
+  <input type="password" name="password">
+  <button type="button" onclick="location.href='/pt/dashboard'">Login</button>
+</form>
+</body></html>"""
+
+DASHBOARD_HTML = """<!doctype html><html><body>
+<nav><a href="/pt/report">Report</a></nav>
+</body></html>"""
+
+REPORT_HTML = """<!doctype html><html><head><style>
+.el-picker-panel { display: none; border: 1px solid #ccc; }
+.el-picker-panel[actualvisible='true'] { display: block; }
+.hidden { display: none; }
+.table_row { display: flex; } .table_row > div { width: 120px; }
+.corpo { height: 300px; overflow-y: auto; position: relative; }
+.corpo .table_row { position: absolute; left: 0; height: 24px; }
+.wrapper { height: 100vh; overflow-y: auto; }
+.btn-next[disabled] { opacity: .5; }
+</style></head><body>
+<div class="wrapper">
+<div class="filters">
+  <div class="el-date-editor el-date-editor--date"><input class="el-input__inner" placeholder="Start date"></div>
+  <div class="el-date-editor el-date-editor--date"><input class="el-input__inner" placeholder="End date"></div>
+  <button type="button" id="group">Group</button>
+</div>
+<div class="el-picker-panel el-date-picker" actualvisible="false">
+  <div class="el-date-picker__header">
+    <span class="el-date-picker__header-label" id="lbl-year"></span>
+    <span class="el-date-picker__header-label" id="lbl-month"></span>
+  </div>
+  <table class="el-year-table hidden"><tbody></tbody></table>
+  <table class="el-month-table hidden"><tbody></tbody></table>
+  <table class="el-date-table"><tbody></tbody></table>
+</div>
+<div class="my_table"></div>
+<div class="el-pagination hidden">
+  <span class="el-pagination__total"></span>
+  <ul class="el-pager"></ul>
+  <button type="button" class="btn-next">›</button>
+</div>
+</div>
+<script>
+const LAYOUT = "__LAYOUT__", POR_PAGINA = __POR_PAGINA__;
+if (LAYOUT !== 'pagina_rolavel') document.querySelector('.wrapper').className = '';
+const MESES = ["Janeiro","Fevereiro","Março","Abril","Maio","Junho","Julho","Agosto","Setembro","Outubro","Novembro","Dezembro"];
+const panel = document.querySelector('.el-picker-panel');
+const yearT = panel.querySelector('.el-year-table'), monthT = panel.querySelector('.el-month-table'), dateT = panel.querySelector('.el-date-table');
+let alvo = null, ano = 2026, mes = 0;
+const pad = (n) => String(n).padStart(2, '0');
+const show = (t) => { [yearT, monthT, dateT].forEach((x) => x.classList.toggle('hidden', x !== t)); };
+const fechar = () => panel.setAttribute('actualvisible', 'false');
+
+function renderDias() {
+  document.getElementById('lbl-year').innerText = ano;
+  document.getElementById('lbl-month').innerText = MESES[mes];
+  const n = new Date(ano, mes + 1, 0).getDate();
+  let html = '<tr>';
+  for (let d = 1; d <= n; d++) {
+    html += `<td class="available"><div><span class="el-date-table-cell__text">${d}</span></div></td>`;
+    if (d % 7 === 0) html += '</tr><tr>';
+  }
+  dateT.querySelector('tbody').innerHTML = html + '</tr>';
+  show(dateT);
+}
+document.querySelectorAll('.el-date-editor').forEach((ed) => {
+  const inp = ed.querySelector('input');
+  inp.addEventListener('click', () => { alvo = inp; panel.setAttribute('actualvisible', 'true'); renderDias(); });
+  inp.addEventListener('keydown', (e) => { if (e.key === 'Enter') fechar(); });
+});
+document.addEventListener('keydown', (e) => { if (e.key === 'Escape') fechar(); });
+document.getElementById('lbl-year').addEventListener('click', () => {
+  let html = '<tr>';
+  for (let y = ano - 5; y <= ano + 4; y++) html += `<td><a class="cell">${y}</a></td>`;
+  yearT.querySelector('tbody').innerHTML = html + '</tr>';
+  show(yearT);
+});
+yearT.addEventListener('click', (e) => {
+  const td = e.target.closest('td'); if (!td) return;
+  ano = parseInt(td.innerText, 10);
+  monthT.querySelector('tbody').innerHTML = '<tr>' + MESES.map((m) => `<td aria-label="${m}"><a class="cell">${m.slice(0, 3)}</a></td>`).join('') + '</tr>';
+  show(monthT);
+});
+document.getElementById('lbl-month').addEventListener('click', () => yearT.dispatchEvent(new MouseEvent('click')));
+monthT.addEventListener('click', (e) => {
+  const td = e.target.closest('td'); if (!td) return;
+  mes = MESES.indexOf(td.getAttribute('aria-label'));
+  renderDias();
+});
+dateT.addEventListener('click', (e) => {
+  const span = e.target.closest('td') && e.target.closest('td').querySelector('.el-date-table-cell__text');
+  if (!span || !alvo) return;
+  alvo.value = `${pad(span.innerText)}/${pad(mes + 1)}/${ano}`;
+  fechar();
+});
+
+const COLS = ["Time","Registrations","FTDs","QFTDs, CPA","FTDs Amount","Deposits Amount","RevShare","CPA"];
+const fmtInt = (n) => n.toLocaleString('en-US');
+const fmtMoney = (n) => '$' + n.toLocaleString('en-US', {minimumFractionDigits: 2, maximumFractionDigits: 2});
+const ALTURA = 24, OVERSCAN = 5;
+const tabela = document.querySelector('.my_table'), pag = document.querySelector('.el-pagination');
+const row = (cells, top) => `<div class="table_row"${top === undefined ? '' : ` style="top:${top}px"`}>`
+  + cells.map((c) => `<div>${c}</div>`).join('') + '</div>';
+let linhas = [], pagina = 0;
+
+// lista virtualizada: só as linhas da janela visível (+ overscan) existem no DOM
+function renderVirtual() {
+  const corpo = tabela.querySelector('.corpo');
+  const ini = Math.max(0, Math.floor(corpo.scrollTop / ALTURA) - OVERSCAN);
+  const fim = Math.min(linhas.length, Math.ceil((corpo.scrollTop + corpo.clientHeight) / ALTURA) + OVERSCAN);
+  let html = '';
+  for (let i = ini; i < fim; i++) html += row(linhas[i], i * ALTURA);
+  corpo.querySelector('.lista').innerHTML = html;
+}
+
+function renderPagina() {
+  const paginas = Math.max(1, Math.ceil(linhas.length / POR_PAGINA));
+  const fatia = linhas.slice(pagina * POR_PAGINA, (pagina + 1) * POR_PAGINA);
+  if (pagina === paginas - 1) fatia.push(['Totals', '', '', '', '', '', '', '']);
+  tabela.innerHTML = row(COLS) + fatia.map((c) => row(c)).join('');
+  pag.querySelector('.el-pagination__total').innerText = `Total ${linhas.length}`;
+  pag.querySelector('.el-pager').innerHTML = Array.from({length: paginas}, (_, i) =>
+    `<li class="number${i === pagina ? ' active' : ''}">${i + 1}</li>`).join('');
+  pag.querySelector('.btn-next').disabled = pagina >= paginas - 1;
+}
+pag.querySelector('.btn-next').addEventListener('click', () => { pagina++; renderPagina(); });
+
+document.getElementById('group').addEventListener('click', async () => {
+  const [ini, fim] = Array.from(document.querySelectorAll('.el-date-editor input')).map((i) => i.value);
+  const resp = await fetch(`/api/report?start=${encodeURIComponent(ini)}&end=${encodeURIComponent(fim)}`);
+  const payload = await resp.json();
+  linhas = payload.data.map((r) => [r.time, fmtInt(r.registrations), fmtInt(r.ftds), fmtInt(r.qftds_cpa),
+    fmtMoney(r.ftds_amount), fmtMoney(r.deposits_amount), fmtMoney(r.revshare), fmtMoney(r.cpa)]);
+
+  if (LAYOUT === 'paginado') {
+    pagina = 0;
+    pag.classList.remove('hidden');
+    return renderPagina();
+  }
+  if (LAYOUT === 'virtual') {
+    linhas.push(['Totals', '', '', '', '', '', '', '']);
+    tabela.innerHTML = row(COLS) + `<div class="corpo"><div class="lista" style="height:${linhas.length * ALTURA}px"></div></div>`;
+    tabela.querySelector('.corpo').addEventListener('scroll', renderVirtual);
+    return renderVirtual();
+  }
+  tabela.innerHTML = row(COLS) + linhas.map((c) => row(c)).join('') + row(['Totals', '', '', '', '', '', '', '']);
+});
+</script>
+</body></html>"""
+
+
+def gerar_linhas(inicio: datetime, n: int, seed: int = 7) -> list[dict]:
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        out.append({
+            "time": (inicio + timedelta(days=i)).strftime("%Y-%m-%d"),
+            "registrations": rnd.randint(0, 5000),
+            "ftds": rnd.randint(0, 800),
+            "qftds_cpa": rnd.randint(0, 300),
+            "ftds_amount": round(rnd.uniform(0, 90000), 2),
+            "deposits_amount": round(rnd.uniform(0, 400000), 2),
+            "revshare": round(rnd.uniform(-5000, 20000), 2),
+            "cpa": round(rnd.uniform(0, 15000), 2),
+        })
+    return out
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body: str, ctype: str = "text/html; charset=utf-8"):
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path in ("/", "/login"):
+            return self._send(LOGIN_HTML)
+        if url.path == "/pt/dashboard":
+            return self._send(DASHBOARD_HTML)
+        if url.path == "/pt/report":
+            return self._send(REPORT_HTML.replace("__LAYOUT__", self.server.layout)
+                              .replace("__POR_PAGINA__", str(int(self.server.por_pagina))))
+        if url.path == "/api/report":
+            qs = parse_qs(url.query)
+            try:
+                inicio = datetime.strptime(qs.get("start", [""])[0], "%d/%m/%Y")
+            except ValueError:
+                inicio = datetime(2026, 1, 1)
+            payload = {"data": gerar_linhas(inicio, self.server.linhas)}
+            return self._send(json.dumps(payload), "application/json")
+        self.send_error(404)
+
+
+LAYOUTS = ("simples", "virtual", "paginado", "pagina_rolavel")
+
+
+def iniciar_fixture(linhas: int = 100, porta: int = 0, layout: str = "simples",
+                    por_pagina: int = 50) -> ThreadingHTTPServer:
+    if layout not in LAYOUTS:
+        raise ValueError(f"layout inválido: {layout} (use {', '.join(LAYOUTS)})")
+    srv = ThreadingHTTPServer(("127.0.0.1", porta), FixtureHandler)
+    srv.linhas = linhas
+    srv.layout = layout
+    srv.por_pagina = por_pagina
+    srv.base_url = f"http://127.0.0.1:{srv.server_address[1]}/"
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
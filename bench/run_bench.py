@@ -0,0 +1,299 @@
+"""
+Benchmark offline do pipeline (sem app.7k.partners e sem Google):
+
+- captura:      login + datepicker + Group + leitura do div.my_table no stand-in local (fixture_report)
+- normalizacao: normalizar_report vetorizado x caminho antigo (apply por célula)
+- upsert:       upsert_sheet_by_time contra o stand-in da Sheets API (fake_sheets), frio e com índice local
+- diagnostico:  custo do ring buffer (por evento) e da gravação dos eventos numa falha final
+
+Uso (na raiz do repo):
+    python -m bench.run_bench
+    python -m bench.run_bench --cenarios normalizacao,upsert --tamanhos 10,1000,10000
+    python -m bench.run_bench --comparar bench/resultados/bench_20260101_120000.json
+
+Cada execução grava bench/resultados/bench_<ts>.json; --comparar mostra a variação contra um arquivo anterior.
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import report_7k_partners as R
+from bench.fixture_report import LAYOUTS, gerar_linhas, iniciar_fixture
+from bench.fake_sheets import iniciar_fake_sheets, sheets_service_local
+
+RESULTADOS_DIR = os.path.join(os.path.dirname(__file__), "resultados")
+TAMANHOS_PADRAO = [10, 100, 1000, 10000]
+
+
+def cronometro(fn, repeticoes: int = 3):
+    """Melhor tempo (ms) de `repeticoes` execuções + o retorno da última."""
+    melhor = None
+    out = None
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        out = fn()
+        ms = (time.perf_counter() - t0) * 1000
+        melhor = ms if melhor is None else min(melhor, ms)
+    return round(melhor, 2), out
+
+
+def df_cru(n: int) -> pd.DataFrame:
+    """Lote como sai do DOM: tudo texto, no formato EN-US do site."""
+    rows = []
+    for r in gerar_linhas(datetime(2026, 1, 1), n):
+        rows.append({
+            "Time": r["time"],
+            "Registrations": f"{r['registrations']:,}",
+            "FTDs": f"{r['ftds']:,}",
+            "QFTDs, CPA": f"{r['qftds_cpa']:,}",
+            "FTDs Amount": f"${r['ftds_amount']:,.2f}",
+            "Deposits Amount": f"${r['deposits_amount']:,.2f}",
+            "RevShare": f"${r['revshare']:,.2f}",
+            "CPA": f"${r['cpa']:,.2f}",
+        })
+    return pd.DataFrame(rows)
+
+
+def normalizar_legado(df: pd.DataFrame) -> pd.DataFrame:
+    """Caminho antigo (célula a célula), só para referência no benchmark."""
+    df["Time"] = df["Time"].apply(R.to_datetime_br_or_iso).dt.normalize()
+    for c in R.COLUNAS_ALVO[1:]:
+        df[c] = pd.to_numeric(df[c].apply(R.parse_number), errors="coerce").fillna(0.0)
+    return df
+
+
+# ==============================
+# Cenários
+# ==============================
+
+def cenario_normalizacao(tamanhos: list[int]) -> list[dict]:
+    out = []
+    for n in tamanhos:
+        base = df_cru(n)
+        ms_vet, _ = cronometro(lambda: R.normalizar_report(base.copy()))
+        ms_leg, _ = cronometro(lambda: normalizar_legado(base.copy()))
+        out.append({"linhas": n, "vetorizado_ms": ms_vet, "legado_ms": ms_leg})
+        print(f"  normalizacao n={n}: vetorizado {ms_vet} ms | legado {ms_leg} ms")
+    return out
+
+
+def cenario_upsert(tamanhos: list[int], existentes: int = 365) -> list[dict]:
+    out = []
+    for n in tamanhos:
+        srv = iniciar_fake_sheets(R.SHEET_TAB, R.COLUNAS_ALVO, linhas_existentes=existentes)
+        tmp = tempfile.mkdtemp(prefix="bench_rowidx_")
+        antigos = (R._SHEETS_SERVICE, R.ROW_INDEX_DIR)
+        try:
+            R._SHEETS_SERVICE = sheets_service_local(srv)
+            R.ROW_INDEX_DIR = tmp
+            R.invalidate_sheet_ids()
+            # metade dos dias já existe na planilha (update), metade é nova (append)
+            df = R.normalizar_report(df_cru(n))
+            df["Time"] = pd.date_range(datetime(2025, 1, 1) + pd.Timedelta(days=existentes - n // 2), periods=n)
+
+            t0 = time.perf_counter()
+            R.upsert_sheet_by_time(df, R.SHEET_ID, R.SHEET_TAB)
+            frio_ms = round((time.perf_counter() - t0) * 1000, 2)
+            stats_frio = json.loads(json.dumps(srv.stats))
+            srv.stats.clear()
+
+            t0 = time.perf_counter()
+            R.upsert_sheet_by_time(df, R.SHEET_ID, R.SHEET_TAB)
+            quente_ms = round((time.perf_counter() - t0) * 1000, 2)
+            stats_quente = json.loads(json.dumps(srv.stats))
+        finally:
+            R._SHEETS_SERVICE, R.ROW_INDEX_DIR = antigos
+            R.invalidate_sheet_ids()
+            srv.shutdown()
+
+        req = lambda st: sum(v["requests"] for v in st.values())
+        out.append({
+            "linhas": n, "existentes": existentes,
+            "frio_ms": frio_ms, "quente_ms": quente_ms,
+            "requests_frio": req(stats_frio), "requests_quente": req(stats_quente),
+            "endpoints_frio": stats_frio, "endpoints_quente": stats_quente,
+        })
+        print(f"  upsert n={n}: frio {frio_ms} ms ({req(stats_frio)} req) | quente {quente_ms} ms ({req(stats_quente)} req)")
+    return out
+
+
+def cenario_diagnostico(tamanhos: list[int]) -> list[dict]:
+    out = []
+    antigos = (R.DIAGNOSTICO, R.DIAG_DIR)
+    R.DIAG_DIR = tempfile.mkdtemp(prefix="bench_diag_")
+    try:
+        for n in tamanhos:
+            def eventos():
+                for i in range(n):
+                    R.diag_evento("espera", passo="grid", ms=i, ok=True, sinal="my_table")
+
+            R.DIAGNOSTICO = False
+            ms_off, _ = cronometro(eventos)
+            R.DIAGNOSTICO = True
+            ms_on, _ = cronometro(eventos)
+            arquivos = R.diag_arquivos("bench")
+            no_buffer = len(R.DIAG_BUFFER)
+            ms_grava, _ = cronometro(lambda: R.diag_gravar_eventos(arquivos["eventos"], "bench", "erro"))
+            R.DIAG_BUFFER.clear()
+            R.metricas_execucao()
+            us = round((ms_on - ms_off) * 1000 / max(n, 1), 2)
+            out.append({"linhas": n, "eventos_ms": ms_on, "desligado_ms": ms_off, "por_evento_us": us,
+                        "no_buffer": no_buffer, "gravar_falha_ms": ms_grava})
+            print(f"  diagnostico n={n}: {ms_on} ms ligado x {ms_off} ms desligado ({us} µs/evento) | "
+                  f"falha final grava {no_buffer} evento(s) em {ms_grava} ms")
+    finally:
+        R.DIAGNOSTICO, R.DIAG_DIR = antigos
+    return out
+
+
+def cenario_captura(tamanhos: list[int]) -> list[dict]:
+    from playwright.sync_api import sync_playwright
+
+    srv = iniciar_fixture()
+    antigos = (R.BASE_URL, R.HOSTS_PERMITIDOS, R.EMAIL, R.SENHA, R.CAPTURA_REDE)
+    R.BASE_URL = srv.base_url
+    R.HOSTS_PERMITIDOS = ["127.0.0.1"]
+    R.EMAIL, R.SENHA = "bench@local", "bench"
+    out = []
+    try:
+        with sync_playwright() as p:
+            browser, context, page = R.abrir_navegador(p)
+            t0 = time.perf_counter()
+            R.fazer_login(page)
+            R.goto_report(page)
+            login_ms = round((time.perf_counter() - t0) * 1000, 2)
+            R.metricas_execucao()
+
+            # layout do grid: a captura por rede só se aplica ao "simples" (nos outros o que muda é o DOM)
+            for layout in LAYOUTS:
+                srv.layout = layout
+                R.goto_report(page)
+                modos = (("dom", False), ("rede", True)) if layout == "simples" else (("dom", False),)
+                for n in tamanhos:
+                    srv.linhas = n
+                    for modo, rede in modos:
+                        R.CAPTURA_REDE = rede
+                        t0 = time.perf_counter()
+                        df = R.capturar_periodo(page, "01/01/2026", "01/01/2026")
+                        ms = round((time.perf_counter() - t0) * 1000, 2)
+                        m = R.metricas_execucao()
+                        c = m["contadores"]
+                        out.append({
+                            "layout": layout, "linhas": n, "modo": modo, "ms": ms, "linhas_lidas": int(len(df)),
+                            "playwright_rt": c.get("playwright.rt", 0),
+                            "rolagens": c.get("my_table.rolagens", 0), "paginas": c.get("my_table.paginas", 0),
+                            "spans": m["spans"], "login_ms": login_ms,
+                        })
+                        print(f"  captura {layout} n={n} {modo}: {ms} ms, {len(df)} linha(s), "
+                              f"{c.get('playwright.rt', 0)} round trips")
+                        if len(df) != n:
+                            print(f"  ⚠️ {layout}: li {len(df)} de {n} linha(s)")
+            R.resumo_esperas()
+            R.resumo_rede()
+            context.close()
+            browser.close()
+    finally:
+        R.BASE_URL, R.HOSTS_PERMITIDOS, R.EMAIL, R.SENHA, R.CAPTURA_REDE = antigos
+        srv.shutdown()
+    return out
+
+
+CENARIOS = {
+    "captura": cenario_captura,
+    "normalizacao": cenario_normalizacao,
+    "upsert": cenario_upsert,
+    "diagnostico": cenario_diagnostico,
+}
+
+
+# ==============================
+# Resultados
+# ==============================
+
+def salvar(resultado: dict) -> str:
+    os.makedirs(RESULTADOS_DIR, exist_ok=True)
+    path = os.path.join(RESULTADOS_DIR, f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def comparar(atual: dict, anterior_path: str):
+    with open(anterior_path, "r", encoding="utf-8") as f:
+        anterior = json.load(f)
+
+    def chave(item):
+        return (item.get("linhas"), item.get("modo"))
+
+    print(f"\n📊 Comparação com {anterior_path}:")
+    for cen, itens in atual["cenarios"].items():
+        antes = {chave(i): i for i in anterior.get("cenarios", {}).get(cen, [])}
+        for item in itens:
+            ref = antes.get(chave(item))
+            if not ref:
+                continue
+            for k, v in item.items():
+                if k.endswith("_ms") or k == "ms":
+                    old = ref.get(k)
+                    if isinstance(old, (int, float)) and old:
+                        print(f"  {cen} {chave(item)} {k}: {old} -> {v} ms ({(v - old) / old * 100:+.1f}%)")
+
+
+def isolar_arquivos(tmp: str):
+    """
+    Tudo que o pipeline grava vai para `tmp`: as linhas das fixtures não podem cair no histórico de
+    produção (o reprocessar_7k.py as mandaria para o Sheets), nem nas médias de rede ou nas métricas.
+    """
+    R.JSON_DIR = tmp
+    R.JSON_LATEST = os.path.join(tmp, "latest.json")
+    R.HISTORY_DB = os.path.join(tmp, "historico.sqlite3")
+    R.ROW_INDEX_DIR = os.path.join(tmp, "row_index")
+    R.SESSAO_FILE = os.path.join(tmp, "sessao_7k.json")
+    R.REDE_MEDIAS = os.path.join(tmp, "rede_medias.json")
+    R.METRICAS_JSONL = R.METRICAS_PROM = ""
+
+
+def executar(args, tamanhos: list[int]) -> dict:
+    resultado = {
+        "ts": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "tamanhos": tamanhos,
+        "cenarios": {},
+    }
+    for nome in [c.strip() for c in args.cenarios.split(",") if c.strip()]:
+        print(f"\n▶️ Cenário: {nome}")
+        resultado["cenarios"][nome] = CENARIOS[nome](tamanhos)
+    return resultado
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark offline do report 7k.")
+    ap.add_argument("--cenarios", default=",".join(CENARIOS), help="lista separada por vírgula")
+    ap.add_argument("--tamanhos", default=",".join(map(str, TAMANHOS_PADRAO)))
+    ap.add_argument("--comparar", default=None, help="arquivo de resultado anterior")
+    args = ap.parse_args(argv)
+
+    tamanhos = [int(x) for x in args.tamanhos.split(",") if x.strip()]
+    # stand-ins locais não têm quota: sem limite de taxa, mede só o pipeline
+    R.LIMITES.update({k: R.TokenBucket(k, 0) for k in R.LIMITES})
+    # e sempre mede o login completo (não lê nem grava a sessão salva do usuário)
+    R.REUSAR_SESSAO = False
+    with tempfile.TemporaryDirectory(prefix="bench_7k_") as tmp:
+        isolar_arquivos(tmp)
+        resultado = executar(args, tamanhos)
+
+    path = salvar(resultado)
+    print(f"\n🧾 Resultado salvo: {path}")
+    if args.comparar:
+        comparar(resultado, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Daemon do report 7k: mantém um navegador logado e roda capturas agendadas sem pagar
+start do Python / launch do Chromium / login a cada captura.
+
+Agenda padrão:
+- hoje: a cada INTERVALO_HOJE_MIN minutos
+- ontem: uma vez por dia, a partir de HORA_ONTEM (depois do site assentar o dia)
+
+Jobs entram numa fila deduplicada por período: se "hoje" ainda está pendente, não entra de novo.
+Login só é refeito quando a sessão expira (e a sessão salva em R.SESSAO_FILE é reaproveitada no start).
+
+Uso:
+    python daemon_7k.py
+"""
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import os
+
+from playwright.sync_api import sync_playwright
+
+import report_7k_partners as R
+
+INTERVALO_HOJE_MIN = int(os.getenv("INTERVALO_HOJE_MIN", "15"))
+HORA_ONTEM = os.getenv("HORA_ONTEM", "06:00")  # HH:MM
+TICK_SEGUNDOS = 5
+
+
+# ==============================
+# 📥 Fila de jobs (dedup por período)
+# ==============================
+
+class FilaJobs:
+    """Fila FIFO de (inicio, fim) em DD/MM/YYYY; o mesmo período não entra duas vezes enquanto pendente."""
+
+    def __init__(self):
+        self._jobs: OrderedDict[tuple[str, str], str] = OrderedDict()
+
+    def put(self, inicio: str, fim: str, motivo: str = "") -> bool:
+        key = (inicio, fim)
+        if key in self._jobs:
+            return False
+        self._jobs[key] = motivo
+        return True
+
+    def get(self) -> tuple[str, str, str] | None:
+        if not self._jobs:
+            return None
+        (inicio, fim), motivo = self._jobs.popitem(last=False)
+        return inicio, fim, motivo
+
+    def __len__(self):
+        return len(self._jobs)
+
+
+# ==============================
+# ⏰ Agenda
+# ==============================
+
+class Agenda:
+    def __init__(self, intervalo_hoje_min: int = INTERVALO_HOJE_MIN, hora_ontem: str = HORA_ONTEM):
+        self.intervalo = timedelta(minutes=intervalo_hoje_min)
+        self.hora_ontem = datetime.strptime(hora_ontem, "%H:%M").time()
+        self.proximo_hoje = datetime.now()
+        self.ontem_feito_em = None  # data (date) em que o job de "ontem" já foi enfileirado
+
+    def enfileirar_vencidos(self, fila: FilaJobs, agora: datetime | None = None):
+        agora = agora or datetime.now()
+
+        if agora >= self.proximo_hoje:
+            hoje = agora.strftime("%d/%m/%Y")
+            fila.put(hoje, hoje, "hoje")
+            self.proximo_hoje = agora + self.intervalo
+
+        if agora.time() >= self.hora_ontem and self.ontem_feito_em != agora.date():
+            ontem = (agora - timedelta(days=1)).strftime("%d/%m/%Y")
+            fila.put(ontem, ontem, "ontem")
+            self.ontem_feito_em = agora.date()
+
+
+# ==============================
+# 🔐 Sessão
+# ==============================
+
+def garantir_sessao(page):
+    if R.sessao_expirada(page):
+        print("🔐 Sessão expirada, refazendo login...")
+        R.fazer_login(page)
+        R.goto_report(page)
+
+
+# ==============================
+# ▶️ Loop
+# ==============================
+
+def executar_job(page, writer: R.SheetsUpsertBuffer, inicio: str, fim: str):
+    garantir_sessao(page)
+    df, sem_dados, completo = None, [], False
+    antes = dict(writer.totais)
+    try:
+        df = R.capturar_periodo(page, inicio, fim)
+        if df is None or df.empty:
+            print(f"⚠️ Sem dados em {inicio} -> {fim}.")
+        else:
+            writer.add(df)
+            writer.flush()
+        # captura completa: dia pedido sem linha vai para sem_dados (não volta como pendente)
+        capturados = {r["Time"] for r in R.linhas_historico(df)}
+        sem_dados = R.dias_sem_linha(R.parse_ddmmyyyy(inicio), R.parse_ddmmyyyy(fim), capturados)
+        completo = True
+    finally:
+        # fim de job sempre passa aqui (com ou sem linhas): zera esperas/rede/métricas para o próximo job
+        # o writer é da vida do daemon: stats do job = o que os totais andaram (flushes automáticas inclusive)
+        stats = {k: v - antes[k] for k, v in writer.totais.items()}
+        R.dump_json_history(df, meta={
+            "start": inicio,
+            "end": fim,
+            "url": page.url,
+            "ts": datetime.now().isoformat(),
+            "rows": 0 if df is None else int(len(df)),
+            "origem": "daemon",
+            "sheets": stats,
+            "sem_dados": sem_dados,
+            "parcial": not completo,
+            "esperas": R.resumo_esperas(),
+            "rede": R.resumo_rede(),
+        })
+    return df
+
+
+def main():
+    if not R.EMAIL or not R.SENHA:
+        raise RuntimeError("EMAIL/SENHA não definidos.")
+
+    fila = FilaJobs()
+    agenda = Agenda()
+    writer = R.SheetsUpsertBuffer(R.SHEET_ID, R.SHEET_TAB)
+
+    with sync_playwright() as p:
+        browser, context, page = R.abrir_navegador(p)
+        R.fazer_login(page)
+        R.goto_report(page)
+        print(f"🟢 Daemon no ar: hoje a cada {INTERVALO_HOJE_MIN} min, ontem a partir de {HORA_ONTEM}.")
+
+        try:
+            while True:
+                agenda.enfileirar_vencidos(fila)
+
+                job = fila.get()
+                if job is None:
+                    time.sleep(TICK_SEGUNDOS)
+                    continue
+
+                inicio, fim, motivo = job
+                print(f"\n=== [{datetime.now():%H:%M:%S}] Job {motivo}: {inicio} -> {fim} ({len(fila)} na fila) ===")
+                try:
+                    executar_job(page, writer, inicio, fim)
+                except Exception as e:
+                    print(f"❌ Erro no job {inicio} -> {fim}: {e}")
+                    # tenta recuperar a página (e a sessão) e reenfileira uma vez
+                    try:
+                        page.keyboard.press("Escape")
+                        if R.sessao_expirada(page):
+                            garantir_sessao(page)
+                        else:
+                            R.goto_report(page)
+                    except Exception:
+                        pass
+                    if not motivo.endswith("(retry)"):
+                        fila.put(inicio, fim, f"{motivo} (retry)")
+        except KeyboardInterrupt:
+            print("\n🛑 Daemon interrompido.")
+        finally:
+            try:
+                writer.close()
+            except Exception as e:
+                print(f"❌ Erro no flush final: {e}")
+            context.close()
+            browser.close()
+
+
+if __name__ == "__main__":
+    main()
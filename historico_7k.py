@@ -0,0 +1,330 @@
+"""
+Histórico local do report 7k em SQLite (substitui os report_<ts>.json com indent=2).
+
+- runs: uma linha por execução (ts + meta).
+- valores: uma linha por (Time, revisão). Recaptura com os mesmos números só estende last_seen;
+  número diferente vira nova revisão. "Último valor por dia" é uma consulta indexada.
+- sem_dados: dias pedidos ao report que vieram sem linha (o site não mostra dia zerado), com
+  last_seen: contam como capturados para o assentamento (dias_pendentes) até aparecer uma linha.
+- brutos: texto cru das células de cada captura (antes da normalização), com o período pedido.
+  Permite reprocessar (reprocessar_7k.py) sem abrir o navegador quando uma regra de parse muda.
+
+Uso:
+    python historico_7k.py importar [JSON_DIR]   # importa report_*.json antigos
+    python historico_7k.py compactar [--manter N] # junta revisões repetidas, poda e faz VACUUM
+    python historico_7k.py latest [INICIO FIM]    # último valor por dia (YYYY-MM-DD)
+    python historico_7k.py brutos [INICIO FIM]    # capturas brutas arquivadas no período
+"""
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+JSON_DIR = os.getenv("JSON_DIR", "history_7k")
+HISTORY_DB = os.getenv("HISTORY_DB", os.path.join(JSON_DIR, "historico.sqlite3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    captured_at TEXT NOT NULL,
+    meta        TEXT
+);
+CREATE TABLE IF NOT EXISTS valores (
+    time        TEXT NOT NULL,      -- YYYY-MM-DD
+    rev         INTEGER NOT NULL,   -- 1, 2, ... (maior = mais recente)
+    dados       TEXT NOT NULL,      -- JSON da linha (colunas do report)
+    first_seen  TEXT NOT NULL,
+    last_seen   TEXT NOT NULL,
+    run_id      INTEGER,
+    PRIMARY KEY (time, rev)
+);
+CREATE TABLE IF NOT EXISTS sem_dados (
+    time        TEXT PRIMARY KEY,   -- YYYY-MM-DD
+    first_seen  TEXT NOT NULL,
+    last_seen   TEXT NOT NULL,
+    run_id      INTEGER
+);
+CREATE TABLE IF NOT EXISTS brutos (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    captured_at TEXT NOT NULL,
+    inicio      TEXT NOT NULL,      -- período pedido (YYYY-MM-DD)
+    fim         TEXT NOT NULL,
+    origem      TEXT,               -- dom | rede
+    colunas     TEXT NOT NULL,      -- JSON: nomes das colunas
+    linhas      TEXT NOT NULL       -- JSON: [[texto da célula, ...], ...]
+);
+CREATE INDEX IF NOT EXISTS idx_brutos_periodo ON brutos (inicio, fim);
+"""
+
+
+def abrir(path: str = HISTORY_DB) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def vazio(conn: sqlite3.Connection) -> bool:
+    return conn.execute("SELECT 1 FROM runs LIMIT 1").fetchone() is None
+
+
+def _dados_json(row: dict) -> str:
+    return json.dumps({k: v for k, v in row.items() if k != "Time"}, ensure_ascii=False, sort_keys=True)
+
+
+def abrir_run(conn: sqlite3.Connection, meta: dict, captured_at: str | None = None) -> int:
+    """Registra uma execução (a meta pode ser completada no fim com atualizar_run)."""
+    with conn:
+        cur = conn.execute(
+            "INSERT INTO runs (captured_at, meta) VALUES (?, ?)",
+            (captured_at or meta.get("ts") or datetime.now().isoformat(),
+             json.dumps(meta, ensure_ascii=False, default=str)),
+        )
+    return cur.lastrowid
+
+
+def atualizar_run(conn: sqlite3.Connection, run_id: int, meta: dict):
+    with conn:
+        conn.execute("UPDATE runs SET meta = ? WHERE id = ?", (json.dumps(meta, ensure_ascii=False, default=str), run_id))
+
+
+def _gravar_valores(conn: sqlite3.Connection, rows: list[dict], captured_at: str, run_id: int | None,
+                    captured_at_por_dia: dict[str, str] | None = None) -> dict:
+    stats = {"novos": 0, "revisados": 0, "iguais": 0}
+    for row in rows:
+        key = row.get("Time")
+        if not key:
+            continue
+        dados = _dados_json(row)
+        # reprocessamento: o dia vale como capturado quando o bruto foi capturado, não agora
+        ts = (captured_at_por_dia or {}).get(key, captured_at)
+
+        last = conn.execute(
+            "SELECT rev, dados, last_seen FROM valores WHERE time = ? ORDER BY rev DESC LIMIT 1", (key,)
+        ).fetchone()
+
+        if last is not None and last[1] == dados:
+            conn.execute(
+                "UPDATE valores SET last_seen = MAX(last_seen, ?) WHERE time = ? AND rev = ?",
+                (ts, key, last[0]),
+            )
+            stats["iguais"] += 1
+            continue
+
+        rev = 1 if last is None else last[0] + 1
+        conn.execute(
+            "INSERT INTO valores (time, rev, dados, first_seen, last_seen, run_id) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, rev, dados, ts, ts, run_id),
+        )
+        stats["novos" if last is None else "revisados"] += 1
+        if last is None:
+            conn.execute("DELETE FROM sem_dados WHERE time = ?", (key,))
+    return stats
+
+
+def _gravar_sem_dados(conn: sqlite3.Connection, dias: list[str], captured_at: str, run_id: int | None) -> int:
+    n = 0
+    for key in dias:
+        if conn.execute("SELECT 1 FROM valores WHERE time = ? LIMIT 1", (key,)).fetchone():
+            continue
+        conn.execute(
+            """INSERT INTO sem_dados (time, first_seen, last_seen, run_id) VALUES (?, ?, ?, ?)
+               ON CONFLICT(time) DO UPDATE SET last_seen = MAX(last_seen, excluded.last_seen),
+                                               run_id = excluded.run_id""",
+            (key, captured_at, captured_at, run_id),
+        )
+        n += 1
+    return n
+
+
+def gravar_sem_dados(conn: sqlite3.Connection, dias: list[str], captured_at: str, run_id: int | None = None) -> int:
+    """Marca dias (YYYY-MM-DD) capturados sem linha no report. Dia que já tem valor é ignorado."""
+    with conn:
+        return _gravar_sem_dados(conn, dias, captured_at, run_id)
+
+
+def gravar_valores(conn: sqlite3.Connection, rows: list[dict], captured_at: str, run_id: int | None = None) -> dict:
+    """Grava um lote de dias numa execução já aberta (captura em streaming: um lote por vez)."""
+    with conn:
+        return _gravar_valores(conn, rows, captured_at, run_id)
+
+
+def gravar_lote(conn: sqlite3.Connection, rows: list[dict], meta: dict, captured_at: str | None = None,
+                captured_at_por_dia: dict[str, str] | None = None) -> dict:
+    """
+    Grava uma execução. rows: [{"Time": "YYYY-MM-DD", ...}]. Devolve contagem de dias novos/revisados/iguais.
+    meta["sem_dados"] (YYYY-MM-DD), se houver, é marcado em sem_dados na mesma transação.
+    captured_at_por_dia: captura original de cada dia (reprocessamento), no lugar de captured_at no last_seen.
+    """
+    captured_at = captured_at or meta.get("ts") or datetime.now().isoformat()
+
+    with conn:
+        cur = conn.execute(
+            "INSERT INTO runs (captured_at, meta) VALUES (?, ?)",
+            (captured_at, json.dumps(meta, ensure_ascii=False, default=str)),
+        )
+        stats = _gravar_valores(conn, rows, captured_at, cur.lastrowid, captured_at_por_dia)
+        _gravar_sem_dados(conn, meta.get("sem_dados") or [], captured_at, cur.lastrowid)
+    return stats
+
+
+def gravar_bruto(conn: sqlite3.Connection, colunas: list[str], linhas: list[list[str]], inicio: str, fim: str,
+                 origem: str = "dom", captured_at: str | None = None) -> int:
+    """Arquiva o texto cru de uma captura (ou de um lote dela). inicio/fim em YYYY-MM-DD."""
+    with conn:
+        cur = conn.execute(
+            "INSERT INTO brutos (captured_at, inicio, fim, origem, colunas, linhas) VALUES (?, ?, ?, ?, ?, ?)",
+            (captured_at or datetime.now().isoformat(), inicio, fim, origem,
+             json.dumps(colunas, ensure_ascii=False), json.dumps(linhas, ensure_ascii=False, separators=(",", ":"))),
+        )
+    return cur.lastrowid
+
+
+def brutos_no_periodo(conn: sqlite3.Connection, inicio: str | None = None, fim: str | None = None) -> list[dict]:
+    """Capturas brutas cujo período cruza [inicio, fim] (YYYY-MM-DD), da mais antiga para a mais recente."""
+    sql = """
+        SELECT id, captured_at, inicio, fim, origem, colunas, linhas
+        FROM brutos
+        WHERE (? IS NULL OR fim >= ?) AND (? IS NULL OR inicio <= ?)
+        ORDER BY captured_at, id
+    """
+    return [
+        {"id": i, "captured_at": c, "inicio": ini, "fim": f, "origem": o,
+         "colunas": json.loads(cols), "linhas": json.loads(linhas)}
+        for i, c, ini, f, o, cols, linhas in conn.execute(sql, (inicio, inicio, fim, fim))
+    ]
+
+
+def latest_por_dia(conn: sqlite3.Connection, inicio: str | None = None, fim: str | None = None) -> list[dict]:
+    """Último valor de cada dia (YYYY-MM-DD) no intervalo, com rev e last_seen."""
+    sql = """
+        SELECT v.time, v.rev, v.dados, v.last_seen
+        FROM valores v
+        JOIN (SELECT time, MAX(rev) AS rev FROM valores GROUP BY time) m
+          ON m.time = v.time AND m.rev = v.rev
+        WHERE (? IS NULL OR v.time >= ?) AND (? IS NULL OR v.time <= ?)
+        ORDER BY v.time
+    """
+    out = []
+    for time_, rev, dados, last_seen in conn.execute(sql, (inicio, inicio, fim, fim)):
+        out.append({"Time": time_, **json.loads(dados), "_rev": rev, "_last_seen": last_seen})
+    return out
+
+
+def ultima_captura_por_dia(conn: sqlite3.Connection) -> dict[str, str]:
+    """{ 'YYYY-MM-DD': last_seen ISO } considerando todas as revisões e os dias capturados sem linha."""
+    return dict(conn.execute(
+        """SELECT time, MAX(last_seen) FROM
+           (SELECT time, last_seen FROM valores UNION ALL SELECT time, last_seen FROM sem_dados)
+           GROUP BY time"""
+    ))
+
+
+def importar_json(conn: sqlite3.Connection, json_dir: str = JSON_DIR) -> dict:
+    """Importa os report_*.json antigos em ordem cronológica (pela meta.ts)."""
+    payloads = []
+    for name in os.listdir(json_dir) if os.path.isdir(json_dir) else []:
+        if not (name.startswith("report_") and name.endswith(".json")):
+            continue
+        try:
+            with open(os.path.join(json_dir, name), "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            ts = payload.get("meta", {}).get("ts")
+            datetime.fromisoformat(ts)
+        except Exception:
+            print(f"⚠️ Ignorando {name} (JSON inválido ou sem meta.ts).")
+            continue
+        payloads.append((ts, payload))
+
+    total = {"arquivos": 0, "novos": 0, "revisados": 0, "iguais": 0}
+    for ts, payload in sorted(payloads, key=lambda x: x[0]):
+        stats = gravar_lote(conn, payload.get("rows", []), payload.get("meta", {}), captured_at=ts)
+        total["arquivos"] += 1
+        for k, v in stats.items():
+            total[k] += v
+    return total
+
+
+def compactar(conn: sqlite3.Connection, manter: int | None = None) -> dict:
+    """
+    Junta revisões consecutivas com os mesmos dados (ex.: vindas de importação), mantém só as
+    `manter` revisões mais recentes por dia (se informado), remove runs órfãos e faz VACUUM.
+    """
+    stats = {"juntadas": 0, "podadas": 0, "runs_removidos": 0}
+    with conn:
+        for (key,) in conn.execute("SELECT DISTINCT time FROM valores").fetchall():
+            revs = conn.execute(
+                "SELECT rev, dados, first_seen, last_seen FROM valores WHERE time = ? ORDER BY rev", (key,)
+            ).fetchall()
+            prev = None
+            for rev, dados, first_seen, last_seen in revs:
+                if prev is not None and prev[1] == dados:
+                    conn.execute(
+                        "UPDATE valores SET last_seen = MAX(last_seen, ?) WHERE time = ? AND rev = ?",
+                        (last_seen, key, prev[0]),
+                    )
+                    conn.execute("DELETE FROM valores WHERE time = ? AND rev = ?", (key, rev))
+                    stats["juntadas"] += 1
+                    continue
+                prev = (rev, dados)
+
+            if manter:
+                cur = conn.execute(
+                    """DELETE FROM valores WHERE time = ? AND rev NOT IN
+                       (SELECT rev FROM valores WHERE time = ? ORDER BY rev DESC LIMIT ?)""",
+                    (key, key, int(manter)),
+                )
+                stats["podadas"] += cur.rowcount
+
+        cur = conn.execute(
+            """DELETE FROM runs WHERE id NOT IN (SELECT run_id FROM valores WHERE run_id IS NOT NULL
+                                                UNION SELECT run_id FROM sem_dados WHERE run_id IS NOT NULL)"""
+        )
+        stats["runs_removidos"] = cur.rowcount
+
+    conn.execute("VACUUM")
+    return stats
+
+
+def main(argv=None):
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Histórico SQLite do report 7k.")
+    ap.add_argument("--db", default=HISTORY_DB)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_imp = sub.add_parser("importar", help="importa report_*.json antigos")
+    p_imp.add_argument("json_dir", nargs="?", default=JSON_DIR)
+
+    p_comp = sub.add_parser("compactar", help="junta revisões repetidas, poda e faz VACUUM")
+    p_comp.add_argument("--manter", type=int, default=None, help="revisões a manter por dia")
+
+    p_lat = sub.add_parser("latest", help="último valor por dia")
+    p_lat.add_argument("inicio", nargs="?", default=None)
+    p_lat.add_argument("fim", nargs="?", default=None)
+
+    p_bru = sub.add_parser("brutos", help="capturas brutas arquivadas")
+    p_bru.add_argument("inicio", nargs="?", default=None)
+    p_bru.add_argument("fim", nargs="?", default=None)
+
+    args = ap.parse_args(argv)
+    conn = abrir(args.db)
+    try:
+        if args.cmd == "importar":
+            print("✅ Importação:", importar_json(conn, args.json_dir))
+        elif args.cmd == "compactar":
+            print("✅ Compactação:", compactar(conn, args.manter))
+        elif args.cmd == "latest":
+            for row in latest_por_dia(conn, args.inicio, args.fim):
+                print(json.dumps(row, ensure_ascii=False))
+        elif args.cmd == "brutos":
+            for b in brutos_no_periodo(conn, args.inicio, args.fim):
+                print(f"{b['captured_at']}  {b['inicio']} -> {b['fim']}  {b['origem']}  {len(b['linhas'])} linha(s)")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
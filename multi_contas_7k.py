@@ -0,0 +1,238 @@
+"""
+Captura de várias contas parceiras (cada uma na sua aba) com um Chromium só.
+
+Cada conta roda num context isolado (cookies e sessão salva próprios), no máximo CONCORRENCIA
+contas ao mesmo tempo. Os lotes de todas as contas vão para um writer único (R.SheetsMultiUpsert),
+que grava todas as abas com requests combinados no mesmo client do Sheets.
+
+Spec (JSON):
+    {
+      "concorrencia": 3,
+      "jobs": [
+        {"conta": "parceiro_a", "email": "a@exemplo.com", "senha_env": "SENHA_PARCEIRO_A",
+         "aba": "BET7K_A", "inicio": "01/01/2026", "fim": "31/01/2026"},
+        {"conta": "parceiro_b", "email": "b@exemplo.com", "senha_env": "SENHA_PARCEIRO_B",
+         "aba": "BET7K_B", "inicio": "01/01/2026", "fim": "31/01/2026", "sheet_id": "..."}
+      ]
+    }
+
+- "senha_env" lê a senha de uma variável de ambiente ("senha" direto no JSON também funciona).
+- "sheet_id" é opcional (padrão: R.SHEET_ID).
+- Vários jobs da mesma conta reaproveitam o mesmo context/login.
+
+Uso:
+    python multi_contas_7k.py contas_7k.json [--concorrencia N]
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+from collections import OrderedDict
+from datetime import datetime
+
+from playwright.async_api import async_playwright
+
+import report_7k_partners as R
+import report_7k_async as RA
+
+CONCORRENCIA = int(os.getenv("MULTI_CONCORRENCIA", "3"))
+FILA_MAX = 8  # lotes esperando upload antes das contas pausarem
+
+
+# ==============================
+# 📋 Spec de jobs
+# ==============================
+
+def carregar_spec(path: str) -> tuple[list[dict], int]:
+    """Lê o JSON de jobs e resolve as senhas. Devolve (jobs, concorrencia)."""
+    with open(path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+
+    jobs = spec.get("jobs", spec) if isinstance(spec, dict) else spec
+    credenciais: dict[str, tuple[str, str]] = {}
+    for i, job in enumerate(jobs):
+        faltando = [k for k in ("conta", "email", "aba", "inicio", "fim") if not job.get(k)]
+        if faltando:
+            raise ValueError(f"Job {i} sem {', '.join(faltando)}: {job}")
+        if not job.get("senha"):
+            job["senha"] = os.getenv(job.get("senha_env", ""), "")
+        if not job["senha"]:
+            raise ValueError(f"Job {i} ({job['conta']}): senha não definida (senha/senha_env).")
+        # uma conta = um login (sessão e histórico são por conta): credenciais divergentes são erro de spec
+        cred = credenciais.setdefault(job["conta"], (job["email"], job["senha"]))
+        if cred != (job["email"], job["senha"]):
+            raise ValueError(f"Job {i} ({job['conta']}): email/senha diferentes dos outros jobs da mesma conta.")
+        job.setdefault("sheet_id", R.SHEET_ID)
+        R.parse_ddmmyyyy(job["inicio"])
+        R.parse_ddmmyyyy(job["fim"])
+
+    concorrencia = spec.get("concorrencia", CONCORRENCIA) if isinstance(spec, dict) else CONCORRENCIA
+    return jobs, int(concorrencia)
+
+
+def agrupar_por_conta(jobs: list[dict]) -> "OrderedDict[str, list[dict]]":
+    contas: OrderedDict[str, list[dict]] = OrderedDict()
+    for job in jobs:
+        contas.setdefault(job["conta"], []).append(job)
+    return contas
+
+
+def _slug(conta: str) -> str:
+    return re.sub(r"[^\w\-]", "_", conta)
+
+
+def sessao_da_conta(conta: str) -> str:
+    return os.path.join(R.JSON_DIR, f"sessao_7k_{_slug(conta)}.json")
+
+
+def historico_da_conta(conta: str) -> tuple[str, str]:
+    """(SQLite, latest.json) próprios da conta: o histórico é por dia, não dá para misturar contas."""
+    return (
+        os.path.join(R.JSON_DIR, f"historico_{_slug(conta)}.sqlite3"),
+        os.path.join(R.JSON_DIR, f"latest_{_slug(conta)}.json"),
+    )
+
+
+# ==============================
+# 🔀 Contas -> fila -> writer
+# ==============================
+
+async def rodar_conta(browser, conta: str, jobs: list[dict], sem: asyncio.Semaphore,
+                      fila: asyncio.Queue, sem_dados: list, falhas: list):
+    async with sem:
+        print(f"\n=== [{conta}] {len(jobs)} job(s) ===")
+        sessao_file = sessao_da_conta(conta)
+        context, page = await RA.abrir_contexto(browser, sessao_file)
+        try:
+            await RA.fazer_login(page, jobs[0]["email"], jobs[0]["senha"], sessao_file)
+            await RA.goto_report(page)
+
+            for job in jobs:
+                for ini, fim in R.planejar_janelas(job["inicio"], job["fim"]):
+                    inicio, fim = ini.strftime("%d/%m/%Y"), fim.strftime("%d/%m/%Y")
+                    print(f"=== [{conta}] {job['aba']}: {inicio} -> {fim} ===")
+                    n = 0
+                    capturados = set()
+                    try:
+                        async for df in RA.capturar_periodo_em_lotes(page, inicio, fim,
+                                                                     history_db=historico_da_conta(conta)[0]):
+                            if df is not None and not df.empty:
+                                capturados.update(df["Time"].dt.strftime("%Y-%m-%d"))
+                                await fila.put((job, df))
+                                n += len(df)
+                    except Exception as e:
+                        print(f"❌ [{conta}] Erro {inicio} -> {fim}: {e}")
+                        falhas.append(f"{conta}:{inicio}-{fim}")
+                        try:
+                            await page.keyboard.press("Escape")
+                            await RA.goto_report(page)
+                        except Exception:
+                            pass
+                        continue
+
+                    sem_dados += R.dias_sem_linha(ini, R.parse_ddmmyyyy(fim), capturados)
+                    if n == 0:
+                        print(f"⚠️ [{conta}] Sem dados em {inicio} -> {fim}.")
+        except Exception as e:
+            print(f"❌ [{conta}] Falha no login/Report: {e}")
+            falhas.append(f"{conta}:login")
+        finally:
+            await context.close()
+
+
+async def writer(fila: asyncio.Queue, multi: R.SheetsMultiUpsert, hists: dict, abas: dict, falhas: list):
+    while True:
+        item = await fila.get()
+        if item is None:
+            try:
+                await asyncio.to_thread(multi.close)
+            except Exception as e:
+                print(f"❌ Erro no UPSERT final: {e}")
+                falhas.append("upsert")
+            return
+
+        job, df = item
+        abas.setdefault(job["conta"], set()).add(job["aba"])
+        # histórico da conta primeiro e independente do Sheets (na memória ficam só as datas)
+        try:
+            await asyncio.to_thread(hists[job["conta"]].add, df)
+        except Exception as e:
+            print(f"❌ [{job['conta']}] Erro no histórico: {e}")
+            falhas.append(f"{job['conta']}:historico")
+        try:
+            await asyncio.to_thread(multi.add, job["aba"], df, job["sheet_id"])
+        except Exception as e:
+            print(f"❌ Erro no UPSERT: {e}")
+            falhas.append("upsert")
+
+
+async def capturar_contas(jobs: list[dict], concorrencia: int = CONCORRENCIA) -> dict:
+    """
+    Roda todos os jobs num navegador só (um context por conta, até `concorrencia` em paralelo)
+    e grava todas as abas pelo writer combinado. Devolve {conta: df com as datas capturadas (Time)}.
+    """
+    contas = agrupar_por_conta(jobs)
+    sem = asyncio.Semaphore(max(1, concorrencia))
+    fila: asyncio.Queue = asyncio.Queue(maxsize=FILA_MAX)
+    multi = R.SheetsMultiUpsert(max_rows=200, max_seconds=30)
+    hists = {conta: R.HistoricoLotes(meta={"conta": conta}, history_db=historico_da_conta(conta)[0],
+                                     latest_path=historico_da_conta(conta)[1])
+             for conta in contas}
+    abas: dict[str, set] = {}
+    sem_dados: dict[str, list] = {conta: [] for conta in contas}
+    falhas: list[str] = []
+    t0 = datetime.now()
+
+    try:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=R.HEADLESS)
+            writer_task = asyncio.create_task(writer(fila, multi, hists, abas, falhas))
+            try:
+                await asyncio.gather(*(rodar_conta(browser, conta, js, sem, fila, sem_dados[conta], falhas)
+                                       for conta, js in contas.items()))
+            finally:
+                await fila.put(None)
+                await writer_task
+                await browser.close()
+    finally:
+        out = {}
+        sheets = {tab: v for (_, tab), v in multi.totais.items()}
+        for conta, hist in hists.items():
+            abas_conta = sorted(abas.get(conta, ()))
+            out[conta] = hist.close(meta={
+                "conta": conta,
+                "abas": abas_conta,
+                "start": min((j["inicio"] for j in contas[conta]), key=R.parse_ddmmyyyy),
+                "end": max((j["fim"] for j in contas[conta]), key=R.parse_ddmmyyyy),
+                "ts": datetime.now().isoformat(),
+                "sheets": {a: sheets.get(a, {}) for a in abas_conta},
+                "falhas": [f for f in falhas if f.startswith(f"{conta}:")],
+                "sem_dados": sem_dados[conta],
+                "metricas": None,  # métricas são da execução inteira (exportadas abaixo)
+            })
+
+        R.exportar_metricas({
+            "ts": datetime.now().isoformat(),
+            "rows": sum(len(df) for df in out.values()),
+            "metricas": R.metricas_execucao(),
+        })
+        print(f"\n✅ {len(contas)} conta(s) em {(datetime.now() - t0).total_seconds():.1f}s, "
+              f"{multi.requests} request(s) no Sheets, falhas: {falhas or 'nenhuma'}")
+        R.resumo_esperas()
+        R.resumo_rede()
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Captura várias contas 7k num navegador só.")
+    ap.add_argument("spec", help="JSON com os jobs (conta, aba, período)")
+    ap.add_argument("--concorrencia", type=int, default=None, help="contas em paralelo")
+    args = ap.parse_args(argv)
+
+    jobs, concorrencia = carregar_spec(args.spec)
+    return asyncio.run(capturar_contas(jobs, args.concorrencia or concorrencia))
+
+
+if __name__ == "__main__":
+    main()
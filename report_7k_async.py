@@ -0,0 +1,690 @@
+"""
+Motor assíncrono (playwright.async_api) do report 7k.
+
+O scraping e o UPSERT no Sheets rodam em paralelo: cada lote capturado vai para uma fila limitada
+e uma task "writer" faz o upload (numa thread, já que o client do Google é bloqueante) enquanto o
+navegador já está capturando o próximo período.
+
+Só a camada de I/O é async: seletores, JS, parsing, leitura do my_table (R.LeitorMyTable), retry,
+métricas e diagnóstico são os mesmos do motor sync (report_7k_partners).
+"""
+import asyncio
+import time
+from datetime import datetime
+
+import pandas as pd
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+import report_7k_partners as R
+
+FILA_MAX = 4  # quantos lotes podem esperar upload antes do scraping pausar
+
+
+# ==============================
+# 🧠 HELPERS (async)
+# ==============================
+
+async def safe_click(locator, label="elemento", retries=5, timeout=9000):
+    last_err = None
+    for attempt in range(retries):
+        if attempt:
+            R.contar("safe_click.retries")
+        try:
+            try:
+                await locator.wait_for(state="visible", timeout=timeout)
+            except Exception:
+                pass
+
+            try:
+                await locator.click(timeout=timeout)
+                return
+            except Exception:
+                await locator.click(timeout=timeout, force=True)
+                return
+
+        except Exception as e:
+            last_err = e
+            R.diag_evento("safe_click", label=label, tentativa=attempt + 1, erro=str(e)[:200])
+    raise last_err
+
+
+# ==============================
+# 🩺 Diagnóstico (mesmo ring buffer do motor sync; artefatos só na falha final)
+# ==============================
+
+async def diag_dom(page, evento: str, seletor: str | None = None):
+    if not R.DIAGNOSTICO or R.DIAG_DOM_CHARS <= 0:
+        return
+    t0 = time.perf_counter()
+    try:
+        trecho = await page.evaluate(R.JS_DOM_TRECHO, [seletor, R.DIAG_DOM_CHARS])
+    except Exception as e:
+        trecho = f"<indisponível: {e}>"
+    R.registrar_span("diag.dom", t0)
+    R.diag_evento(evento, seletor=seletor or "body", dom=trecho)
+
+
+async def diag_periodo(page, data_inicio: str, data_fim: str):
+    R.diag_evento("periodo", inicio=data_inicio, fim=data_fim)
+    if R.DIAG_TRACE:
+        try:
+            await page.context.tracing.stop()
+            await page.context.tracing.start(**R.TRACE_OPCOES)
+        except Exception as e:
+            print(f"⚠️ Trace não reiniciado: {e}")
+
+
+async def falha_diagnostico(page, nome: str, erro=None):
+    """Versão async de R.falha_diagnostico (nunca levanta)."""
+    t0 = time.perf_counter()
+    arquivos = R.diag_arquivos(nome)
+    url = None
+    try:
+        url = page.url
+        await diag_dom(page, f"falha.{nome}")
+        if R.DIAG_SCREENSHOT in ("pagina", "tela"):
+            R.ensure_dir(R.DIAG_DIR)
+            await page.screenshot(path=arquivos["screenshot"], full_page=R.DIAG_SCREENSHOT == "pagina")
+        if R.DIAG_TRACE:
+            await page.context.tracing.stop(path=arquivos["trace"])
+            await page.context.tracing.start(**R.TRACE_OPCOES)
+    except Exception as e:
+        print(f"⚠️ Diagnóstico de '{nome}' incompleto: {e}")
+    try:
+        if R.DIAGNOSTICO:
+            await asyncio.to_thread(R.diag_gravar_eventos, arquivos["eventos"], nome, erro, url)
+        print(f"🩺 Diagnóstico de '{nome}' em {R.DIAG_DIR}/")
+    except Exception as e:
+        print(f"⚠️ Não consegui gravar o diagnóstico de '{nome}': {e}")
+    R.contar("diag.falhas")
+    R.registrar_span("diag.falha", t0)
+
+
+# ==============================
+# ⏱️ Prontidão por eventos (mesmos sinais/timeouts do motor sync)
+# ==============================
+
+async def wait_network_idle(page, passo: str, timeout: int | None = None) -> bool:
+    t0 = time.perf_counter()
+    try:
+        await page.wait_for_load_state("networkidle", timeout=timeout or R.TIMEOUTS_PRONTIDAO.get(passo, 10000))
+        return R.registrar_espera(passo, t0, True, "networkidle")
+    except Exception:
+        return R.registrar_espera(passo, t0, False, "networkidle")
+
+
+async def wait_locator(locator, passo: str, state: str = "visible", timeout: int | None = None) -> bool:
+    t0 = time.perf_counter()
+    try:
+        await locator.wait_for(state=state, timeout=timeout or R.TIMEOUTS_PRONTIDAO.get(passo, 10000))
+        return R.registrar_espera(passo, t0, True, state)
+    except Exception:
+        return R.registrar_espera(passo, t0, False, state)
+
+
+async def my_table_signature(page) -> str | None:
+    try:
+        return await page.evaluate(R.JS_MY_TABLE_SIGNATURE)
+    except Exception:
+        return None
+
+
+@R.cronometrar("wait_grid")
+async def wait_grid_ready(page, data_inicio: str, data_fim: str, before: str | None) -> bool:
+    t0 = time.perf_counter()
+    timeout = R.TIMEOUTS_PRONTIDAO["grid"]
+    ini, fim = R.periodo_iso(data_inicio, data_fim)
+    try:
+        await page.wait_for_load_state("networkidle", timeout=timeout)
+    except Exception:
+        pass
+    try:
+        restante = max(500, timeout - int((time.perf_counter() - t0) * 1000))
+        await page.wait_for_function(R.JS_MY_TABLE_READY, arg=[before, ini, fim], timeout=restante)
+        return R.registrar_espera("grid", t0, True, "my_table")
+    except Exception:
+        return R.registrar_espera("grid", t0, False, "my_table")
+
+
+# ==============================
+# 🎛️ Login + Navegação
+# ==============================
+
+async def route_leve(route):
+    req = route.request
+    motivo = R.motivo_bloqueio(req.url, req.resource_type)
+    R.contar_request(motivo, req.url)
+    if motivo is None:
+        await route.continue_()
+    else:
+        await route.abort()
+
+
+async def navegar(page, url: str, wait_until: str = "domcontentloaded"):
+    """Mesmo limite/retry do R.navegar, com sleeps assíncronos."""
+    balde = R.LIMITES["site"]
+    for tentativa in range(R.RETRY_TENTATIVAS):
+        await asyncio.sleep(balde.reservar())
+        try:
+            resp = await page.goto(url, wait_until=wait_until)
+            if resp is not None and resp.status in R.STATUS_RETENTAVEIS:
+                raise R.RespostaSiteErro(resp.status, resp.headers.get("retry-after"))
+            return resp
+        except Exception as e:
+            espera = R.proxima_espera(e, "site.goto", balde, tentativa, R.erro_site_retentavel)
+            if espera is None:
+                raise
+            await asyncio.sleep(espera)
+
+
+async def abrir_contexto(browser, sessao_file: str | None = None):
+    """Context isolado (cookies/sessão próprios) + page num navegador já aberto."""
+    context = await browser.new_context(**R.context_options(sessao_file))
+    if R.MODO_LEVE:
+        await context.route("**/*", route_leve)
+    context.on("response", R.contar_bytes)
+    context.on("requestfinished", R.contar_tempo)
+    if R.DIAG_TRACE:
+        await context.tracing.start(**R.TRACE_OPCOES)
+    page = await context.new_page()
+    return context, page
+
+
+async def abrir_navegador(p):
+    browser = await p.chromium.launch(headless=R.HEADLESS)
+    context, page = await abrir_contexto(browser)
+    return browser, context, page
+
+
+async def sessao_expirada(page) -> bool:
+    try:
+        if "login" in (page.url or "").lower():
+            return True
+        return await page.locator(R.SEL_SENHA).first.is_visible()
+    except Exception:
+        return True
+
+
+async def sessao_ativa(page) -> bool:
+    await wait_locator(page.locator(f"{R.SEL_SENHA}, {R.SEL_LOGADO}").first, "sessao")
+    if await sessao_expirada(page):
+        return False
+    try:
+        return await page.locator(R.SEL_LOGADO).first.is_visible()
+    except Exception:
+        return False
+
+
+@R.cronometrar("login")
+async def fazer_login(page, email: str | None = None, senha: str | None = None, sessao_file: str | None = None):
+    email = email or R.EMAIL
+    senha = senha or R.SENHA
+    print("🌐 Abrindo site...")
+    await navegar(page, R.BASE_URL)
+
+    if await sessao_ativa(page):
+        R.contar("login.sessao_reusada")
+        print("✅ Sessão salva aceita, pulando o formulário de login.")
+        return
+    if R.carregar_sessao(sessao_file) is not None:
+        print("🔐 Sessão salva recusada pelo site.")
+        R.descartar_sessao(sessao_file)
+
+    await wait_network_idle(page, "site")
+    print("🔐 Fazendo login...")
+    try:
+        await page.wait_for_selector(R.SEL_SENHA, timeout=25000)
+    except PlaywrightTimeoutError:
+        await falha_diagnostico(page, "login_sem_password")
+        raise RuntimeError("Não encontrei o campo de senha na tela de login.")
+
+    for sel in R.SEL_EMAIL:
+        email_input = page.locator(sel).first
+        if await email_input.count() > 0:
+            break
+
+    pass_input = page.locator(R.SEL_SENHA).first
+
+    if await email_input.count() == 0 or await pass_input.count() == 0:
+        await falha_diagnostico(page, "login_seletores")
+        raise RuntimeError("Não encontrei campos de login (email/senha). Ajuste os seletores.")
+
+    await safe_click(email_input, "campo email")
+    await email_input.press("Control+A")
+    await email_input.type(email, delay=20)
+
+    await safe_click(pass_input, "campo senha")
+    await pass_input.press("Control+A")
+    await pass_input.type(senha, delay=20)
+
+    btn_login = page.locator(R.SEL_BTN_LOGIN).first
+    if await btn_login.count() > 0:
+        await safe_click(btn_login, "botão login", retries=6, timeout=15000)
+    else:
+        await pass_input.press("Enter")
+
+    await wait_locator(page.locator(R.SEL_SENHA).first, "login", state="detached")
+    await wait_network_idle(page, "login")
+    print("✅ Pós-login URL:", page.url)
+    R.contar("login.formulario")
+    if R.REUSAR_SESSAO and not await sessao_expirada(page):
+        try:
+            state = await page.context.storage_state()
+        except Exception as e:
+            print(f"⚠️ Não consegui ler a sessão para salvar: {e}")
+        else:
+            await asyncio.to_thread(R.salvar_sessao, state, sessao_file)
+
+
+@R.cronometrar("goto_report")
+async def goto_report(page):
+    print("📄 Indo para Report...")
+
+    await wait_locator(page.locator(R.SEL_LOGADO).first, "report", state="attached")
+
+    report_link = page.locator(R.SEL_MENU_REPORT).first
+    if await report_link.count() > 0:
+        await safe_click(report_link, "menu Report", retries=6, timeout=12000)
+        await page.wait_for_load_state("domcontentloaded")
+        await wait_locator(page.locator(R.SEL_DATE_EDITOR).first, "report")
+        return
+
+    await navegar(page, R.BASE_URL.rstrip("/") + R.REPORT_PATH_FALLBACK)
+    await wait_locator(page.locator(R.SEL_DATE_EDITOR).first, "report")
+
+
+# ==============================
+# 📅 Datepicker
+# ==============================
+
+async def open_datepicker(date_editor, page):
+    try:
+        await page.keyboard.press("Escape")
+    except Exception:
+        pass
+
+    await safe_click(date_editor, "campo data", retries=3, timeout=8000)
+    panel = page.locator(R.SEL_PICKER_ABERTO).last
+    await panel.wait_for(state="visible", timeout=20000)
+    return panel
+
+
+async def wait_calendar_or_months(page, panel, timeout=15000):
+    try:
+        await panel.locator(f"{R.SEL_TABELA_DIA}, {R.SEL_TABELA_MES}").first.wait_for(state="visible",
+                                                                                    timeout=timeout)
+    except PlaywrightTimeoutError:
+        raise PlaywrightTimeoutError("Nem el-date-table nem el-month-table ficaram visíveis no tempo esperado.")
+    if await panel.locator(R.SEL_TABELA_DIA).first.is_visible():
+        return "days"
+    return "months"
+
+
+async def click_year(page, panel, year: int):
+    await safe_click(panel.locator(R.SEL_PICKER_LABEL).first, "label ano")
+
+    year_table = panel.locator(R.SEL_TABELA_ANO).first
+    await year_table.wait_for(state="visible", timeout=20000)
+    await safe_click(year_table.locator("td", has_text=str(year)).first, f"ano {year}")
+
+    return await wait_calendar_or_months(page, panel, timeout=20000)
+
+
+async def click_month(panel, month: int):
+    month_name = R.MONTHS_PT[month]
+
+    if not await panel.locator(R.SEL_TABELA_MES).first.is_visible():
+        await safe_click(panel.locator(R.SEL_PICKER_LABEL).nth(1), "label mês")
+
+    month_table = panel.locator(R.SEL_TABELA_MES).first
+    await month_table.wait_for(state="visible", timeout=20000)
+
+    sel_aria, abreviado = R.seletores_mes(month)
+    month_td = month_table.locator(sel_aria).first
+    if await month_td.count() == 0:
+        month_td = month_table.locator("td", has_text=abreviado).first
+
+    await safe_click(month_td, f"mês {month_name}")
+    await panel.locator(R.SEL_TABELA_DIA).first.wait_for(state="visible", timeout=20000)
+
+
+async def click_day(panel, day: int):
+    await safe_click(panel.locator(R.SEL_CELULA_DIA, has_text=str(day)).first, f"dia {day}")
+
+
+async def set_date_via_calendar(page, date_editor, date_str: str, label: str):
+    dt = R.parse_ddmmyyyy(date_str)
+
+    last_err = None
+    for attempt in range(1, 4):
+        try:
+            panel = await open_datepicker(date_editor, page)
+            await click_year(page, panel, dt.year)
+            await click_month(panel, dt.month)
+            await click_day(panel, dt.day)
+
+            await wait_locator(panel, "datepicker", state="hidden")
+            return
+
+        except Exception as e:
+            last_err = e
+            R.diag_evento("set_date", label=label, data=date_str, tentativa=attempt, erro=str(e)[:200])
+            await diag_dom(page, "set_date.painel", R.SEL_PICKER)
+            try:
+                await page.keyboard.press("Escape")
+            except Exception:
+                pass
+            await wait_locator(page.locator(R.SEL_PICKER_ABERTO).last, "datepicker", state="hidden")
+
+    await falha_diagnostico(page, f"set_date_{label}", last_err)
+    raise last_err
+
+
+async def read_editor_date(date_editor):
+    return R.data_do_input(await date_editor.locator("input").first.input_value())
+
+
+async def set_date_via_input(page, date_editor, date_str: str) -> bool:
+    dt = R.parse_ddmmyyyy(date_str)
+    inp = date_editor.locator("input").first
+
+    fmt = R.input_date_format(await inp.input_value() or await inp.get_attribute("placeholder"))
+    await inp.click(timeout=5000)
+    await inp.fill(dt.strftime(fmt), timeout=5000)
+    await inp.press("Enter")
+    try:
+        await page.keyboard.press("Escape")
+    except Exception:
+        pass
+
+    return await read_editor_date(date_editor) == pd.Timestamp(dt)
+
+
+@R.cronometrar("set_date")
+async def set_date(page, date_editor, date_str: str, label: str):
+    if R.DATA_DIGITADA:
+        try:
+            if await set_date_via_input(page, date_editor, date_str):
+                return
+        except Exception as e:
+            print(f"ℹ️ {label}: digitação falhou ({e}), indo pelo calendário.")
+        else:
+            print(f"ℹ️ {label}: input não aceitou {date_str} digitado, indo pelo calendário.")
+
+    await set_date_via_calendar(page, date_editor, date_str, label)
+
+
+async def apply_period(page, data_inicio: str, data_fim: str):
+    modo = "digitando" if R.DATA_DIGITADA else "via calendário"
+    print(f"🗓️ Aplicando período ({modo}): {data_inicio} -> {data_fim}")
+
+    editors = page.locator(R.SEL_DATE_EDITOR)
+    if await editors.count() < 2:
+        await falha_diagnostico(page, "date_editors")
+        raise RuntimeError("Não encontrei os 2 campos de data (el-date-editor--date).")
+
+    await set_date(page, editors.nth(0), data_inicio, "Start date")
+    await set_date(page, editors.nth(1), data_fim, "End date")
+
+    # a data final pode "empurrar" a inicial (limites do picker): confere o par no fim
+    if R.DATA_DIGITADA and not await period_matches(editors.nth(0), editors.nth(1), data_inicio, data_fim):
+        print("ℹ️ Período aplicado não confere, refazendo pelo calendário.")
+        await set_date_via_calendar(page, editors.nth(0), data_inicio, "Start date")
+        await set_date_via_calendar(page, editors.nth(1), data_fim, "End date")
+
+
+async def period_matches(start_editor, end_editor, data_inicio: str, data_fim: str) -> bool:
+    try:
+        return R.periodo_confere(await read_editor_date(start_editor), await read_editor_date(end_editor),
+                                 data_inicio, data_fim)
+    except Exception:
+        return False
+
+
+@R.cronometrar("group")
+async def click_group(page):
+    print("🧩 Clicando em Group/Agrupar...")
+    group_btn = page.locator(R.SEL_BTN_GROUP).first
+    if await group_btn.count() == 0:
+        await falha_diagnostico(page, "botao_group")
+        raise RuntimeError("Não encontrei o botão Group/Agrupar.")
+
+    # cada Group é uma consulta ao backend do site: entra no mesmo limite das navegações
+    await asyncio.sleep(R.LIMITES["site"].reservar())
+    await safe_click(group_btn, "botão Group/Agrupar", retries=6, timeout=15000)
+
+
+async def apply_period_and_group(page, data_inicio: str, data_fim: str):
+    await apply_period(page, data_inicio, data_fim)
+    before = await my_table_signature(page)
+    await click_group(page)
+    await wait_grid_ready(page, data_inicio, data_fim, before)
+
+
+# ==============================
+# 📊 Captura da tabela
+# ==============================
+
+async def esperar_my_table_mudar(page, antes: str | None, passo: str) -> bool:
+    t0 = time.perf_counter()
+    try:
+        await page.wait_for_function(R.JS_MY_TABLE_MUDOU, arg=antes, timeout=R.TIMEOUTS_PRONTIDAO[passo])
+        return R.registrar_espera(passo, t0, True, "my_table")
+    except Exception:
+        return R.registrar_espera(passo, t0, False, "my_table")
+
+
+async def paginacao_total(page) -> int | None:
+    try:
+        loc = page.locator(R.SEL_PAG_TOTAL).first
+        if await loc.count() == 0:
+            return None
+        return R.total_paginacao(await loc.inner_text())
+    except Exception:
+        return None
+
+
+async def proxima_pagina(page) -> bool:
+    btn = page.locator(R.SEL_PAG_PROXIMA).first
+    try:
+        if await btn.count() == 0 or not await btn.is_enabled():
+            return False
+    except Exception:
+        return False
+    antes = await my_table_signature(page)
+    await safe_click(btn, "próxima página", retries=3, timeout=8000)
+    return await esperar_my_table_mudar(page, antes, "pagina")
+
+
+async def iterar_my_table(page, lote: int | None = None):
+    """Versão async de R.iterar_my_table: lotes de registros crus (virtualizada/paginada)."""
+    root = page.locator(R.SEL_MY_TABLE).first
+    try:
+        await root.wait_for(state="visible", timeout=35000)
+    except PlaywrightTimeoutError:
+        await falha_diagnostico(page, "my_table_nao_visivel")
+        raise RuntimeError("Não encontrei o container div.my_table do report.")
+
+    total_esperado = await paginacao_total(page)
+    leitor = R.LeitorMyTable(lote)
+
+    async def ler() -> bool:
+        try:
+            return leitor.ler(await root.evaluate(R.JS_MY_TABLE_LER_OU_ROLAR, False))
+        except R.ColunaAusente as e:
+            await falha_diagnostico(page, "headers_report", e)
+            raise
+
+    while True:
+        virtual = await ler()
+        while virtual:
+            antes = await my_table_signature(page)
+            if (await root.evaluate(R.JS_MY_TABLE_LER_OU_ROLAR, True) or {}).get("fim", True):
+                break
+            if not await esperar_my_table_mudar(page, antes, "rolagem"):
+                break
+            R.contar("my_table.rolagens")
+            virtual = await ler()
+            for df in leitor.lotes():
+                yield df
+
+        for df in leitor.lotes():
+            yield df
+        if not await proxima_pagina(page):
+            break
+        R.contar("my_table.paginas")
+
+    for df in leitor.lotes(final=True):
+        yield df
+    try:
+        leitor.conferir(total_esperado)
+    except R.TabelaTruncada as e:
+        await falha_diagnostico(page, "linhas_faltando", e)
+        raise
+    except R.TabelaVazia:
+        R.diag_evento("tabela_vazia")
+        raise
+
+
+@R.cronometrar("capture_grid")
+async def capture_grid_my_table(page) -> pd.DataFrame:
+    print("📊 Capturando tabela (DIV my_table)...")
+    try:
+        return pd.concat([df async for df in iterar_my_table(page)], ignore_index=True)
+    except R.TabelaVazia:
+        return pd.DataFrame(columns=R.COLUNAS_ALVO)
+
+
+async def capturar_periodo_em_lotes(page, data_inicio: str, data_fim: str, lote: int | None = None,
+                                    history_db: str | None = None):
+    """Lotes normalizados conforme o my_table vai sendo lido (arquivo bruto + normalização fora do loop)."""
+    await diag_periodo(page, data_inicio, data_fim)
+    await apply_period_and_group(page, data_inicio, data_fim)
+    print("📊 Capturando tabela (DIV my_table) em lotes...")
+    try:
+        async for bruto in iterar_my_table(page, lote):
+            await asyncio.to_thread(R.arquivar_bruto, bruto, data_inicio, data_fim, "dom", history_db)
+            yield await asyncio.to_thread(R.normalizar_report, bruto)
+    except R.TabelaVazia:
+        print(f"⚠️ Sem linhas em {data_inicio} -> {data_fim}.")
+
+
+async def capturar_periodo(page, data_inicio: str, data_fim: str, history_db: str | None = None) -> pd.DataFrame:
+    await diag_periodo(page, data_inicio, data_fim)
+    await apply_period_and_group(page, data_inicio, data_fim)
+    df = await capture_grid_my_table(page)
+    await asyncio.to_thread(R.arquivar_bruto, df, data_inicio, data_fim, "dom", history_db)
+    # normalização é CPU (pandas): roda fora do loop para não travar o navegador
+    return await asyncio.to_thread(R.normalizar_report, df)
+
+
+# ==============================
+# 🔀 Pipeline scraper -> fila -> writer
+# ==============================
+
+async def scraper(page, janelas: list[tuple[str, str]], fila: asyncio.Queue, sem_dados: list, falhas: list):
+    for inicio, fim in janelas:
+        print(f"\n=== [async] Capturando {inicio} -> {fim} ===")
+        n = 0
+        capturados = set()
+        try:
+            async for df in capturar_periodo_em_lotes(page, inicio, fim):
+                if df is not None and not df.empty:
+                    capturados.update(df["Time"].dt.strftime("%Y-%m-%d"))
+                    # bloqueia aqui se o writer estiver FILA_MAX lotes atrás
+                    await fila.put(df)
+                    n += len(df)
+        except Exception as e:
+            print(f"❌ Erro {inicio} -> {fim}: {e}")
+            falhas.append(f"{inicio}-{fim}")
+            try:
+                await page.keyboard.press("Escape")
+                await goto_report(page)
+            except Exception:
+                pass
+            continue
+
+        sem_dados += R.dias_sem_linha(R.parse_ddmmyyyy(inicio), R.parse_ddmmyyyy(fim), capturados)
+        if n == 0:
+            print(f"⚠️ Sem dados em {inicio} -> {fim}.")
+
+
+async def writer(fila: asyncio.Queue, hist: R.HistoricoLotes, falhas: list):
+    """Consome a fila até a sentinela (None). Cada lote vai para o histórico e, à parte, para o Sheets."""
+    # um buffer só para a execução inteira: header/formato/mapa de linhas resolvidos uma vez
+    buf = R.SheetsUpsertBuffer(R.SHEET_ID, R.SHEET_TAB, max_rows=31, max_seconds=30)
+    while True:
+        df = await fila.get()
+        if df is None:
+            try:
+                await asyncio.to_thread(buf.close)
+            except Exception as e:
+                print(f"❌ Erro no UPSERT final: {e}")
+                falhas.append("upsert")
+            return
+
+        # histórico primeiro e independente do Sheets: lote que chegou na fila não some se o UPSERT falhar
+        # (na memória ficam só as datas)
+        try:
+            await asyncio.to_thread(hist.add, df)
+        except Exception as e:
+            print(f"❌ Erro no histórico: {e}")
+            falhas.append("historico")
+        try:
+            await asyncio.to_thread(buf.add, df)
+        except Exception as e:
+            print(f"❌ Erro no UPSERT: {e}")
+            falhas.append("upsert")
+
+
+async def capturar_range_async(janelas: list[tuple[str, str]], fila_max: int = FILA_MAX) -> pd.DataFrame:
+    """
+    Captura as janelas (DD/MM/YYYY, DD/MM/YYYY) numa sessão única e faz os UPSERTs em paralelo
+    com o scraping. Tempo total ~ max(scrape, upload) em vez da soma.
+    Devolve as datas capturadas (Time); os valores vão lote a lote para o Sheets e o histórico.
+    Se o scraping cair, o writer ainda esvazia a fila e faz o flush final; a execução fica como parcial.
+    """
+    if not R.EMAIL or not R.SENHA:
+        raise RuntimeError("EMAIL/SENHA não definidos.")
+
+    fila: asyncio.Queue = asyncio.Queue(maxsize=max(1, fila_max))
+    falhas = []
+    sem_dados = []
+    hist = R.HistoricoLotes(meta={"start": janelas[0][0] if janelas else None,
+                                  "end": janelas[-1][1] if janelas else None})
+
+    async with async_playwright() as p:
+        browser, context, page = await abrir_navegador(p)
+
+        await fazer_login(page)
+        await goto_report(page)
+
+        writer_task = asyncio.create_task(writer(fila, hist, falhas))
+        completo = False
+        try:
+            await scraper(page, janelas, fila, sem_dados, falhas)
+            completo = True
+        finally:
+            url = page.url
+            # sentinela sempre (também com o scraper caído ou cancelado): o writer grava o que está na fila
+            if not writer_task.done():
+                await fila.put(None)
+            await writer_task
+            await context.close()
+            await browser.close()
+            df = hist.close(meta={
+                "start": janelas[0][0] if janelas else None,
+                "end": janelas[-1][1] if janelas else None,
+                "url": url,
+                "ts": datetime.now().isoformat(),
+                "falhas": falhas,
+                "sem_dados": sem_dados,
+                "parcial": not completo,
+                "esperas": R.resumo_esperas(),
+                "rede": R.resumo_rede(),
+            })
+    return df
+
+
+if __name__ == "__main__":
+    asyncio.run(capturar_range_async([(R.DATA_INICIO, R.DATA_FIM)]))
@@ -3,8 +3,18 @@ import pandas as pd
 import re
 import os
 import json
+import math
+import random
+import tempfile
+import functools
+import inspect
+import threading
+import time
+from collections import deque
 from datetime import datetime
 
+import historico_7k
+
 # ==============================
 # 🔧 CONFIGURAÇÕES
 # ==============================
@@ -15,7 +25,31 @@ REPORT_PATH_FALLBACK = "/pt/report"  # fallback se o clique no menu falhar
 EMAIL = "Pedir acesso ao gestor"
 SENHA = "Pedir acesso ao gestor#"
 
-HEADLESS = False
+HEADLESS = os.getenv("HEADLESS", "1") == "1"
+
+# Modo leve (opt-in): bloqueia recursos pesados/terceiros (menos bytes e CPU por captura).
+# Desligado, a execução mede o que ele cortaria (bytes/tempo por motivo, em REDE_MEDIAS); ligado,
+# resumo_rede estima a economia com essas médias. Se uma espera estourar, as últimas bloqueadas vão pro log.
+MODO_LEVE = os.getenv("MODO_LEVE", "0") == "1"
+TIPOS_BLOQUEADOS = {"image", "media", "font"}
+# Hosts liberados (sufixo). Qualquer outro host (analytics, chat, CDNs de terceiros) é abortado.
+HOSTS_PERMITIDOS = [h.strip() for h in os.getenv("HOSTS_PERMITIDOS", "7k.partners").split(",") if h.strip()]
+# True = não força o viewport 1600x900 (usa o tamanho padrão da janela)
+SEM_VIEWPORT = os.getenv("SEM_VIEWPORT", "0") == "1"
+
+# Instrumentação: spans por etapa + contadores (round trips Playwright, retries, requests/bytes Sheets)
+INSTRUMENTAR = os.getenv("INSTRUMENTAR", "1") == "1"
+METRICAS_JSONL = os.getenv("METRICAS_JSONL", "")  # ex.: history_7k/metricas.jsonl
+METRICAS_PROM = os.getenv("METRICAS_PROM", "")    # ex.: /var/lib/node_exporter/textfile/bet7k.prom
+
+# Diagnóstico: ring buffer em memória dos últimos passos (esperas, retries, trechos curtos do DOM).
+# Screenshot/trace só são gravados (em DIAG_DIR) quando um passo falha de vez, nunca dentro dos retries.
+DIAGNOSTICO = os.getenv("DIAGNOSTICO", "1") == "1"
+DIAG_EVENTOS = int(os.getenv("DIAG_EVENTOS", "200"))         # tamanho do ring buffer
+DIAG_DOM_CHARS = int(os.getenv("DIAG_DOM_CHARS", "1500"))    # tamanho do trecho de DOM (0 = sem trechos)
+DIAG_SCREENSHOT = os.getenv("DIAG_SCREENSHOT", "pagina")     # "pagina" (full_page), "tela" ou "nao"
+DIAG_TRACE = os.getenv("DIAG_TRACE", "0") == "1"              # trace do Playwright (caro: só para investigar)
+DIAG_DIR = os.getenv("DIAG_DIR", "diagnosticos")
 
 # Período (DD/MM/YYYY)
 DATA_INICIO = "18/01/2026"
@@ -38,10 +72,49 @@ SHEET_ID = "1x3PLUE2ubJtMhlxG0eURHDvz5imnq3FUEJuAXcShOjs"
 SHEET_TAB = os.getenv("SHEET_TAB", "BET7K")
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 CREDS_FILE = os.getenv("GOOGLE_CREDS_FILE", "credenciais.json")
+# Documento de discovery local (opcional). Sem ele usa o discovery estático que vem no googleapiclient.
+SHEETS_DISCOVERY_FILE = os.getenv("SHEETS_DISCOVERY_FILE", "")
+# UPSERT por diff: lê as linhas-alvo antes e só escreve as células que mudaram
+SHEETS_DIFF = os.getenv("SHEETS_DIFF", "1") == "1"
+SHEETS_TOLERANCIA = float(os.getenv("SHEETS_TOLERANCIA", "1e-6"))  # diferença numérica ignorada
 
 # JSON histórico/cache
 JSON_DIR = os.getenv("JSON_DIR", "history_7k")
 JSON_LATEST = os.path.join(JSON_DIR, "latest.json")
+# Histórico compacto (SQLite) no lugar dos report_<ts>.json
+HISTORY_DB = os.getenv("HISTORY_DB", os.path.join(JSON_DIR, "historico.sqlite3"))
+# Índice local Time->linha do Sheets (evita reler a coluna A inteira a cada UPSERT)
+ROW_INDEX_DIR = os.getenv("ROW_INDEX_DIR", os.path.join(JSON_DIR, "row_index"))
+# Arquiva o texto cru das células de cada captura no histórico (reprocessamento offline: reprocessar_7k.py)
+ARQUIVAR_BRUTO = os.getenv("ARQUIVAR_BRUTO", "1") == "1"
+# Dias com mais de N dias de idade, capturados depois de assentar, são finais (não recaptura)
+HORIZONTE_ASSENTAMENTO_DIAS = int(os.getenv("HORIZONTE_ASSENTAMENTO_DIAS", "3"))
+
+# Captura via rede: lê o JSON da XHR do report em vez do DOM (fallback: DOM)
+CAPTURA_REDE = os.getenv("CAPTURA_REDE", "0") == "1"
+REPORT_API_PATTERN = os.getenv("REPORT_API_PATTERN", r"report")
+REDE_TIMEOUT_MS = int(os.getenv("REDE_TIMEOUT_MS", "15000"))
+
+# Datepicker: digita a data direto no input (rápido); o clique no calendário fica como fallback
+DATA_DIGITADA = os.getenv("DATA_DIGITADA", "1") == "1"
+
+# Sessão salva (cookies + localStorage) reaproveitada entre processos; o formulário de login só roda
+# quando o site recusa a sessão. O arquivo dá acesso à conta: não versionar.
+REUSAR_SESSAO = os.getenv("REUSAR_SESSAO", "1") == "1"
+SESSAO_FILE = os.getenv("SESSAO_FILE", os.path.join(JSON_DIR, "sessao_7k.json"))
+
+# Captura em lotes: quantas linhas do my_table por lote (normalização + Sheets vão lote a lote)
+STREAM_LOTE = int(os.getenv("STREAM_LOTE", "200"))
+
+# Range coalescido: quantos dias pedir por Group (janela é quebrada ao meio se a tabela vier truncada)
+JANELA_MAX_DIAS = int(os.getenv("JANELA_MAX_DIAS", "31"))
+
+# Limite de taxa (por minuto, 0 = sem limite) + retry com backoff exponencial quando o servidor recusa
+SHEETS_REQ_POR_MIN = int(os.getenv("SHEETS_REQ_POR_MIN", "60"))  # quota padrão da Sheets API por usuário
+SITE_REQ_POR_MIN = int(os.getenv("SITE_REQ_POR_MIN", "30"))      # navegações + consultas (Group) no site
+RETRY_TENTATIVAS = int(os.getenv("RETRY_TENTATIVAS", "6"))
+RETRY_BASE_S = float(os.getenv("RETRY_BASE_S", "1"))
+RETRY_MAX_S = float(os.getenv("RETRY_MAX_S", "64"))
 
 
 # ==============================
@@ -54,7 +127,9 @@ def ensure_dir(path: str):
 
 def safe_click(locator, label="elemento", retries=5, timeout=9000):
     last_err = None
-    for _ in range(retries):
+    for attempt in range(retries):
+        if attempt:
+            contar("safe_click.retries")
         try:
             try:
                 locator.wait_for(state="visible", timeout=timeout)
@@ -70,9 +145,536 @@ def safe_click(locator, label="elemento", retries=5, timeout=9000):
 
         except Exception as e:
             last_err = e
+            diag_evento("safe_click", label=label, tentativa=attempt + 1, erro=str(e)[:200])
     raise last_err
 
 
+# ==============================
+# 📈 Instrumentação (spans + contadores por execução)
+# ==============================
+
+METRICAS = {"spans": {}, "contadores": {}}
+_METRICAS_LOCK = threading.Lock()
+
+
+def contar(nome: str, n: int = 1):
+    with _METRICAS_LOCK:
+        METRICAS["contadores"][nome] = METRICAS["contadores"].get(nome, 0) + n
+
+
+def registrar_span(nome: str, t0: float):
+    ms = (time.perf_counter() - t0) * 1000
+    with _METRICAS_LOCK:
+        sp = METRICAS["spans"].setdefault(nome, {"n": 0, "ms": 0.0, "max_ms": 0.0})
+        sp["n"] += 1
+        sp["ms"] += ms
+        sp["max_ms"] = max(sp["max_ms"], ms)
+
+
+def cronometrar(nome: str):
+    """Decorator: mede cada chamada da função (sync ou async) como um span."""
+    def deco(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper_async(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    registrar_span(nome, t0)
+            return wrapper_async
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                registrar_span(nome, t0)
+        return wrapper
+    return deco
+
+
+def executar_sheets(req, nome: str, idempotente: bool | None = None):
+    """
+    Executa um request do googleapiclient medindo tempo, nº de requests e bytes enviados/recebidos.
+    Passa pelo limite da Sheets API e repete com backoff em 429/5xx (append só em 429).
+    `idempotente` padrão: tudo menos append (repetir um append que o servidor aplicou duplica linhas).
+    """
+    def uma_vez():
+        t0 = time.perf_counter()
+        try:
+            return req.execute()
+        finally:
+            registrar_span(f"sheets.{nome}", t0)
+            contar("sheets.requests")
+            body = getattr(req, "body", None) or ""
+            contar("sheets.bytes_enviados", len(body.encode("utf-8") if isinstance(body, str) else body))
+
+    if idempotente is None:
+        idempotente = not nome.endswith("append")
+    resp = com_retry(uma_vez, f"sheets.{nome}", LIMITES["sheets"],
+                     lambda e: erro_sheets_retentavel(e, idempotente))
+    contar("sheets.bytes_recebidos", len(json.dumps(resp, separators=(",", ":"))) if resp else 0)
+    return resp
+
+
+def metricas_execucao(reset: bool = True) -> dict:
+    with _METRICAS_LOCK:
+        out = {
+            "spans": {k: {"n": v["n"], "ms": round(v["ms"], 1), "max_ms": round(v["max_ms"], 1)}
+                      for k, v in METRICAS["spans"].items()},
+            "contadores": dict(METRICAS["contadores"]),
+        }
+        if reset:
+            METRICAS["spans"].clear()
+            METRICAS["contadores"].clear()
+    return out
+
+
+def exportar_metricas(meta: dict):
+    """Grava meta["metricas"] em JSON-lines (METRICAS_JSONL) e/ou textfile do Prometheus (METRICAS_PROM)."""
+    m = meta.get("metricas") or {}
+    if not m:
+        return
+    if METRICAS_JSONL:
+        ensure_dir(os.path.dirname(METRICAS_JSONL) or ".")
+        with open(METRICAS_JSONL, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"ts": meta.get("ts"), "start": meta.get("start"), "end": meta.get("end"),
+                                "rows": meta.get("rows"), **m}, ensure_ascii=False, default=str) + "\n")
+
+    if METRICAS_PROM:
+        linhas = [
+            "# TYPE bet7k_span_seconds gauge",
+            *[f'bet7k_span_seconds{{span="{k}"}} {v["ms"] / 1000:.3f}' for k, v in m.get("spans", {}).items()],
+            "# TYPE bet7k_span_calls gauge",
+            *[f'bet7k_span_calls{{span="{k}"}} {v["n"]}' for k, v in m.get("spans", {}).items()],
+            "# TYPE bet7k_counter gauge",
+            *[f'bet7k_counter{{name="{k}"}} {v}' for k, v in m.get("contadores", {}).items()],
+            "# TYPE bet7k_last_run_rows gauge",
+            f"bet7k_last_run_rows {int(meta.get('rows') or 0)}",
+            "# TYPE bet7k_last_run_timestamp_seconds gauge",
+            f"bet7k_last_run_timestamp_seconds {time.time():.0f}",
+        ]
+        ensure_dir(os.path.dirname(METRICAS_PROM) or ".")
+        tmp = METRICAS_PROM + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(linhas) + "\n")
+        os.replace(tmp, METRICAS_PROM)
+
+
+# ==============================
+# 🩺 Diagnóstico (ring buffer + artefatos só na falha final)
+# ==============================
+
+# Últimos eventos da execução: [{"ts", "evento", ...}] (os mais antigos saem sozinhos)
+DIAG_BUFFER: deque = deque(maxlen=max(1, DIAG_EVENTOS))
+
+# outerHTML do último elemento visível do seletor (ou do body), cortado em `limite` caracteres
+JS_DOM_TRECHO = """
+([seletor, limite]) => {
+  const els = seletor ? Array.from(document.querySelectorAll(seletor)) : [document.body];
+  const visiveis = els.filter(el => el && el.offsetParent !== null);
+  const el = visiveis.length ? visiveis[visiveis.length - 1] : els[els.length - 1];
+  return el ? el.outerHTML.slice(0, limite) : null;
+}
+"""
+TRACE_OPCOES = {"screenshots": True, "snapshots": True}
+
+
+def diag_evento(evento: str, **dados):
+    """Registra um evento no ring buffer (custo: um dict num deque, sem I/O)."""
+    if not DIAGNOSTICO:
+        return
+    DIAG_BUFFER.append({"ts": datetime.now().isoformat(timespec="milliseconds"), "evento": evento, **dados})
+    contar("diag.eventos")
+
+
+def diag_dom(page, evento: str, seletor: str | None = None):
+    """Guarda um trecho curto do DOM no ring buffer (1 evaluate, sem screenshot)."""
+    if not DIAGNOSTICO or DIAG_DOM_CHARS <= 0:
+        return
+    t0 = time.perf_counter()
+    try:
+        trecho = page.evaluate(JS_DOM_TRECHO, [seletor, DIAG_DOM_CHARS])
+    except Exception as e:
+        trecho = f"<indisponível: {e}>"
+    registrar_span("diag.dom", t0)
+    diag_evento(evento, seletor=seletor or "body", dom=trecho)
+
+
+def diag_arquivos(nome: str) -> dict:
+    """Caminhos dos artefatos de uma falha: DIAG_DIR/<ts>_<nome>.{json,png,zip}"""
+    slug = re.sub(r"[^\w\-]", "_", nome)
+    base = os.path.join(DIAG_DIR, f"{datetime.now():%Y%m%d_%H%M%S}_{slug}")
+    return {"eventos": base + ".json", "screenshot": base + ".png", "trace": base + ".zip"}
+
+
+def diag_gravar_eventos(path: str, nome: str, erro=None, url: str | None = None):
+    ensure_dir(os.path.dirname(path) or ".")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"falha": nome, "erro": str(erro) if erro is not None else None, "url": url,
+                   "eventos": list(DIAG_BUFFER)}, f, ensure_ascii=False, indent=2, default=str)
+
+
+def trace_iniciar(context):
+    if DIAG_TRACE:
+        context.tracing.start(**TRACE_OPCOES)
+
+
+def trace_reiniciar(context):
+    """Descarta o trace até aqui: a memória fica só com o período atual."""
+    if DIAG_TRACE:
+        context.tracing.stop()
+        context.tracing.start(**TRACE_OPCOES)
+
+
+def diag_periodo(page, data_inicio: str, data_fim: str):
+    """Início de um período: marca no ring buffer e recomeça o trace (ele não cresce a execução inteira)."""
+    diag_evento("periodo", inicio=data_inicio, fim=data_fim)
+    try:
+        trace_reiniciar(page.context)
+    except Exception as e:
+        print(f"⚠️ Trace não reiniciado: {e}")
+
+
+def falha_diagnostico(page, nome: str, erro=None):
+    """
+    Um passo falhou de vez: grava ring buffer (+ trecho do body), screenshot e trace conforme DIAG_*.
+    Nunca levanta; quem chama relança o erro original.
+    """
+    t0 = time.perf_counter()
+    arquivos = diag_arquivos(nome)
+    url = None
+    try:
+        url = page.url
+        diag_dom(page, f"falha.{nome}")
+        if DIAG_SCREENSHOT in ("pagina", "tela"):
+            ensure_dir(DIAG_DIR)
+            page.screenshot(path=arquivos["screenshot"], full_page=DIAG_SCREENSHOT == "pagina")
+        if DIAG_TRACE:
+            page.context.tracing.stop(path=arquivos["trace"])
+            page.context.tracing.start(**TRACE_OPCOES)
+    except Exception as e:
+        print(f"⚠️ Diagnóstico de '{nome}' incompleto: {e}")
+    try:
+        if DIAGNOSTICO:
+            diag_gravar_eventos(arquivos["eventos"], nome, erro, url)
+        print(f"🩺 Diagnóstico de '{nome}' em {DIAG_DIR}/")
+    except Exception as e:
+        print(f"⚠️ Não consegui gravar o diagnóstico de '{nome}': {e}")
+    contar("diag.falhas")
+    registrar_span("diag.falha", t0)
+
+
+# Métodos que não falam com o navegador (só montam locators / leem estado local)
+_PW_LOCAIS = {"locator", "first", "last", "nth", "filter", "keyboard", "mouse", "url", "page",
+              "on", "once", "remove_listener", "get_by_role", "get_by_text", "get_by_label",
+              "get_by_placeholder", "get_by_test_id", "and_", "or_"}
+
+
+class ContadorPlaywright:
+    """
+    Proxy fino sobre Page/Locator que conta cada chamada que vai até o navegador
+    (click, count, inner_text, evaluate, wait_for...) em contadores["playwright.rt"].
+    """
+
+    def __init__(self, alvo):
+        object.__setattr__(self, "_alvo", alvo)
+
+    def __getattr__(self, nome):
+        attr = getattr(self._alvo, nome)
+        if nome in _PW_LOCAIS:
+            if callable(attr):
+                return lambda *a, **k: _envolver(attr(*a, **k))
+            return _envolver(attr)
+        if callable(attr):
+            def chamada(*a, **k):
+                contar("playwright.rt")
+                return attr(*a, **k)
+            return chamada
+        return attr
+
+
+def _envolver(obj):
+    # só Page/Locator/Keyboard/Mouse (objetos do Playwright) viram proxy; str/None/etc passam direto
+    if type(obj).__module__.startswith("playwright."):
+        return ContadorPlaywright(obj)
+    return obj
+
+
+# ==============================
+# 🚦 Limite de taxa + retry (quotas da Sheets API e do site)
+# ==============================
+
+# 429 = quota; 5xx = falha transitória do servidor
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Balde de tokens compartilhado entre threads: `por_minuto` requests por minuto, com rajada de até
+    `capacidade`. reservar() não bloqueia (devolve quantos segundos esperar), então serve para sync e async.
+    segurar(s) corta a rajada e pausa todo mundo por s segundos (quando o servidor manda recuar).
+    """
+
+    def __init__(self, nome: str, por_minuto: int, capacidade: int | None = None):
+        self.nome = nome
+        self.taxa = por_minuto / 60.0
+        self.capacidade = float(capacidade or max(1, min(por_minuto, 10)))
+        self.tokens = self.capacidade
+        self._ultimo = time.monotonic()
+        self._livre_em = 0.0
+        self._lock = threading.Lock()
+
+    def _repor(self, agora: float):
+        base = max(self._ultimo, self._livre_em)
+        if agora > base:
+            self.tokens = min(self.capacidade, self.tokens + (agora - base) * self.taxa)
+            self._ultimo = agora
+
+    def reservar(self) -> float:
+        if self.taxa <= 0:
+            return 0.0
+        with self._lock:
+            agora = time.monotonic()
+            self._repor(agora)
+            self.tokens -= 1
+            espera = max(0.0, self._livre_em - agora) + max(0.0, -self.tokens) / self.taxa
+        if espera > 0:
+            contar(f"limite.{self.nome}.esperas")
+            contar(f"limite.{self.nome}.espera_ms", int(espera * 1000))
+        return espera
+
+    def consumir(self):
+        espera = self.reservar()
+        if espera > 0:
+            time.sleep(espera)
+
+    def segurar(self, segundos: float):
+        with self._lock:
+            self._livre_em = max(self._livre_em, time.monotonic() + segundos)
+            self.tokens = min(self.tokens, 1.0)  # sem rajada logo depois da pausa
+
+
+LIMITES = {
+    "sheets": TokenBucket("sheets", SHEETS_REQ_POR_MIN),
+    "site": TokenBucket("site", SITE_REQ_POR_MIN),
+}
+
+
+class RespostaSiteErro(RuntimeError):
+    """Navegação respondeu com status retentável (429/5xx)."""
+
+    def __init__(self, status: int, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _retry_after_s(valor) -> float | None:
+    try:
+        return float(valor) if valor not in (None, "") else None
+    except (TypeError, ValueError):
+        return None  # formato data HTTP: cai no backoff normal
+
+
+def erro_sheets_retentavel(e: Exception, idempotente: bool = True):
+    """(motivo, retry_after) se vale tentar de novo; None se é erro de verdade (400, 403 de permissão...)."""
+    resp = getattr(e, "resp", None)
+    status = getattr(resp, "status", None)
+    retry_after = resp.get("retry-after") if hasattr(resp, "get") else None
+    if status == 429 or (status == 403 and "ratelimitexceeded" in str(e).lower().replace("_", "")):
+        return "quota", retry_after
+    # append/insert não são idempotentes: 5xx ou queda de rede podem ter sido aplicados, então não repete
+    if not idempotente:
+        return None
+    if status in STATUS_RETENTAVEIS:
+        return f"HTTP {status}", retry_after
+    if status is None and isinstance(e, OSError):
+        return "rede", None
+    return None
+
+
+def erro_site_retentavel(e: Exception):
+    if isinstance(e, RespostaSiteErro):
+        return ("quota" if e.status == 429 else f"HTTP {e.status}"), e.retry_after
+    if isinstance(e, PlaywrightTimeoutError):
+        return "timeout", None
+    if "net::ERR_" in str(e):
+        return "rede", None
+    return None
+
+
+def proxima_espera(e: Exception, nome: str, balde: TokenBucket, tentativa: int, classificar) -> float | None:
+    """
+    Decide o retry de `tentativa` (0, 1, ...): None = desiste (relança o erro); senão segundos de espera.
+    Backoff exponencial com jitter, respeitando Retry-After; em quota pausa o balde inteiro.
+    """
+    info = classificar(e)
+    if info is None or tentativa >= RETRY_TENTATIVAS - 1:
+        return None
+    motivo, retry_after = info
+
+    espera = _retry_after_s(retry_after)
+    if espera is None:
+        espera = random.uniform(0.5, 1.0) * RETRY_BASE_S * (2 ** tentativa)
+    espera = min(RETRY_MAX_S, espera)
+
+    if motivo == "quota":
+        balde.segurar(espera)
+    contar(f"retry.{nome}")
+    diag_evento("retry", nome=nome, motivo=motivo, tentativa=tentativa + 1, espera_s=round(espera, 2),
+                erro=str(e)[:200])
+    print(f"⏳ {nome}: {motivo}; nova tentativa em {espera:.1f}s ({tentativa + 1}/{RETRY_TENTATIVAS - 1})")
+    return espera
+
+
+def com_retry(fn, nome: str, balde: TokenBucket, classificar):
+    """Chama fn() respeitando o balde e repetindo com backoff enquanto o erro for retentável."""
+    for tentativa in range(RETRY_TENTATIVAS):
+        balde.consumir()
+        try:
+            return fn()
+        except Exception as e:
+            espera = proxima_espera(e, nome, balde, tentativa, classificar)
+            if espera is None:
+                raise
+            time.sleep(espera)
+
+
+def navegar(page, url: str, wait_until: str = "domcontentloaded"):
+    """page.goto dentro do limite do site, com retry em timeout/erro de rede/429/5xx."""
+    def ir():
+        resp = page.goto(url, wait_until=wait_until)
+        if resp is not None and resp.status in STATUS_RETENTAVEIS:
+            raise RespostaSiteErro(resp.status, resp.headers.get("retry-after"))
+        return resp
+    return com_retry(ir, "site.goto", LIMITES["site"], erro_site_retentavel)
+
+
+# ==============================
+# ⏱️ Prontidão por eventos (no lugar de sleeps fixos)
+# ==============================
+
+# Timeout (ms) de cada tipo de espera; estourar não é erro, só segue o fluxo (e fica registrado)
+TIMEOUTS_PRONTIDAO = {
+    "site": 10000,        # pós-goto da home
+    "sessao": 10000,      # home mostrando o menu (logado) ou o campo de senha
+    "login": 20000,       # saída da tela de login
+    "report": 15000,      # tela do Report com os campos de data
+    "datepicker": 3000,   # painel do calendário fechando
+    "grid": 20000,        # div.my_table atualizado depois do Group
+    "rolagem": 3000,      # lista virtualizada re-renderizando depois de rolar
+    "pagina": 15000,      # próxima página da paginação do report
+}
+
+# Esperas da execução atual: [{"passo", "ms", "ok", "sinal"}]
+ESPERAS: list[dict] = []
+
+
+def registrar_espera(passo: str, t0: float, ok: bool, sinal: str) -> bool:
+    ESPERAS.append({"passo": passo, "ms": int((time.perf_counter() - t0) * 1000), "ok": ok, "sinal": sinal})
+    diag_evento("espera", **ESPERAS[-1])
+    if not ok and MODO_LEVE and BLOQUEADAS_RECENTES:
+        # a página pode estar esperando algo que o modo leve abortou
+        recentes = list(BLOQUEADAS_RECENTES)
+        diag_evento("espera.bloqueadas", passo=passo, requests=recentes)
+        print(f"⚠️ Espera '{passo}' estourou com o modo leve ligado; últimas bloqueadas: {recentes[-5:]}")
+    return ok
+
+
+def resumo_esperas(reset: bool = True) -> dict:
+    """Total de ms e nº de timeouts por passo. Imprime e (por padrão) zera o histórico."""
+    resumo = {}
+    for e in ESPERAS:
+        r = resumo.setdefault(e["passo"], {"n": 0, "ms": 0, "timeouts": 0})
+        r["n"] += 1
+        r["ms"] += e["ms"]
+        r["timeouts"] += 0 if e["ok"] else 1
+    if resumo:
+        print("⏱️ Esperas:", ", ".join(f"{k}={v['ms']}ms/{v['n']}x" for k, v in resumo.items()))
+    if reset:
+        ESPERAS.clear()
+    return resumo
+
+
+def wait_network_idle(page, passo: str, timeout: int | None = None) -> bool:
+    t0 = time.perf_counter()
+    try:
+        page.wait_for_load_state("networkidle", timeout=timeout or TIMEOUTS_PRONTIDAO.get(passo, 10000))
+        return registrar_espera(passo, t0, True, "networkidle")
+    except Exception:
+        return registrar_espera(passo, t0, False, "networkidle")
+
+
+def wait_locator(locator, passo: str, state: str = "visible", timeout: int | None = None) -> bool:
+    t0 = time.perf_counter()
+    try:
+        locator.wait_for(state=state, timeout=timeout or TIMEOUTS_PRONTIDAO.get(passo, 10000))
+        return registrar_espera(passo, t0, True, state)
+    except Exception:
+        return registrar_espera(passo, t0, False, state)
+
+
+# Assinatura do conteúdo do div.my_table (muda quando o report é re-renderizado)
+JS_MY_TABLE_SIGNATURE = """
+() => {
+    const root = document.querySelector('div.my_table');
+    if (!root) return null;
+    const rows = Array.from(root.querySelectorAll(':scope div.table_row'));
+    const txt = rows.map((r) => r.innerText).join('\\n');
+    return rows.length + '|' + txt.length + '|' + txt.slice(0, 200) + '|' + txt.slice(-200);
+}
+"""
+
+# Pronto quando: tabela com dados E (assinatura mudou OU as datas da tabela já são as pedidas)
+JS_MY_TABLE_READY = """
+([before, ini, fim]) => {
+    const root = document.querySelector('div.my_table');
+    if (!root) return false;
+    const rows = Array.from(root.querySelectorAll(':scope div.table_row'));
+    if (rows.length < 2) return false;
+    const txt = rows.map((r) => r.innerText).join('\\n');
+    const sig = rows.length + '|' + txt.length + '|' + txt.slice(0, 200) + '|' + txt.slice(-200);
+    if (sig !== before) return true;
+    const toIso = (t) => {
+        let m = t.match(/(\\d{4})-(\\d{2})-(\\d{2})/);
+        if (m) return m[0];
+        m = t.match(/(\\d{2})\\/(\\d{2})\\/(\\d{4})/);
+        return m ? `${m[3]}-${m[2]}-${m[1]}` : null;
+    };
+    const dates = rows.slice(1).map((r) => toIso(r.innerText)).filter(Boolean);
+    return dates.length > 0 && dates.every((d) => d >= ini && d <= fim);
+}
+"""
+
+
+def my_table_signature(page) -> str | None:
+    try:
+        return page.evaluate(JS_MY_TABLE_SIGNATURE)
+    except Exception:
+        return None
+
+
+@cronometrar("wait_grid")
+def wait_grid_ready(page, data_inicio: str, data_fim: str, before: str | None, timeout: int | None = None) -> bool:
+    """Espera o div.my_table refletir o período pedido depois do Group (rede ociosa + mudança das linhas)."""
+    t0 = time.perf_counter()
+    timeout = timeout or TIMEOUTS_PRONTIDAO["grid"]
+    ini, fim = periodo_iso(data_inicio, data_fim)
+    try:
+        page.wait_for_load_state("networkidle", timeout=timeout)
+    except Exception:
+        pass
+    try:
+        restante = max(500, timeout - int((time.perf_counter() - t0) * 1000))
+        page.wait_for_function(JS_MY_TABLE_READY, arg=[before, ini, fim], timeout=restante)
+        return registrar_espera("grid", t0, True, "my_table")
+    except Exception:
+        return registrar_espera("grid", t0, False, "my_table")
+
+
 # ==============================
 # ✅ NORMALIZAÇÃO DE DATAS (BR/ISO) + Sheets como SERIAL
 # ==============================
@@ -99,17 +701,49 @@ def to_datetime_br_or_iso(s: str):
     return pd.to_datetime(s, errors="coerce")
 
 
+RE_DATA_ISO = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+RE_DATA_BR = re.compile(r"^\d{2}/\d{2}/\d{4}$")
+RE_DATA_BR_TRACO = re.compile(r"^\d{2}-\d{2}-\d{4}$")
+
+
+def to_datetime_series(values) -> pd.Series:
+    """
+    Versão vetorizada de to_datetime_br_or_iso: um pd.to_datetime por formato (ISO, BR, BR com traço)
+    e parse flexível só para o que sobrar.
+    """
+    s = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+
+    txt = s.astype("string").str.strip().fillna("")
+    out = pd.Series(pd.NaT, index=s.index, dtype="datetime64[ns]")
+    resto = txt != ""
+
+    for pattern, fmt in ((RE_DATA_ISO, "%Y-%m-%d"), (RE_DATA_BR, "%d/%m/%Y"), (RE_DATA_BR_TRACO, "%d-%m-%Y")):
+        m = resto & txt.str.match(pattern)
+        if m.any():
+            out[m] = pd.to_datetime(txt[m], format=fmt, errors="coerce")
+            resto &= ~m
+
+    if resto.any():
+        out[resto] = s[resto].map(to_datetime_br_or_iso)
+
+    return out
+
+
 def normalize_time_column(df: pd.DataFrame, col="Time") -> pd.DataFrame:
     if df is None or df.empty:
         return df
     if col not in df.columns:
         return df
-    dt = df[col].apply(to_datetime_br_or_iso)
-    dt = dt.dt.normalize()
-    df[col] = dt
+    df[col] = to_datetime_series(df[col]).dt.normalize()
     return df
 
 
+def _e_numero(v) -> bool:
+    return pd.api.types.is_number(v) and not isinstance(v, bool)
+
+
 def parse_number(value: str):
     """
     Converte strings tipo:
@@ -119,6 +753,9 @@ def parse_number(value: str):
     """
     if value is None:
         return None
+    if _e_numero(value):
+        # número de verdade (ex.: JSON da captura via rede) não passa pela adivinhação de milhar
+        return None if pd.isna(value) else float(value)
     s = str(value).strip()
     if s == "" or s.lower() in ("-", "nan", "none"):
         return None
@@ -150,6 +787,47 @@ def parse_number(value: str):
         return None
 
 
+RE_NUM_LIXO = re.compile(r"[^\d\.,\-]")
+RE_MILHAR_VIRGULA = re.compile(r"[^,.]*,[^,.]{3}")
+RE_MILHAR_PONTO = re.compile(r"[^,.]*\.[^,.]{3}")
+
+
+def parse_number_series(values) -> pd.Series:
+    """
+    Versão vetorizada de parse_number (mesmas regras), devolve float com NaN onde não der para converter:
+    - "," e "." juntos: padrão EN-US, remove ","
+    - só uma "," com 3 dígitos depois: milhar
+    - só um "." com 3 dígitos depois: milhar
+    Valores já numéricos (int/float, ex.: JSON da captura via rede) passam direto, sem essas regras.
+    """
+    s = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        return s.astype(float)
+
+    numerico = s.map(_e_numero).astype(bool)
+    if numerico.any():
+        out = pd.Series(float("nan"), index=s.index, dtype=float)
+        out[numerico] = s[numerico].astype(float)
+        if not numerico.all():
+            out[~numerico] = parse_number_series(s[~numerico])
+        return out
+
+    txt = s.where(s.notna(), "").astype(str).str.replace(RE_NUM_LIXO, "", regex=True)
+
+    sem_virgula = (
+        (txt.str.contains(",", regex=False) & txt.str.contains(".", regex=False))
+        | txt.str.fullmatch(RE_MILHAR_VIRGULA)
+    )
+    sem_ponto = txt.str.fullmatch(RE_MILHAR_PONTO)
+
+    if sem_virgula.any():
+        txt[sem_virgula] = txt[sem_virgula].str.replace(",", "", regex=False)
+    if sem_ponto.any():
+        txt[sem_ponto] = txt[sem_ponto].str.replace(".", "", regex=False)
+
+    return pd.to_numeric(txt, errors="coerce").astype(float)
+
+
 def sheet_date_serial(ts: pd.Timestamp | datetime | None):
     """Converte datetime -> serial number do Google Sheets (dias desde 1899-12-30)."""
     if ts is None or pd.isna(ts):
@@ -162,85 +840,147 @@ def sheet_date_serial(ts: pd.Timestamp | datetime | None):
 # Google Sheets
 # ==============================
 
+_SHEETS_SERVICE = None
+_SHEETS_LOCK = threading.Lock()
+
+# { spreadsheetId: { título da aba: sheetId numérico } }
+_SHEET_IDS_CACHE: dict[str, dict[str, int]] = {}
+
+
 def sheets_service():
-    from google.oauth2 import service_account
-    from googleapiclient.discovery import build
+    """
+    Client do Sheets cacheado no processo: credenciais + discovery são montados uma vez só.
+    Usa discovery offline (SHEETS_DISCOVERY_FILE ou o estático do googleapiclient), sem ida à rede.
+    """
+    global _SHEETS_SERVICE
+    if _SHEETS_SERVICE is not None:
+        return _SHEETS_SERVICE
 
-    if not os.path.exists(CREDS_FILE):
-        raise FileNotFoundError(
-            f"Arquivo de credenciais não encontrado: {CREDS_FILE}\n"
-            "Coloque 'credenciais.json' na pasta do script (ou ajuste GOOGLE_CREDS_FILE)."
-        )
+    with _SHEETS_LOCK:
+        if _SHEETS_SERVICE is not None:
+            return _SHEETS_SERVICE
 
-    creds = service_account.Credentials.from_service_account_file(CREDS_FILE, scopes=SCOPES)
-    return build("sheets", "v4", credentials=creds)
+        from google.oauth2 import service_account
+        from googleapiclient.discovery import build, build_from_document
 
+        if not os.path.exists(CREDS_FILE):
+            raise FileNotFoundError(
+                f"Arquivo de credenciais não encontrado: {CREDS_FILE}\n"
+                "Coloque 'credenciais.json' na pasta do script (ou ajuste GOOGLE_CREDS_FILE)."
+            )
 
-def quoted_tab_range(tab: str, rng: str) -> str:
-    return f"'{tab}'!{rng}"
+        creds = service_account.Credentials.from_service_account_file(CREDS_FILE, scopes=SCOPES)
 
+        if SHEETS_DISCOVERY_FILE and os.path.exists(SHEETS_DISCOVERY_FILE):
+            with open(SHEETS_DISCOVERY_FILE, "r", encoding="utf-8") as f:
+                _SHEETS_SERVICE = build_from_document(f.read(), credentials=creds)
+        else:
+            _SHEETS_SERVICE = build("sheets", "v4", credentials=creds, cache_discovery=False, static_discovery=True)
 
-def ensure_time_format_in_sheet(sheet_id: str, tab_name: str, pattern: str = "dd/MM/yyyy"):
-    service = sheets_service()
+        return _SHEETS_SERVICE
 
-    meta = service.spreadsheets().get(spreadsheetId=sheet_id).execute()
-    sheet_id_num = None
-    for sh in meta.get("sheets", []):
-        props = sh.get("properties", {})
-        if props.get("title") == tab_name:
-            sheet_id_num = props.get("sheetId")
-            break
 
-    if sheet_id_num is None:
-        raise RuntimeError(f"Aba '{tab_name}' não encontrada no Sheets.")
-
-    body = {
-        "requests": [
-            {
-                "repeatCell": {
-                    "range": {
-                        "sheetId": sheet_id_num,
-                        "startRowIndex": 1,      # pula o header
-                        "startColumnIndex": 0,   # coluna A
-                        "endColumnIndex": 1
-                    },
-                    "cell": {
-                        "userEnteredFormat": {
-                            "numberFormat": {
-                                "type": "DATE",
-                                "pattern": pattern
-                            }
-                        }
-                    },
-                    "fields": "userEnteredFormat.numberFormat"
-                }
+def reset_sheets_service():
+    """Descarta o client e o cache de metadados (ex.: troca de credenciais)."""
+    global _SHEETS_SERVICE
+    with _SHEETS_LOCK:
+        _SHEETS_SERVICE = None
+    invalidate_sheet_ids()
+
+
+def invalidate_sheet_ids(sheet_id: str | None = None):
+    """Invalida o mapa aba->sheetId de uma planilha (ou de todas)."""
+    if sheet_id is None:
+        _SHEET_IDS_CACHE.clear()
+    else:
+        _SHEET_IDS_CACHE.pop(sheet_id, None)
+
+
+def get_sheet_id_num(sheet_id: str, tab_name: str) -> int:
+    """sheetId numérico da aba, com cache. Recarrega uma vez se a aba não estiver no cache (aba nova/renomeada)."""
+    for refresh in (False, True):
+        if refresh or sheet_id not in _SHEET_IDS_CACHE:
+            meta = executar_sheets(sheets_service().spreadsheets().get(
+                spreadsheetId=sheet_id,
+                fields="sheets.properties(sheetId,title)",
+            ), "get")
+            _SHEET_IDS_CACHE[sheet_id] = {
+                sh.get("properties", {}).get("title"): sh.get("properties", {}).get("sheetId")
+                for sh in meta.get("sheets", [])
             }
-        ]
+
+        sheet_id_num = _SHEET_IDS_CACHE[sheet_id].get(tab_name)
+        if sheet_id_num is not None:
+            return sheet_id_num
+
+    raise RuntimeError(f"Aba '{tab_name}' não encontrada no Sheets.")
+
+
+def quoted_tab_range(tab: str, rng: str) -> str:
+    return f"'{tab}'!{rng}"
+
+
+def time_format_request(sheet_id_num: int, pattern: str = "dd/MM/yyyy") -> dict:
+    """Request repeatCell que aplica formato de data na coluna A (sem o header)."""
+    return {
+        "repeatCell": {
+            "range": {
+                "sheetId": sheet_id_num,
+                "startRowIndex": 1,      # pula o header
+                "startColumnIndex": 0,   # coluna A
+                "endColumnIndex": 1
+            },
+            "cell": {
+                "userEnteredFormat": {
+                    "numberFormat": {
+                        "type": "DATE",
+                        "pattern": pattern
+                    }
+                }
+            },
+            "fields": "userEnteredFormat.numberFormat"
+        }
     }
 
-    service.spreadsheets().batchUpdate(
+
+def ensure_time_format_in_sheet(sheet_id: str, tab_name: str, pattern: str = "dd/MM/yyyy"):
+    service = sheets_service()
+    sheet_id_num = get_sheet_id_num(sheet_id, tab_name)
+
+    executar_sheets(service.spreadsheets().batchUpdate(
         spreadsheetId=sheet_id,
-        body=body
-    ).execute()
+        body={"requests": [time_format_request(sheet_id_num, pattern)]}
+    ), "batchUpdate")
 
 
 def ensure_header(sheet_id: str, tab_name: str):
     """Garante que a linha 1 é exatamente o COLUNAS_ALVO."""
     service = sheets_service()
-    resp = service.spreadsheets().values().get(
+    resp = executar_sheets(service.spreadsheets().values().get(
         spreadsheetId=sheet_id,
         range=quoted_tab_range(tab_name, "A1:Z1"),
-    ).execute()
+    ), "values.get")
     values = resp.get("values", [])
     current = values[0] if values else []
 
     if current[:len(COLUNAS_ALVO)] != COLUNAS_ALVO:
-        service.spreadsheets().values().update(
+        executar_sheets(service.spreadsheets().values().update(
             spreadsheetId=sheet_id,
             range=quoted_tab_range(tab_name, "A1"),
             valueInputOption="RAW",
             body={"values": [COLUNAS_ALVO]},
-        ).execute()
+        ), "values.update")
+
+
+def time_map_from_values(values: list[list], start_row: int = 2) -> dict[str, int]:
+    """Converte os valores lidos de A{start_row}:A em { 'YYYY-MM-DD': row_number }."""
+    if not values:
+        return {}
+    dts = to_datetime_series([row[0] if row else "" for row in values])
+    rows = pd.Series(range(start_row, start_row + len(values)), index=dts.index)
+    ok = dts.notna()
+    # dict() mantém a última linha quando a mesma data aparece mais de uma vez
+    return dict(zip(dts[ok].dt.strftime("%Y-%m-%d"), rows[ok].tolist()))
 
 
 def get_time_to_row_map(sheet_id: str, tab_name: str) -> dict[str, int]:
@@ -249,37 +989,93 @@ def get_time_to_row_map(sheet_id: str, tab_name: str) -> dict[str, int]:
     row_number é 1-based no Sheets (A1 é row 1).
     """
     service = sheets_service()
-    resp = service.spreadsheets().values().get(
+    resp = executar_sheets(service.spreadsheets().values().get(
         spreadsheetId=sheet_id,
         range=quoted_tab_range(tab_name, "A2:A"),
-    ).execute()
+    ), "values.get")
 
-    values = resp.get("values", [])
-    mapping = {}
-    for i, row in enumerate(values, start=2):
-        v = row[0] if row else ""
-        dt = to_datetime_br_or_iso(v)
-        if pd.isna(dt):
-            continue
-        key = pd.Timestamp(dt).strftime("%Y-%m-%d")
-        mapping[key] = i
+    return time_map_from_values(resp.get("values", []))
 
-    return mapping
 
+# ==============================
+# 🗂️ Índice local Time->linha (persistido)
+# ==============================
 
-def upsert_sheet_by_time(df_new: pd.DataFrame, sheet_id: str, tab_name: str):
+def row_index_path(sheet_id: str, tab_name: str) -> str:
+    safe_tab = re.sub(r"[^\w\-]", "_", tab_name)
+    return os.path.join(ROW_INDEX_DIR, f"{sheet_id}__{safe_tab}.json")
+
+
+def load_row_index(sheet_id: str, tab_name: str) -> dict[str, int] | None:
+    path = row_index_path(sheet_id, tab_name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return {k: int(v) for k, v in data.get("rows", {}).items()}
+    except Exception:
+        return None
+
+
+def save_row_index(sheet_id: str, tab_name: str, time_to_row: dict[str, int]):
+    ensure_dir(ROW_INDEX_DIR)
+    path = row_index_path(sheet_id, tab_name)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "sheet_id": sheet_id,
+            "tab": tab_name,
+            "last_row": max(time_to_row.values(), default=1),
+            "ts": datetime.now().isoformat(),
+            "rows": time_to_row,
+        }, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def row_index_probe_ranges(tab_name: str, time_to_row: dict[str, int]) -> list[str]:
+    """Faixas baratas para conferir o índice: A2 e a última linha indexada + a seguinte."""
+    last_row = max(time_to_row.values(), default=1)
+    return [
+        quoted_tab_range(tab_name, "A2:A2"),
+        quoted_tab_range(tab_name, f"A{last_row}:A{last_row + 1}"),
+    ]
+
+
+def chave_data_celula(v) -> str | None:
+    """Célula da coluna A (texto formatado ou serial do UNFORMATTED_VALUE) -> 'YYYY-MM-DD' ou None."""
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        return (pd.Timestamp("1899-12-30") + pd.Timedelta(days=int(v))).strftime("%Y-%m-%d")
+    dt = to_datetime_br_or_iso(v)
+    return None if pd.isna(dt) else pd.Timestamp(dt).strftime("%Y-%m-%d")
+
+
+def row_index_matches(time_to_row: dict[str, int], first_vals: list[list], last_vals: list[list]) -> bool:
     """
-    ✅ NÃO limpa a planilha inteira.
-    ✅ Atualiza linha existente pela data (Time).
-    ✅ Se não existir, apenda no final.
-    Mantém somente COLUNAS_ALVO na ordem.
+    True se o Sheets ainda bate com o índice: a 1ª e a última linha indexadas têm as mesmas datas
+    e não existe nada logo depois da última (ninguém apendou/apagou por fora).
     """
-    service = sheets_service()
+    def _key(vals, i=0):
+        return chave_data_celula(vals[i][0] if len(vals) > i and vals[i] else "")
+
+    if not time_to_row:
+        return _key(first_vals) is None
 
-    ensure_header(sheet_id, tab_name)
-    ensure_time_format_in_sheet(sheet_id, tab_name, pattern="dd/MM/yyyy")
+    row_to_time = {r: k for k, r in time_to_row.items()}
+    if 2 in row_to_time and _key(first_vals) != row_to_time[2]:
+        return False
 
-    # normaliza df
+    last_row = max(row_to_time)
+    if _key(last_vals) != row_to_time[last_row]:
+        return False
+    return not (len(last_vals) > 1 and last_vals[1] and str(last_vals[1][0]).strip())
+
+
+def build_sheet_rows(df_new: pd.DataFrame) -> list[tuple[str, list]]:
+    """
+    Converte o lote em [(YYYY-MM-DD, [A..H])] ordenado por data, já no formato do Sheets
+    (Time como serial, inteiros/floats com 0 no lugar de vazio). Linhas sem data são descartadas.
+    """
     df = df_new.copy()
     for c in COLUNAS_ALVO:
         if c not in df.columns:
@@ -287,114 +1083,838 @@ def upsert_sheet_by_time(df_new: pd.DataFrame, sheet_id: str, tab_name: str):
     df = df[COLUNAS_ALVO].copy()
     df = normalize_time_column(df, "Time")
 
-    # mapa de linhas existentes
-    time_to_row = get_time_to_row_map(sheet_id, tab_name)
+    # ordena o df (para append ficar “dia após dia”) e descarta linhas sem data
+    df = df[df["Time"].notna()].sort_values("Time", ascending=True, kind="stable")
+    if df.empty:
+        return []
 
-    # pega último row com dados (para append)
-    last_row = 1
-    if time_to_row:
-        last_row = max(time_to_row.values())
+    keys = df["Time"].dt.strftime("%Y-%m-%d").tolist()
+    serials = (df["Time"] - pd.Timestamp("1899-12-30")).dt.days.astype("int64").tolist()
 
-    # ordena o df (para append ficar “dia após dia”)
-    df["_sort"] = df["Time"]
-    df = df.sort_values("_sort", ascending=True).drop(columns=["_sort"])
+    # .tolist() devolve int/float nativos do Python (serializáveis no JSON do Sheets)
+    cols = [serials]
+    for c in ("Registrations", "FTDs", "QFTDs, CPA"):
+        cols.append(pd.to_numeric(df[c], errors="coerce").fillna(0).astype("int64").tolist())
+    for c in ("FTDs Amount", "Deposits Amount", "RevShare", "CPA"):
+        cols.append(pd.to_numeric(df[c], errors="coerce").fillna(0.0).astype(float).tolist())
 
-    updates = []
-    appends = []
+    return [(k, list(v)) for k, v in zip(keys, zip(*cols))]
 
-    for _, r in df.iterrows():
-        dt = r["Time"]
-        if pd.isna(dt):
-            continue
 
-        key = pd.Timestamp(dt).strftime("%Y-%m-%d")
-        serial = sheet_date_serial(dt)
-
-        row_values = [
-            serial,
-            int(r["Registrations"]) if pd.notna(r["Registrations"]) else 0,
-            int(r["FTDs"]) if pd.notna(r["FTDs"]) else 0,
-            int(r["QFTDs, CPA"]) if pd.notna(r["QFTDs, CPA"]) else 0,
-            float(r["FTDs Amount"]) if pd.notna(r["FTDs Amount"]) else 0.0,
-            float(r["Deposits Amount"]) if pd.notna(r["Deposits Amount"]) else 0.0,
-            float(r["RevShare"]) if pd.notna(r["RevShare"]) else 0.0,
-            float(r["CPA"]) if pd.notna(r["CPA"]) else 0.0,
-        ]
+def _first_row_of_range(a1_range: str) -> int | None:
+    """'BET7K'!A10:H12 -> 10"""
+    m = re.search(r"!\$?[A-Z]+\$?(\d+)", a1_range or "")
+    return int(m.group(1)) if m else None
+
+
+# Como a coluna A aparece (FORMATTED_VALUE) quando o formato de data já está aplicado
+RE_DATA_FORMATADA = {"dd/MM/yyyy": re.compile(r"\d{2}/\d{2}/\d{4}")}
+COLUNAS_LETRAS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
 
-        if key in time_to_row:
-            row_num = time_to_row[key]
-            rng = quoted_tab_range(tab_name, f"A{row_num}:H{row_num}")
-            updates.append({"range": rng, "values": [row_values]})
+
+def formato_data_aplicado(valores: list[list], pattern: str = "dd/MM/yyyy") -> bool:
+    """True se todas as datas lidas da coluna A já vêm no formato (sem nada lido, não dá para saber)."""
+    regex = RE_DATA_FORMATADA.get(pattern)
+    textos = [str(v[0]).strip() for v in valores if v and str(v[0]).strip()]
+    return regex is not None and bool(textos) and all(regex.fullmatch(t) for t in textos)
+
+
+def celula_igual(novo, atual, tol: float = SHEETS_TOLERANCIA) -> bool:
+    if atual in ("", None):
+        return novo in ("", None)
+    try:
+        return math.isclose(float(novo), float(atual), rel_tol=tol, abs_tol=tol)
+    except (TypeError, ValueError):
+        return str(novo) == str(atual)
+
+
+def celulas_diferentes(novo: list, atual: list) -> tuple[int, int] | None:
+    """
+    (primeira, última) coluna de valor (B em diante) que mudou entre a linha nova e a do Sheets;
+    None se igual. A coluna A é a chave: data diferente ali é índice desatualizado, não célula a corrigir.
+    """
+    difs = [i for i, v in enumerate(novo) if i > 0 and not celula_igual(v, atual[i] if i < len(atual) else "")]
+    return (difs[0], difs[-1]) if difs else None
+
+
+def agrupar_linhas(linhas: list[int], folga: int = 20) -> list[tuple[int, int]]:
+    """[2, 3, 4, 10, 200] -> [(2, 10), (200, 200)]: blocos contíguos (tolerando `folga` linhas de buraco)."""
+    blocos = []
+    for r in sorted(set(linhas)):
+        if blocos and r - blocos[-1][1] <= folga:
+            blocos[-1] = (blocos[-1][0], r)
         else:
-            appends.append(row_values)
+            blocos.append((r, r))
+    return blocos
 
-    # faz updates em batch
-    if updates:
-        service.spreadsheets().values().batchUpdate(
-            spreadsheetId=sheet_id,
-            body={"valueInputOption": "USER_ENTERED", "data": updates},
-        ).execute()
 
-    # append no final (depois do last_row)
-    if appends:
-        # append natural no fim da tabela
-        service.spreadsheets().values().append(
-            spreadsheetId=sheet_id,
-            range=quoted_tab_range(tab_name, "A1"),
+def value_ranges(resp: dict, n: int) -> list[list]:
+    """valueRanges de um batchGet como lista de `values`, completando com [] até n faixas."""
+    vrs = [vr.get("values", []) for vr in (resp or {}).get("valueRanges", [])]
+    return vrs + [[]] * (n - len(vrs))
+
+
+class SheetsUpsertBuffer:
+    """
+    Acumula linhas de várias capturas e grava tudo no Sheets com o mínimo de requests.
+
+    - 1ª flush: 1 batchGet (header + coluna A) + 1 batchUpdate de formato (pulado se já aplicado).
+    - toda flush: 1 batchGet (sondagem do índice + linhas-alvo do diff) + 1 values.batchUpdate só
+      com as células que mudaram (header se preciso) + 1 append (linhas novas).
+    O mapa Time->linha é mantido localmente entre flushes (linhas apendadas entram no mapa) e
+    conferido a cada flush: se a sondagem ou a coluna A das linhas-alvo não bater (linha apagada/
+    inserida por fora), o mapa é relido antes de escrever qualquer coisa.
+    Flush automático ao passar de max_rows linhas pendentes ou max_seconds desde a última flush.
+    `totais` acumula as contagens de todas as flushes (automáticas inclusive); close() devolve os totais.
+    """
+
+    def __init__(self, sheet_id: str, tab_name: str, max_rows: int = 500, max_seconds: float = 120.0,
+                 pattern: str = "dd/MM/yyyy"):
+        self.sheet_id = sheet_id
+        self.tab_name = tab_name
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.pattern = pattern
+
+        self._pending: dict[str, list] = {}
+        self._time_to_row: dict[str, int] | None = None
+        self._header_ok = False
+        self._formato_ok = False
+        self._last_flush = datetime.now()
+        self.requests = 0
+        self.totais = {"unchanged": 0, "updated": 0, "appended": 0}
+
+    def add(self, df: pd.DataFrame):
+        if df is None or df.empty:
+            return
+        for key, row_values in build_sheet_rows(df):
+            self._pending[key] = row_values  # mesma data: último vence
+        if self._should_flush():
+            self.flush()
+
+    def _should_flush(self) -> bool:
+        if len(self._pending) >= self.max_rows:
+            return True
+        return bool(self._pending) and (datetime.now() - self._last_flush).total_seconds() >= self.max_seconds
+
+    def _prepare_ranges(self) -> tuple[dict[str, int] | None, list[str]]:
+        """Faixas do preparo: header + (sondagem do índice local OU coluna A inteira)."""
+        cached = load_row_index(self.sheet_id, self.tab_name)
+        ranges = [quoted_tab_range(self.tab_name, "A1:Z1")]
+        if cached is not None:
+            ranges += row_index_probe_ranges(self.tab_name, cached)
+        else:
+            ranges.append(quoted_tab_range(self.tab_name, "A2:A"))
+        return cached, ranges
+
+    def _absorb_prepare(self, cached: dict[str, int] | None, vrs: list[list]):
+        """Aplica o resultado do batchGet de preparo. A coluna A só é relida por completo se o índice divergir."""
+        current = vrs[0][0] if vrs[0] else []
+        self._header_ok = current[:len(COLUNAS_ALVO)] == COLUNAS_ALVO
+        self._formato_ok = formato_data_aplicado([v for vr in vrs[1:] for v in vr], self.pattern)
+
+        if cached is not None and row_index_matches(cached, vrs[1], vrs[2]):
+            self._time_to_row = cached
+        elif cached is not None:
+            self._reconstruir_indice()
+        else:
+            self._time_to_row = time_map_from_values(vrs[1])
+            save_row_index(self.sheet_id, self.tab_name, self._time_to_row)
+
+    def format_request(self) -> dict:
+        return time_format_request(get_sheet_id_num(self.sheet_id, self.tab_name), self.pattern)
+
+    def _prepare(self, service):
+        """Preparo em 1 batchGet + 1 batchUpdate de formato (uma vez por writer)."""
+        cached, ranges = self._prepare_ranges()
+        resp = executar_sheets(service.spreadsheets().values().batchGet(
+            spreadsheetId=self.sheet_id,
+            ranges=ranges,
+        ), "values.batchGet")
+        self.requests += 1
+        self._absorb_prepare(cached, value_ranges(resp, len(ranges)))
+
+        if self._formato_ok:
+            contar("sheets.formato_pulado")
+            return
+        executar_sheets(service.spreadsheets().batchUpdate(
+            spreadsheetId=self.sheet_id,
+            body={"requests": [self.format_request()]},
+        ), "batchUpdate")
+        self.requests += 1
+        self._formato_ok = True
+
+    def _blocos_diff(self) -> list[tuple[int, int]]:
+        """Blocos de linhas do Sheets que o pendente vai sobrescrever (para ler antes e comparar)."""
+        if not SHEETS_DIFF:
+            return []
+        return agrupar_linhas([self._time_to_row[k] for k in self._pending if k in self._time_to_row])
+
+    def _diff_ranges(self, blocos: list[tuple[int, int]]) -> list[str]:
+        fim_col = COLUNAS_LETRAS[len(COLUNAS_ALVO) - 1]
+        return [quoted_tab_range(self.tab_name, f"A{a}:{fim_col}{b}") for a, b in blocos]
+
+    @staticmethod
+    def _absorb_diff(blocos: list[tuple[int, int]], vrs: list[list]) -> dict[int, list]:
+        """{ linha: valores atuais } a partir do batchGet (UNFORMATTED_VALUE) dos blocos."""
+        atuais = {}
+        for (a, _), vals in zip(blocos, vrs):
+            for i, row in enumerate(vals):
+                atuais[a + i] = row
+        return atuais
+
+    def _leitura_ranges(self, blocos: list[tuple[int, int]], sondar: bool) -> list[str]:
+        """Faixas da leitura de cada flush: sondagem do índice (se pedida) + linhas-alvo do diff."""
+        sonda = row_index_probe_ranges(self.tab_name, self._time_to_row) if sondar else []
+        return sonda + self._diff_ranges(blocos)
+
+    def _absorb_leitura(self, blocos: list[tuple[int, int]], sondar: bool,
+                        vrs: list[list]) -> tuple[dict[int, list] | None, bool]:
+        """(linhas atuais, índice ok). Índice não ok = sondagem divergiu ou a data na coluna A não é a esperada."""
+        if sondar:
+            if not row_index_matches(self._time_to_row, vrs[0], vrs[1]):
+                return None, False
+            vrs = vrs[2:]
+        if not blocos:
+            return None, True
+
+        atuais = self._absorb_diff(blocos, vrs)
+        row_to_time = {r: k for k, r in self._time_to_row.items()}
+        for a, b in blocos:
+            for r in range(a, b + 1):
+                esperado = row_to_time.get(r)
+                if esperado is not None and chave_data_celula((atuais.get(r) or [""])[0]) != esperado:
+                    return None, False
+        return atuais, True
+
+    def _reconstruir_indice(self):
+        print(f"ℹ️ Índice local Time->linha de '{self.tab_name}' divergiu do Sheets, reconstruindo...")
+        contar("sheets.indice_divergiu")
+        self._time_to_row = get_time_to_row_map(self.sheet_id, self.tab_name)
+        self.requests += 1
+        save_row_index(self.sheet_id, self.tab_name, self._time_to_row)
+
+    def _ler_atuais(self, service, sondar: bool = True) -> dict[int, list] | None:
+        """
+        Lê (1 batchGet) as linhas que o pendente vai sobrescrever, conferindo o índice no mesmo request.
+        Se o índice divergiu, reconstrói e relê uma vez; divergir de novo é a planilha mudando durante o UPSERT.
+        """
+        for tentativa in range(2):
+            blocos = self._blocos_diff()
+            ranges = self._leitura_ranges(blocos, sondar)
+            if not ranges:
+                return None
+            resp = executar_sheets(service.spreadsheets().values().batchGet(
+                spreadsheetId=self.sheet_id,
+                ranges=ranges,
+                valueRenderOption="UNFORMATTED_VALUE",
+            ), "values.batchGet")
+            self.requests += 1
+            atuais, ok = self._absorb_leitura(blocos, sondar, value_ranges(resp, len(ranges)))
+            if ok:
+                return atuais
+            if tentativa:
+                break
+            self._reconstruir_indice()
+            sondar = False
+        raise RuntimeError(f"Aba '{self.tab_name}' mudou durante o UPSERT (coluna A não bate com o índice relido).")
+
+    def _plan(self, atuais: dict[int, list] | None = None) -> tuple[list[dict], list[list], list[str], dict]:
+        """
+        Separa o pendente em (data do values.batchUpdate, linhas novas, chaves das linhas novas, stats).
+        Com `atuais` (linhas lidas do Sheets) só entra no batchUpdate o trecho de células que mudou.
+        """
+        stats = {"unchanged": 0, "updated": 0, "appended": 0}
+        data = []
+        if not self._header_ok:
+            data.append({"range": quoted_tab_range(self.tab_name, "A1"), "values": [COLUNAS_ALVO]})
+
+        appends = []
+        append_keys = []
+        for key in sorted(self._pending):
+            row_values = self._pending[key]
+            row_num = self._time_to_row.get(key)
+            if row_num is None:
+                appends.append(row_values)
+                append_keys.append(key)
+                continue
+
+            c0, c1 = 0, len(row_values) - 1
+            if atuais is not None:
+                span = celulas_diferentes(row_values, atuais.get(row_num, []))
+                if span is None:
+                    stats["unchanged"] += 1
+                    continue
+                c0, c1 = span
+            rng = f"{COLUNAS_LETRAS[c0]}{row_num}:{COLUNAS_LETRAS[c1]}{row_num}"
+            data.append({"range": quoted_tab_range(self.tab_name, rng), "values": [row_values[c0:c1 + 1]]})
+            stats["updated"] += 1
+        return data, appends, append_keys, stats
+
+    def _append(self, service, appends: list[list], append_keys: list[str]) -> int:
+        resp = executar_sheets(service.spreadsheets().values().append(
+            spreadsheetId=self.sheet_id,
+            range=quoted_tab_range(self.tab_name, "A1"),
             valueInputOption="USER_ENTERED",
             insertDataOption="INSERT_ROWS",
             body={"values": appends},
-        ).execute()
+        ), "values.append", idempotente=False)
+        self.requests += 1
+
+        first = _first_row_of_range(resp.get("updates", {}).get("updatedRange", ""))
+        if first is not None:
+            for i, key in enumerate(append_keys):
+                self._time_to_row[key] = first + i
+            save_row_index(self.sheet_id, self.tab_name, self._time_to_row)
+        else:
+            # sem a faixa apendada não dá para saber as linhas: relê o mapa na próxima flush
+            self._time_to_row = None
+            try:
+                os.remove(row_index_path(self.sheet_id, self.tab_name))
+            except OSError:
+                pass
+        return len(appends)
+
+    def _done(self, stats: dict):
+        self._pending.clear()
+        self._last_flush = datetime.now()
+        for k, v in stats.items():
+            self.totais[k] += v
+
+    def flush(self) -> dict:
+        """Envia o que estiver pendente. Devolve a contagem desta flush (os totais ficam em `totais`)."""
+        if not self._pending:
+            return {"unchanged": 0, "updated": 0, "appended": 0}
+
+        service = sheets_service()
+        # índice recém-preparado já foi sondado neste flush; senão a sondagem vai junto com o diff
+        sondar = self._time_to_row is not None
+        if not sondar:
+            self._prepare(service)
+
+        data, appends, append_keys, stats = self._plan(self._ler_atuais(service, sondar))
+        if data:
+            executar_sheets(service.spreadsheets().values().batchUpdate(
+                spreadsheetId=self.sheet_id,
+                body={"valueInputOption": "USER_ENTERED", "data": data},
+            ), "values.batchUpdate")
+            self.requests += 1
+            self._header_ok = True
+
+        if appends:
+            stats["appended"] = self._append(service, appends, append_keys)
+
+        self._done(stats)
+        return stats
+
+    def close(self) -> dict:
+        """Flush final. Devolve os totais da vida do buffer."""
+        self.flush()
+        return dict(self.totais)
+
+
+class SheetsMultiUpsert:
+    """
+    Writer único para várias abas (de uma ou mais planilhas). A cada flush, por planilha:
+    1 batchGet de preparo e 1 batchUpdate de formato (só para abas novas no writer) e
+    1 values.batchUpdate com os updates de todas as abas. Linhas novas seguem num append por aba
+    (a API não tem append em lote). Thread-safe: pode ser alimentado de várias threads.
+    """
+
+    def __init__(self, max_rows: int = 500, max_seconds: float = 120.0, pattern: str = "dd/MM/yyyy"):
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.pattern = pattern
+        self.requests = 0
+        self.totais: dict[tuple[str, str], dict] = {}
+        self._buffers: dict[tuple[str, str], SheetsUpsertBuffer] = {}
+        self._lock = threading.RLock()
+        self._last_flush = datetime.now()
+
+    def buffer(self, tab_name: str, sheet_id: str = SHEET_ID) -> SheetsUpsertBuffer:
+        key = (sheet_id, tab_name)
+        if key not in self._buffers:
+            # flush só pelo writer combinado
+            self._buffers[key] = SheetsUpsertBuffer(sheet_id, tab_name, max_rows=float("inf"),
+                                                    max_seconds=float("inf"), pattern=self.pattern)
+        return self._buffers[key]
+
+    def add(self, tab_name: str, df: pd.DataFrame, sheet_id: str = SHEET_ID):
+        with self._lock:
+            self.buffer(tab_name, sheet_id).add(df)
+            if self._should_flush():
+                self.flush()
+
+    def _pendentes(self) -> int:
+        return sum(len(b._pending) for b in self._buffers.values())
+
+    def _should_flush(self) -> bool:
+        n = self._pendentes()
+        if n >= self.max_rows:
+            return True
+        return n > 0 and (datetime.now() - self._last_flush).total_seconds() >= self.max_seconds
+
+    def _flush_planilha(self, service, sheet_id: str, bufs: list[SheetsUpsertBuffer]) -> int:
+        requests = 0
+        novos = [b for b in bufs if b._time_to_row is None]
+        if novos:
+            preparo = [(b, *b._prepare_ranges()) for b in novos]
+            ranges = [r for _, _, rs in preparo for r in rs]
+            resp = executar_sheets(service.spreadsheets().values().batchGet(
+                spreadsheetId=sheet_id,
+                ranges=ranges,
+            ), "values.batchGet")
+            vrs = value_ranges(resp, len(ranges))
+            i = 0
+            for b, cached, rs in preparo:
+                b._absorb_prepare(cached, vrs[i:i + len(rs)])
+                i += len(rs)
+            requests += 1
+
+            sem_formato = [b for b in novos if not b._formato_ok]
+            if sem_formato:
+                executar_sheets(service.spreadsheets().batchUpdate(
+                    spreadsheetId=sheet_id,
+                    body={"requests": [b.format_request() for b in sem_formato]},
+                ), "batchUpdate")
+                requests += 1
+                for b in sem_formato:
+                    b._formato_ok = True
+            contar("sheets.formato_pulado", len(novos) - len(sem_formato))
+
+        # sondagem do índice + linhas-alvo do diff de todas as abas num batchGet só
+        leituras = [(b, b._blocos_diff(), b not in novos) for b in bufs]
+        faixas = [b._leitura_ranges(bl, sondar) for b, bl, sondar in leituras]
+        ranges = [r for rs in faixas for r in rs]
+        atuais = {b: None for b in bufs}
+        if ranges:
+            resp = executar_sheets(service.spreadsheets().values().batchGet(
+                spreadsheetId=sheet_id,
+                ranges=ranges,
+                valueRenderOption="UNFORMATTED_VALUE",
+            ), "values.batchGet")
+            requests += 1
+            vrs = value_ranges(resp, len(ranges))
+            i = 0
+            for (b, bl, sondar), rs in zip(leituras, faixas):
+                atuais[b], ok = b._absorb_leitura(bl, sondar, vrs[i:i + len(rs)])
+                i += len(rs)
+                if not ok:
+                    # aba mexida por fora: relê o mapa e as linhas-alvo só dela
+                    antes = b.requests
+                    b._reconstruir_indice()
+                    atuais[b] = b._ler_atuais(service, sondar=False)
+                    requests += b.requests - antes
+
+        planos = [(b, *b._plan(atuais[b])) for b in bufs]
+        data = [d for _, dados, _, _, _ in planos for d in dados]
+        if data:
+            executar_sheets(service.spreadsheets().values().batchUpdate(
+                spreadsheetId=sheet_id,
+                body={"valueInputOption": "USER_ENTERED", "data": data},
+            ), "values.batchUpdate")
+            requests += 1
+
+        for b, _, appends, append_keys, stats in planos:
+            b._header_ok = True
+            if appends:
+                stats["appended"] = b._append(service, appends, append_keys)
+                requests += 1
+            b._done(stats)
+            tot = self.totais.setdefault((sheet_id, b.tab_name), {"unchanged": 0, "updated": 0, "appended": 0})
+            for k, v in stats.items():
+                tot[k] += v
+        return requests
+
+    def flush(self) -> dict:
+        """Envia o pendente de todas as abas. Devolve os totais acumulados por aba."""
+        with self._lock:
+            por_planilha: dict[str, list[SheetsUpsertBuffer]] = {}
+            for (sheet_id, _), b in self._buffers.items():
+                if b._pending:
+                    por_planilha.setdefault(sheet_id, []).append(b)
+
+            if por_planilha:
+                service = sheets_service()
+                for sheet_id, bufs in por_planilha.items():
+                    self.requests += self._flush_planilha(service, sheet_id, bufs)
+
+            self._last_flush = datetime.now()
+            return {tab: dict(v) for (_, tab), v in self.totais.items()}
+
+    def close(self) -> dict:
+        return self.flush()
+
+
+def upsert_sheet_by_time(df_new: pd.DataFrame, sheet_id: str, tab_name: str):
+    """
+    ✅ NÃO limpa a planilha inteira.
+    ✅ Atualiza linha existente pela data (Time).
+    ✅ Se não existir, apenda no final.
+    Mantém somente COLUNAS_ALVO na ordem.
+    """
+    writer = SheetsUpsertBuffer(sheet_id, tab_name)
+    writer.add(df_new)
+    stats = writer.close()
 
-    print("✅ Sheets atualizado por UPSERT (sem recriar a planilha inteira).")
+    print(f"✅ Sheets atualizado por UPSERT: {stats['updated']} atualizada(s), {stats['appended']} nova(s), "
+          f"{stats['unchanged']} sem mudança.")
+    return stats
 
 
 # ==============================
 # JSON histórico/cache
 # ==============================
 
-def dump_json_history(df: pd.DataFrame, meta: dict):
-    ensure_dir(JSON_DIR)
+def abrir_historico(db: str | None = None):
+    """Abre o SQLite do histórico; na primeira vez importa os report_*.json antigos que existirem."""
+    db = db or HISTORY_DB
+    conn = historico_7k.abrir(db)
+    if db == HISTORY_DB and historico_7k.vazio(conn) and os.path.isdir(JSON_DIR):
+        stats = historico_7k.importar_json(conn, JSON_DIR)
+        if stats["arquivos"]:
+            print(f"🗃️ Histórico JSON importado para {HISTORY_DB}: {stats}")
+    return conn
 
-    df_json = df.copy() if df is not None else pd.DataFrame()
-    if df_json is not None and not df_json.empty and "Time" in df_json.columns:
+
+def linhas_historico(df: pd.DataFrame | None) -> list[dict]:
+    """Lote normalizado -> [{"Time": "YYYY-MM-DD", ...}] (formato do latest.json e do SQLite)."""
+    if df is None or df.empty:
+        return []
+    df_json = df.copy()
+    if "Time" in df_json.columns:
         df_json = normalize_time_column(df_json, "Time")
         df_json["Time"] = df_json["Time"].dt.strftime("%Y-%m-%d")
+    return df_json.to_dict(orient="records")
+
+
+def dump_json_history(df: pd.DataFrame, meta: dict, history_db: str | None = None, latest_path: str | None = None,
+                      captured_at_por_dia: dict[str, str] | None = None):
+    """
+    Grava latest.json + histórico SQLite. history_db/latest_path: outro destino (ex.: uma conta parceira).
+    captured_at_por_dia: { 'YYYY-MM-DD': ts } da captura original (reprocessamento não "recaptura" o dia).
+    """
+    ensure_dir(JSON_DIR)
+    history_db = history_db or HISTORY_DB
+    latest_path = latest_path or JSON_LATEST
+
+    if "metricas" not in meta:
+        meta = {**meta, "metricas": metricas_execucao()}
+    exportar_metricas(meta)
 
     payload = {
         "meta": meta,
-        "rows": df_json.to_dict(orient="records") if df_json is not None else [],
+        "rows": linhas_historico(df),
     }
 
-    with open(JSON_LATEST, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
+    # latest.json continua existindo (cache da última execução), mas compacto
+    with open(latest_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(",", ":"), default=str)
+
+    conn = abrir_historico(history_db)
+    try:
+        stats = historico_7k.gravar_lote(conn, payload["rows"], meta, captured_at_por_dia=captured_at_por_dia)
+    finally:
+        conn.close()
+
+    print(f"🧾 Histórico salvo: {history_db} {stats}")
+    print(f"🧾 JSON cache (latest): {latest_path}")
+
+
+class HistoricoLotes:
+    """
+    Histórico gravado lote a lote (captura em streaming): cada lote vai para o SQLite e para o
+    latest.json assim que chega. Na memória ficam só as datas capturadas e as primeiras linhas (preview).
+    close(meta) fecha a execução (meta + métricas + meta["sem_dados"]; meta["parcial"] marca captura
+    interrompida) e devolve as datas capturadas num DataFrame (coluna Time) ou, com guardar_linhas=True,
+    os lotes combinados (Time + métricas, como normalizar_report).
+    """
+
+    def __init__(self, meta: dict | None = None, history_db: str | None = None, latest_path: str | None = None,
+                 preview: int = 20, guardar_linhas: bool = False):
+        ensure_dir(JSON_DIR)
+        self.history_db = history_db or HISTORY_DB
+        self.latest_path = latest_path or JSON_LATEST
+        self.captured_at = datetime.now().isoformat()
+        self.chaves: set[str] = set()
+        self.stats = {"novos": 0, "revisados": 0, "iguais": 0}
+        self.preview = pd.DataFrame(columns=COLUNAS_ALVO)
+        self._n_preview = preview
+        self._frames: list[pd.DataFrame] | None = [] if guardar_linhas else None
+        self._lock = threading.Lock()
+
+        conn = abrir_historico(self.history_db)
+        try:
+            self._run_id = historico_7k.abrir_run(conn, {**(meta or {}), "parcial": True}, self.captured_at)
+        finally:
+            conn.close()
+
+        # latest.json em streaming: "rows" vai sendo escrito; "meta" entra no fechamento
+        ensure_dir(os.path.dirname(self.latest_path) or ".")
+        fd, self._tmp = tempfile.mkstemp(dir=os.path.dirname(self.latest_path) or ".",
+                                         prefix=os.path.basename(self.latest_path) + ".", suffix=".tmp")
+        self._f = os.fdopen(fd, "w", encoding="utf-8")
+        self._f.write('{"rows":[')
+        self._primeira = True
+
+    def add(self, df: pd.DataFrame):
+        rows = linhas_historico(df)
+        if not rows:
+            return
+        with self._lock:
+            # conexão por lote: add pode vir de threads diferentes (asyncio.to_thread)
+            conn = abrir_historico(self.history_db)
+            try:
+                st = historico_7k.gravar_valores(conn, rows, self.captured_at, self._run_id)
+            finally:
+                conn.close()
+            for k, v in st.items():
+                self.stats[k] += v
+
+            for r in rows:
+                self._f.write(("" if self._primeira else ",")
+                              + json.dumps(r, ensure_ascii=False, separators=(",", ":"), default=str))
+                self._primeira = False
+            self.chaves.update(r["Time"] for r in rows)
+            if self._frames is not None:
+                self._frames.append(df)
+            if len(self.preview) < self._n_preview:
+                self.preview = combinar_lotes([self.preview, df]).head(self._n_preview)
+
+    def close(self, meta: dict) -> pd.DataFrame:
+        with self._lock:
+            meta = {"parcial": False, **meta, "rows": len(self.chaves)}
+            if "metricas" not in meta:
+                meta = {**meta, "metricas": metricas_execucao()}
+            exportar_metricas(meta)
+
+            conn = abrir_historico(self.history_db)
+            try:
+                historico_7k.atualizar_run(conn, self._run_id, meta)
+                historico_7k.gravar_sem_dados(conn, meta.get("sem_dados") or [], self.captured_at, self._run_id)
+            finally:
+                conn.close()
+
+            self._f.write('],"meta":' + json.dumps(meta, ensure_ascii=False, separators=(",", ":"), default=str) + "}")
+            self._f.close()
+            os.replace(self._tmp, self.latest_path)
+
+        print(f"🧾 Histórico salvo: {self.history_db} {self.stats}")
+        print(f"🧾 JSON cache (latest): {self.latest_path}")
+        if meta["parcial"]:
+            print(f"⚠️ Execução marcada como parcial no histórico: {len(self.chaves)} dia(s) gravados antes da falha.")
+        if self._frames is not None:
+            return combinar_lotes(self._frames)
+        return pd.DataFrame({"Time": pd.to_datetime(sorted(self.chaves))})
+
+
+def _iso(data_ddmmyyyy: str) -> str:
+    return parse_ddmmyyyy(data_ddmmyyyy).strftime("%Y-%m-%d")
+
+
+def arquivar_bruto(df_bruto: pd.DataFrame, data_inicio: str, data_fim: str, origem: str = "dom",
+                   history_db: str | None = None):
+    """Guarda o texto cru (antes de normalizar) de uma captura/lote. Falha aqui não derruba a captura."""
+    if not ARQUIVAR_BRUTO or df_bruto is None or df_bruto.empty:
+        return
+    try:
+        # números (captura via rede) ficam número: reprocessar não pode reinterpretar "1.234" como milhar
+        bruto = df_bruto.reindex(columns=COLUNAS_ALVO).astype(object)
+        linhas = [[v if _e_numero(v) and not pd.isna(v) else ("" if v is None or pd.isna(v) else str(v))
+                   for v in row] for row in bruto.to_numpy().tolist()]
+        conn = abrir_historico(history_db)
+        try:
+            historico_7k.gravar_bruto(conn, COLUNAS_ALVO, linhas, _iso(data_inicio), _iso(data_fim), origem)
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"⚠️ Não consegui arquivar a captura bruta: {e}")
+
+
+def carregar_brutos(data_inicio: str, data_fim: str, history_db: str | None = None) -> pd.DataFrame:
+    """
+    Todas as capturas brutas que cruzam o período, numa tabela só (texto), da mais antiga para a
+    mais recente: normalizar_report mantém a última linha de cada dia, ou seja, a captura mais nova.
+    A coluna captured_at diz de qual captura veio cada linha.
+    """
+    conn = abrir_historico(history_db)
+    try:
+        capturas = historico_7k.brutos_no_periodo(conn, _iso(data_inicio), _iso(data_fim))
+    finally:
+        conn.close()
+
+    frames = [pd.DataFrame(c["linhas"], columns=c["colunas"], dtype=object).assign(captured_at=c["captured_at"])
+              for c in capturas if c["linhas"]]
+    print(f"🗃️ {len(capturas)} captura(s) bruta(s) no período, {sum(len(f) for f in frames)} linha(s).")
+    if not frames:
+        return pd.DataFrame(columns=COLUNAS_ALVO + ["captured_at"])
+    return pd.concat(frames, ignore_index=True).reindex(columns=COLUNAS_ALVO + ["captured_at"])
+
+
+def capturas_por_dia(bruto: pd.DataFrame) -> dict[str, str]:
+    """{ 'YYYY-MM-DD': captured_at } da captura bruta que vence em cada dia (a mais recente, como em normalizar_report)."""
+    if bruto is None or bruto.empty:
+        return {}
+    t = normalize_time_column(bruto[["Time", "captured_at"]].copy(), "Time").dropna(subset=["Time"])
+    t = t.drop_duplicates(subset=["Time"], keep="last")
+    return dict(zip(t["Time"].dt.strftime("%Y-%m-%d"), t["captured_at"]))
 
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    path_hist = os.path.join(JSON_DIR, f"report_{ts}.json")
-    with open(path_hist, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
 
-    print(f"🧾 JSON salvo: {path_hist}")
-    print(f"🧾 JSON cache (latest): {JSON_LATEST}")
+def reprocessar_periodo(data_inicio: str, data_fim: str, sheets: bool = True, tab_name: str | None = None,
+                        history_db: str | None = None) -> pd.DataFrame:
+    """
+    Reaplica a normalização atual sobre o arquivo bruto do período (uma passada vetorizada para todos
+    os dias) e refaz o UPSERT + histórico, sem navegador. No histórico cada dia fica com o captured_at
+    da captura bruta (reprocessar não torna um dia assentado).
+    """
+    tab_name = tab_name or SHEET_TAB
+    bruto = carregar_brutos(data_inicio, data_fim, history_db)
+    df = normalizar_report(bruto) if not bruto.empty else bruto
+    if df is not None and not df.empty:
+        ini, fim = pd.Timestamp(parse_ddmmyyyy(data_inicio)), pd.Timestamp(parse_ddmmyyyy(data_fim))
+        df = df[(df["Time"] >= ini) & (df["Time"] <= fim)]
+
+    if df is None or df.empty:
+        print("⚠️ Nada arquivado para reprocessar nesse período.")
+        return pd.DataFrame(columns=COLUNAS_ALVO)
+
+    print_preview(df)
+    stats = {}
+    try:
+        if sheets:
+            writer = SheetsUpsertBuffer(SHEET_ID, tab_name)
+            writer.add(df)
+            stats = writer.close()
+            print(f"✅ Sheets atualizado por UPSERT: {stats}")
+    finally:
+        dump_json_history(df, meta={
+            "start": data_inicio,
+            "end": data_fim,
+            "ts": datetime.now().isoformat(),
+            "rows": int(len(df)),
+            "origem": "reprocessamento",
+            "linhas_brutas": int(len(bruto)),
+            "sheets": stats,
+        }, history_db=history_db, captured_at_por_dia=capturas_por_dia(bruto))
+    return df
+
+
+# ==============================
+# 🧊 Frescor: quais dias ainda precisam ser capturados
+# ==============================
+
+def carregar_capturas_por_dia() -> dict[str, datetime]:
+    """Do histórico: { 'YYYY-MM-DD': ts da captura mais recente desse dia }."""
+    conn = abrir_historico()
+    try:
+        return {k: datetime.fromisoformat(v) for k, v in historico_7k.ultima_captura_por_dia(conn).items()}
+    finally:
+        conn.close()
+
+
+def dia_assentado(dia: datetime, capturado_em: datetime | None, horizonte: int = HORIZONTE_ASSENTAMENTO_DIAS) -> bool:
+    """Final = o dia já passou do horizonte E a última captura foi feita depois disso."""
+    if capturado_em is None:
+        return False
+    assenta_em = dia + pd.Timedelta(days=horizonte)
+    return datetime.now() >= assenta_em and capturado_em >= assenta_em
+
+
+def dias_pendentes(inicio: str, fim: str, force: bool = False,
+                   horizonte: int = HORIZONTE_ASSENTAMENTO_DIAS) -> list[str]:
+    """Dias (DD/MM/YYYY) de [inicio, fim] que faltam no histórico ou ainda não assentaram. force=True: todos."""
+    dias = pd.date_range(parse_ddmmyyyy(inicio), parse_ddmmyyyy(fim), freq="D")
+    if force:
+        return [d.strftime("%d/%m/%Y") for d in dias]
+
+    capturas = carregar_capturas_por_dia()
+    pendentes = [
+        d.strftime("%d/%m/%Y")
+        for d in dias
+        if not dia_assentado(d.to_pydatetime(), capturas.get(d.strftime("%Y-%m-%d")), horizonte)
+    ]
+    print(f"🧊 {len(dias) - len(pendentes)} dia(s) assentado(s) no histórico, {len(pendentes)} para capturar.")
+    return pendentes
+
+
+def agrupar_contiguos(dias: list[str]) -> list[tuple[str, str]]:
+    """['01/01/2026','02/01/2026','05/01/2026'] -> [('01/01/2026','02/01/2026'), ('05/01/2026','05/01/2026')]"""
+    janelas = []
+    for d in sorted(dias, key=parse_ddmmyyyy):
+        dt = parse_ddmmyyyy(d)
+        if janelas and parse_ddmmyyyy(janelas[-1][1]) + pd.Timedelta(days=1) == dt:
+            janelas[-1] = (janelas[-1][0], d)
+        else:
+            janelas.append((d, d))
+    return janelas
+
+
+# ==============================
+# 🎯 Seletores e leitura da página (compartilhados pelo motor sync e pelo async)
+# ==============================
+
+SEL_SENHA = "input[type='password']"
+SEL_EMAIL = ("input[type='email']", "input[name='email']", "input[type='text']")  # em ordem de preferência
+SEL_BTN_LOGIN = "button:has-text('Login'), button:has-text('Entrar'), button:has-text('Sign in')"
+SEL_MENU_REPORT = "a:has-text('Report')"
+SEL_DATE_EDITOR = "div.el-date-editor.el-date-editor--date"
+SEL_LOGADO = f"{SEL_MENU_REPORT}, {SEL_DATE_EDITOR}"
+SEL_PICKER = ".el-picker-panel.el-date-picker"
+SEL_PICKER_ABERTO = SEL_PICKER + "[actualvisible='true']"
+SEL_PICKER_LABEL = ".el-date-picker__header-label"
+SEL_TABELA_ANO = ".el-year-table"
+SEL_TABELA_MES = ".el-month-table"
+SEL_TABELA_DIA = ".el-date-table"
+SEL_CELULA_DIA = "table.el-date-table td:not(.prev-month):not(.next-month):not(.disabled) .el-date-table-cell__text"
+SEL_BTN_GROUP = "button:has-text('Group'), button:has-text('Agrupar')"
+SEL_MY_TABLE = "div.my_table"
+SEL_PAG_TOTAL = ".el-pagination .el-pagination__total"
+SEL_PAG_PROXIMA = ".el-pagination button.btn-next"
+SEL_PAG_NUMEROS = ".el-pagination .el-pager li.number"
+
+
+def seletores_mes(month: int) -> tuple[str, str]:
+    """(td pelo aria-label, texto abreviado de fallback) do mês no el-month-table."""
+    nome = MONTHS_PT[month]
+    return f"td[aria-label='{nome}']", nome[:3]
+
+
+def periodo_iso(data_inicio: str, data_fim: str) -> tuple[str, str]:
+    return parse_ddmmyyyy(data_inicio).strftime("%Y-%m-%d"), parse_ddmmyyyy(data_fim).strftime("%Y-%m-%d")
+
+
+def periodo_confere(ini_lido, fim_lido, data_inicio: str, data_fim: str) -> bool:
+    """Datas lidas dos editores (Timestamp/NaT) == período pedido (DD/MM/YYYY)."""
+    return (ini_lido == pd.Timestamp(parse_ddmmyyyy(data_inicio))
+            and fim_lido == pd.Timestamp(parse_ddmmyyyy(data_fim)))
+
+
+def total_paginacao(texto: str | None) -> int | None:
+    """ "Total 1.234" -> 1234."""
+    m = re.search(r"\d+", re.sub(r"[.,\s]", "", texto or ""))
+    return int(m.group(0)) if m else None
 
 
 # ==============================
 # 🎛️ Playwright: Login + Navegação
 # ==============================
 
+@cronometrar("goto_report")
 def goto_report(page):
     print("📄 Indo para Report...")
-    page.wait_for_timeout(1200)
 
-    report_link = page.locator("a:has-text('Report')").first
+    # menu já montado (ou já estamos no Report)
+    wait_locator(page.locator(SEL_LOGADO).first, "report", state="attached")
+
+    report_link = page.locator(SEL_MENU_REPORT).first
     if report_link.count() > 0:
         safe_click(report_link, "menu Report", retries=6, timeout=12000)
         page.wait_for_load_state("domcontentloaded")
-        page.wait_for_timeout(1200)
+        wait_locator(page.locator(SEL_DATE_EDITOR).first, "report")
         return
 
-    page.goto(BASE_URL.rstrip("/") + REPORT_PATH_FALLBACK, wait_until="domcontentloaded")
-    page.wait_for_timeout(1200)
+    navegar(page, BASE_URL.rstrip("/") + REPORT_PATH_FALLBACK)
+    wait_locator(page.locator(SEL_DATE_EDITOR).first, "report")
 
 
 # ==============================
@@ -422,7 +1942,7 @@ def parse_ddmmyyyy(date_str: str) -> datetime:
 
 
 def get_visible_panel(page):
-    panel = page.locator(".el-picker-panel.el-date-picker[actualvisible='true']").last
+    panel = page.locator(SEL_PICKER_ABERTO).last
     panel.wait_for(state="visible", timeout=20000)
     return panel
 
@@ -439,27 +1959,20 @@ def open_datepicker(date_editor, page):
 
 
 def wait_calendar_or_months(panel, timeout=15000):
-    start = datetime.now()
-    while (datetime.now() - start).total_seconds() * 1000 < timeout:
-        try:
-            if panel.locator(".el-date-table").first.is_visible():
-                return "days"
-        except Exception:
-            pass
-        try:
-            if panel.locator(".el-month-table").first.is_visible():
-                return "months"
-        except Exception:
-            pass
-        panel.page.wait_for_timeout(120)
-    raise PlaywrightTimeoutError("Nem el-date-table nem el-month-table ficaram visíveis no tempo esperado.")
+    try:
+        panel.locator(f"{SEL_TABELA_DIA}, {SEL_TABELA_MES}").first.wait_for(state="visible", timeout=timeout)
+    except PlaywrightTimeoutError:
+        raise PlaywrightTimeoutError("Nem el-date-table nem el-month-table ficaram visíveis no tempo esperado.")
+    if panel.locator(SEL_TABELA_DIA).first.is_visible():
+        return "days"
+    return "months"
 
 
 def click_year(panel, year: int):
-    year_label = panel.locator(".el-date-picker__header-label").first
+    year_label = panel.locator(SEL_PICKER_LABEL).first
     safe_click(year_label, "label ano")
 
-    year_table = panel.locator(".el-year-table").first
+    year_table = panel.locator(SEL_TABELA_ANO).first
     year_table.wait_for(state="visible", timeout=20000)
 
     year_cell = year_table.locator("td", has_text=str(year)).first
@@ -471,28 +1984,26 @@ def click_year(panel, year: int):
 def click_month(panel, month: int):
     month_name = MONTHS_PT[month]
 
-    if not panel.locator(".el-month-table").first.is_visible():
-        labels = panel.locator(".el-date-picker__header-label")
+    if not panel.locator(SEL_TABELA_MES).first.is_visible():
+        labels = panel.locator(SEL_PICKER_LABEL)
         month_label = labels.nth(1)
         safe_click(month_label, "label mês")
 
-    month_table = panel.locator(".el-month-table").first
+    month_table = panel.locator(SEL_TABELA_MES).first
     month_table.wait_for(state="visible", timeout=20000)
 
-    month_td = month_table.locator(f"td[aria-label='{month_name}']").first
+    sel_aria, abreviado = seletores_mes(month)
+    month_td = month_table.locator(sel_aria).first
     if month_td.count() == 0:
-        month_td = month_table.locator("td", has_text=month_name[:3]).first
+        month_td = month_table.locator("td", has_text=abreviado).first
 
     safe_click(month_td, f"mês {month_name}")
 
-    panel.locator(".el-date-table").first.wait_for(state="visible", timeout=20000)
+    panel.locator(SEL_TABELA_DIA).first.wait_for(state="visible", timeout=20000)
 
 
 def click_day(panel, day: int):
-    day_cell = panel.locator(
-        "table.el-date-table td:not(.prev-month):not(.next-month):not(.disabled) .el-date-table-cell__text",
-        has_text=str(day)
-    ).first
+    day_cell = panel.locator(SEL_CELULA_DIA, has_text=str(day)).first
     safe_click(day_cell, f"dia {day}")
 
 
@@ -507,73 +2018,133 @@ def set_date_via_calendar(page, date_editor, date_str: str, label: str):
             click_month(panel, dt.month)
             click_day(panel, dt.day)
 
-            page.wait_for_timeout(350)
+            wait_locator(panel, "datepicker", state="hidden")
             return
 
         except Exception as e:
             last_err = e
-            try:
-                page.screenshot(path=f"erro_set_date_{label}_tentativa{attempt}.png", full_page=True)
-            except Exception:
-                pass
+            diag_evento("set_date", label=label, data=date_str, tentativa=attempt, erro=str(e)[:200])
+            diag_dom(page, "set_date.painel", SEL_PICKER)
             try:
                 page.keyboard.press("Escape")
             except Exception:
                 pass
-            page.wait_for_timeout(400)
+            wait_locator(page.locator(SEL_PICKER_ABERTO).last, "datepicker", state="hidden")
 
+    falha_diagnostico(page, f"set_date_{label}", last_err)
     raise last_err
 
 
-def apply_period_and_group(page, data_inicio: str, data_fim: str):
-    print(f"🗓️ Aplicando período (via calendário): {data_inicio} -> {data_fim}")
+def input_date_format(exemplo: str | None) -> str:
+    """Descobre o formato que o input exibe (pelo valor atual/placeholder). Padrão: DD/MM/YYYY."""
+    exemplo = (exemplo or "").strip()
+    if RE_DATA_ISO.match(exemplo):
+        return "%Y-%m-%d"
+    if RE_DATA_BR_TRACO.match(exemplo):
+        return "%d-%m-%Y"
+    return "%d/%m/%Y"
+
+
+def data_do_input(value: str | None):
+    """Texto do input de data -> Timestamp normalizado (ou NaT)."""
+    dt = to_datetime_br_or_iso(value)
+    return pd.NaT if pd.isna(dt) else pd.Timestamp(dt).normalize()
+
+
+def read_editor_date(date_editor):
+    """Data mostrada no input do editor (Timestamp normalizado) ou NaT."""
+    return data_do_input(date_editor.locator("input").first.input_value())
+
+
+def set_date_via_input(page, date_editor, date_str: str) -> bool:
+    """
+    Caminho rápido: preenche o input do el-date-editor e confirma com Enter (sem abrir ano/mês/dia).
+    Devolve True se o input ficou com a data pedida.
+    """
+    dt = parse_ddmmyyyy(date_str)
+    inp = date_editor.locator("input").first
+
+    fmt = input_date_format(inp.input_value() or inp.get_attribute("placeholder"))
+    inp.click(timeout=5000)
+    inp.fill(dt.strftime(fmt), timeout=5000)
+    inp.press("Enter")
+    try:
+        page.keyboard.press("Escape")
+    except Exception:
+        pass
+
+    return read_editor_date(date_editor) == pd.Timestamp(dt)
+
+
+@cronometrar("set_date")
+def set_date(page, date_editor, date_str: str, label: str):
+    if DATA_DIGITADA:
+        try:
+            if set_date_via_input(page, date_editor, date_str):
+                return
+        except Exception as e:
+            print(f"ℹ️ {label}: digitação falhou ({e}), indo pelo calendário.")
+        else:
+            print(f"ℹ️ {label}: input não aceitou {date_str} digitado, indo pelo calendário.")
+
+    set_date_via_calendar(page, date_editor, date_str, label)
+
 
-    editors = page.locator("div.el-date-editor.el-date-editor--date")
+def period_matches(start_editor, end_editor, data_inicio: str, data_fim: str) -> bool:
+    try:
+        return periodo_confere(read_editor_date(start_editor), read_editor_date(end_editor), data_inicio, data_fim)
+    except Exception:
+        return False
+
+
+def apply_period(page, data_inicio: str, data_fim: str):
+    modo = "digitando" if DATA_DIGITADA else "via calendário"
+    print(f"🗓️ Aplicando período ({modo}): {data_inicio} -> {data_fim}")
+
+    editors = page.locator(SEL_DATE_EDITOR)
     if editors.count() < 2:
-        page.screenshot(path="erro_date_editors.png", full_page=True)
+        falha_diagnostico(page, "date_editors")
         raise RuntimeError("Não encontrei os 2 campos de data (el-date-editor--date).")
 
     start_editor = editors.nth(0)
     end_editor = editors.nth(1)
 
-    set_date_via_calendar(page, start_editor, data_inicio, "Start date")
-    set_date_via_calendar(page, end_editor, data_fim, "End date")
+    set_date(page, start_editor, data_inicio, "Start date")
+    set_date(page, end_editor, data_fim, "End date")
+
+    # a data final pode "empurrar" a inicial (limites do picker): confere o par no fim
+    if DATA_DIGITADA and not period_matches(start_editor, end_editor, data_inicio, data_fim):
+        print("ℹ️ Período aplicado não confere, refazendo pelo calendário.")
+        set_date_via_calendar(page, start_editor, data_inicio, "Start date")
+        set_date_via_calendar(page, end_editor, data_fim, "End date")
 
+
+@cronometrar("group")
+def click_group(page):
     print("🧩 Clicando em Group/Agrupar...")
-    group_btn = page.locator("button:has-text('Group'), button:has-text('Agrupar')").first
+    group_btn = page.locator(SEL_BTN_GROUP).first
     if group_btn.count() == 0:
-        page.screenshot(path="erro_botao_group.png", full_page=True)
+        falha_diagnostico(page, "botao_group")
         raise RuntimeError("Não encontrei o botão Group/Agrupar.")
 
+    # cada Group é uma consulta ao backend do site: entra no mesmo limite das navegações
+    LIMITES["site"].consumir()
     safe_click(group_btn, "botão Group/Agrupar", retries=6, timeout=15000)
-    page.wait_for_timeout(2500)
+
+
+def apply_period_and_group(page, data_inicio: str, data_fim: str):
+    apply_period(page, data_inicio, data_fim)
+    before = my_table_signature(page)
+    click_group(page)
+    wait_grid_ready(page, data_inicio, data_fim, before)
 
 
 # ==============================
 # 📊 Captura da tabela (DIV my_table)
 # ==============================
 
-def capture_grid_my_table(page) -> pd.DataFrame:
-    print("📊 Capturando tabela (DIV my_table)...")
-
-    root = page.locator("div.my_table").first
-    try:
-        root.wait_for(state="visible", timeout=35000)
-    except PlaywrightTimeoutError:
-        page.screenshot(path="erro_my_table_nao_visivel.png", full_page=True)
-        raise RuntimeError("Não encontrei o container div.my_table do report.")
-
-    header_row = root.locator("div.table_row").first
-
-    header_texts = []
-    for cell in header_row.locator(":scope > div").all():
-        t = cell.inner_text().strip()
-        if t:
-            header_texts.append(t)
-
-    header_texts = [h for h in header_texts if h]
-    print("ℹ️ Headers encontrados:", header_texts)
-
+def resolve_idx_map(header_texts: list[str]) -> dict[str, int]:
+    """Mapeia cada coluna de COLUNAS_ALVO para o índice no header (exato, depois case-insensitive)."""
     idx_map = {}
     for col in COLUNAS_ALVO:
         if col in header_texts:
@@ -587,153 +2158,1052 @@ def capture_grid_my_table(page) -> pd.DataFrame:
                 break
 
         if found is None:
-            page.screenshot(path="erro_headers_report.png", full_page=True)
-            raise RuntimeError(f"Coluna '{col}' não encontrada nos headers: {header_texts}")
+            raise KeyError(col)
 
         idx_map[col] = found
+    return idx_map
 
-    rows = root.locator("div.table_row")
-    n = rows.count()
-    if n <= 1:
-        page.screenshot(path="erro_sem_linhas_report.png", full_page=True)
-        raise RuntimeError("Tabela encontrada, mas sem linhas de dados.")
 
+def matrix_to_records(matrix: list[list[str]], idx_map: dict[str, int]) -> list[dict]:
+    """Converte as linhas de dados (sem o header) em registros, pulando vazias e a linha 'Totals'."""
     data = []
-    for r in range(1, n):
-        row = rows.nth(r)
-        cols = row.locator(":scope > div")
-        if cols.count() == 0:
+    for cells in matrix:
+        if not cells:
             continue
 
-        time_val = cols.nth(idx_map["Time"]).inner_text().strip()
-        if time_val.strip().lower() == "totals":
+        time_val = cells[idx_map["Time"]].strip() if idx_map["Time"] < len(cells) else ""
+        if time_val.lower() == "totals":
             continue
 
         rec = {}
         for col in COLUNAS_ALVO:
-            rec[col] = cols.nth(idx_map[col]).inner_text().strip()
+            i = idx_map[col]
+            rec[col] = cells[i].strip() if i < len(cells) else ""
         data.append(rec)
+    return data
+
+
+# Uma leitura do div.my_table no estado atual do DOM, ou (rolar=true) só rola o container da tabela.
+# virtual = o container rola e a altura dele é bem maior que a soma das linhas renderizadas
+# (lista virtualizada: só as linhas visíveis existem no DOM)
+JS_MY_TABLE_LER_OU_ROLAR = """
+(root, rolar) => {
+    const rows = Array.from(root.querySelectorAll(':scope div.table_row'));
+    const rolavel = (el) => el.scrollHeight > el.clientHeight + 1
+        && /(auto|scroll)/.test(getComputedStyle(el).overflowY);
+    // o container rolável é procurado só dentro do div.my_table (inclusive): um layout que rola a
+    // página inteira não pode fazer uma tabela comum parecer virtualizada
+    let sc = null;
+    for (let el = rows.length ? rows[rows.length - 1].parentElement : root; el; el = el.parentElement) {
+        if (rolavel(el)) { sc = el; break; }
+        if (el === root) break;
+    }
+    if (rolar) {
+        if (!sc) return {fim: true};
+        const antes = sc.scrollTop;
+        sc.scrollTop = antes + Math.max(1, Math.floor(sc.clientHeight * 0.9));
+        return {fim: sc.scrollTop === antes};
+    }
+    const matrix = rows.map(
+        (row) => Array.from(row.querySelectorAll(':scope > div')).map((c) => (c.innerText || '').trim())
+    );
+    const soma = rows.reduce((t, r) => t + r.offsetHeight, 0);
+    const media = rows.length ? soma / rows.length : 0;
+    return {matrix, virtual: sc !== null && sc.scrollHeight > soma + 2 * media};
+}
+"""
+
+
+class TabelaTruncada(RuntimeError):
+    """A paginação do report informa mais linhas do que as lidas do my_table."""
+
+
+class TabelaVazia(RuntimeError):
+    """O my_table veio com header, mas sem nenhuma linha de dados (período sem movimento)."""
+
+
+class ColunaAusente(RuntimeError):
+    """Uma coluna de COLUNAS_ALVO não está no header do my_table."""
+
+
+JS_MY_TABLE_MUDOU = "(antes) => (" + JS_MY_TABLE_SIGNATURE.strip() + ")() !== antes"
+
+LEITURAS_DEDUP = 3  # quantas leituras anteriores entram no dedup das linhas
+
+
+def dedup_leitura(matrix: list[list[str]], header: list[str], vistos: deque) -> list[list[str]]:
+    """Linhas da leitura atual que não apareceram nas últimas leituras (`vistos`: um set de hashes por leitura)."""
+    atual: set[int] = set()
+    novas = []
+    for cells in matrix:
+        if cells == header:
+            continue
+        chave = hash(tuple(cells))
+        if chave in atual or any(chave in v for v in vistos):
+            continue
+        atual.add(chave)
+        novas.append(cells)
+    vistos.append(atual | {hash(tuple(c)) for c in matrix if c != header})
+    return novas
+
+
+class LeitorMyTable:
+    """
+    Estado da leitura do my_table em lotes (header, dedup, buffer), sem I/O: o motor sync e o
+    async só fazem os evaluates/cliques e passam cada leitura do JS_MY_TABLE_LER_OU_ROLAR para cá.
+    """
+
+    def __init__(self, lote: int | None = None):
+        self.lote = lote or STREAM_LOTE
+        self.header = None
+        self.idx_map = None
+        # dedup só contra as últimas leituras (a sobreposição entre rolagens é local; páginas não se repetem):
+        # a memória fica no tamanho do que está renderizado, não da tabela inteira
+        self.vistos: deque = deque(maxlen=LEITURAS_DEDUP)
+        self.buf: list[dict] = []
+        self.n = 0
+
+    def ler(self, estado: dict | None) -> bool:
+        """Guarda as linhas novas de uma leitura. Devolve se a tabela é uma lista virtualizada."""
+        estado = estado or {}
+        matrix = estado.get("matrix") or []
+        if self.header is None:
+            self.header = matrix[0] if matrix else []
+            header_texts = [h for h in self.header if h]
+            print("ℹ️ Headers encontrados:", header_texts)
+            try:
+                self.idx_map = resolve_idx_map(header_texts)
+            except KeyError as e:
+                raise ColunaAusente(f"Coluna '{e.args[0]}' não encontrada nos headers: {header_texts}")
+
+        self.buf += matrix_to_records(dedup_leitura(matrix, self.header, self.vistos), self.idx_map)
+        return bool(estado.get("virtual"))
+
+    def lotes(self, final: bool = False):
+        """DataFrames crus de `lote` registros já completos (final=True: inclui o resto)."""
+        while len(self.buf) >= self.lote or (final and self.buf):
+            parte, self.buf = self.buf[:self.lote], self.buf[self.lote:]
+            self.n += len(parte)
+            yield pd.DataFrame(parte)
+
+    def conferir(self, total_esperado: int | None):
+        """Fim da tabela: TabelaTruncada se faltou linha do total da paginação, TabelaVazia se não veio nenhuma."""
+        if total_esperado is not None and self.n < total_esperado:
+            raise TabelaTruncada(f"Capturei {self.n} linha(s) do report, mas a paginação informa {total_esperado}.")
+        if self.n == 0:
+            # header lido e nenhuma linha: o site não mostra dia zerado (não é falha de página)
+            raise TabelaVazia("Tabela encontrada, mas sem linhas de dados.")
+
+
+def esperar_my_table_mudar(page, antes: str | None, passo: str) -> bool:
+    t0 = time.perf_counter()
+    try:
+        page.wait_for_function(JS_MY_TABLE_MUDOU, arg=antes, timeout=TIMEOUTS_PRONTIDAO[passo])
+        return registrar_espera(passo, t0, True, "my_table")
+    except Exception:
+        return registrar_espera(passo, t0, False, "my_table")
+
+
+def paginacao_total(page) -> int | None:
+    """Total de linhas informado pela paginação ("Total 120"), se o report mostrar."""
+    try:
+        loc = page.locator(SEL_PAG_TOTAL).first
+        if loc.count() == 0:
+            return None
+        return total_paginacao(loc.inner_text())
+    except Exception:
+        return None
+
+
+def proxima_pagina(page) -> bool:
+    """Clica em "próxima" na paginação e espera as linhas trocarem. False se não houver próxima página."""
+    btn = page.locator(SEL_PAG_PROXIMA).first
+    try:
+        if btn.count() == 0 or not btn.is_enabled():
+            return False
+    except Exception:
+        return False
+    antes = my_table_signature(page)
+    safe_click(btn, "próxima página", retries=3, timeout=8000)
+    return esperar_my_table_mudar(page, antes, "pagina")
+
+
+def iterar_my_table(page, lote: int | None = None):
+    """
+    Gera o div.my_table em lotes de até `lote` registros (DataFrame cru), sem montar a tabela
+    inteira na memória nem num evaluate gigante:
+    - tabela comum: 1 leitura (mesmo custo de antes);
+    - lista virtualizada: rola o container e relê a cada passo, guardando só as linhas novas;
+    - paginada: percorre as páginas pelo botão "próxima".
+    Se a paginação informa um total e faltou linha, levanta erro em vez de seguir com a tabela pela metade.
+    """
+    root = page.locator(SEL_MY_TABLE).first
+    try:
+        root.wait_for(state="visible", timeout=35000)
+    except PlaywrightTimeoutError:
+        falha_diagnostico(page, "my_table_nao_visivel")
+        raise RuntimeError("Não encontrei o container div.my_table do report.")
+
+    total_esperado = paginacao_total(page)
+    leitor = LeitorMyTable(lote)
+
+    def ler() -> bool:
+        try:
+            return leitor.ler(root.evaluate(JS_MY_TABLE_LER_OU_ROLAR, False))
+        except ColunaAusente as e:
+            falha_diagnostico(page, "headers_report", e)
+            raise
+
+    while True:
+        virtual = ler()
+        while virtual:
+            antes = my_table_signature(page)
+            if (root.evaluate(JS_MY_TABLE_LER_OU_ROLAR, True) or {}).get("fim", True):
+                break
+            if not esperar_my_table_mudar(page, antes, "rolagem"):
+                break
+            contar("my_table.rolagens")
+            virtual = ler()
+            yield from leitor.lotes()
+
+        yield from leitor.lotes()
+        if not proxima_pagina(page):
+            break
+        contar("my_table.paginas")
+
+    yield from leitor.lotes(final=True)
+    try:
+        leitor.conferir(total_esperado)
+    except TabelaTruncada as e:
+        falha_diagnostico(page, "linhas_faltando", e)
+        raise
+    except TabelaVazia:
+        diag_evento("tabela_vazia")
+        raise
+
+
+@cronometrar("capture_grid")
+def capture_grid_my_table(page) -> pd.DataFrame:
+    """Tabela inteira num DataFrame (junta os lotes de iterar_my_table). Período sem linha: DataFrame vazio."""
+    print("📊 Capturando tabela (DIV my_table)...")
+    try:
+        return pd.concat(list(iterar_my_table(page)), ignore_index=True)
+    except TabelaVazia:
+        return pd.DataFrame(columns=COLUNAS_ALVO)
+
+
+# ==============================
+# 🛰️ Captura via rede (JSON da XHR do report)
+# ==============================
+
+# Possíveis chaves do JSON da API para cada coluna (comparadas sem acento/espaço/pontuação)
+API_ALIASES = {
+    "Time": ["time", "date", "day", "data", "dia"],
+    "Registrations": ["registrations", "registration", "registers", "signups"],
+    "FTDs": ["ftds", "ftd"],
+    "QFTDs, CPA": ["qftdscpa", "qftds", "qftd"],
+    "FTDs Amount": ["ftdsamount", "ftdamount"],
+    "Deposits Amount": ["depositsamount", "depositamount", "deposits"],
+    "RevShare": ["revshare"],
+    "CPA": ["cpa"],
+}
+
+
+def _chave_api(k) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(k).lower())
+
+
+def resolve_api_keys(sample: dict) -> dict[str, str] | None:
+    """Mapeia COLUNAS_ALVO -> chave real do registro JSON. None se faltar alguma coluna."""
+    by_norm = {_chave_api(k): k for k in sample.keys()}
+    keys = {}
+    for col in COLUNAS_ALVO:
+        cands = [_chave_api(col)] + API_ALIASES.get(col, [])
+        found = next((by_norm[c] for c in cands if c in by_norm), None)
+        if found is None:
+            return None
+        keys[col] = found
+    return keys
+
+
+def find_report_rows(payload) -> tuple[list[dict], dict[str, str]] | None:
+    """Procura (recursivamente) a lista de registros do report dentro do JSON da resposta."""
+    if isinstance(payload, list):
+        dicts = [x for x in payload if isinstance(x, dict)]
+        if dicts:
+            keys = resolve_api_keys(dicts[0])
+            if keys is not None:
+                return dicts, keys
+        for x in payload:
+            found = find_report_rows(x)
+            if found:
+                return found
+    elif isinstance(payload, dict):
+        for v in payload.values():
+            if isinstance(v, (list, dict)):
+                found = find_report_rows(v)
+                if found:
+                    return found
+    return None
+
+
+def report_json_to_df(payload) -> pd.DataFrame | None:
+    found = find_report_rows(payload)
+    if not found:
+        return None
+    rows, keys = found
+
+    data = []
+    for r in rows:
+        time_val = r.get(keys["Time"])
+        if time_val is None or str(time_val).strip().lower() == "totals":
+            continue
+        # números do JSON ficam como número (só texto passa pela adivinhação de milhar do parse_number)
+        data.append({col: ("" if r.get(k) is None else r.get(k) if _e_numero(r.get(k)) else str(r.get(k)))
+                     for col, k in keys.items()})
+    return pd.DataFrame(data, columns=COLUNAS_ALVO)
+
+
+def is_report_response(resp) -> bool:
+    try:
+        if resp.request.resource_type not in ("xhr", "fetch"):
+            return False
+        if not re.search(REPORT_API_PATTERN, resp.url, flags=re.I):
+            return False
+        return "json" in (resp.headers.get("content-type") or "").lower()
+    except Exception:
+        return False
+
+
+@cronometrar("capture_rede")
+def capture_via_network(page, timeout: int = REDE_TIMEOUT_MS) -> pd.DataFrame | None:
+    """
+    Clica em Group escutando as respostas da página e monta o DataFrame direto do JSON do report.
+    Devolve None se nenhuma resposta reconhecível chegar dentro do timeout.
+    """
+    candidatos = []
+
+    def on_response(resp):
+        if is_report_response(resp):
+            candidatos.append(resp)
+
+    page.on("response", on_response)
+    try:
+        click_group(page)
+
+        start = datetime.now()
+        while (datetime.now() - start).total_seconds() * 1000 < timeout:
+            while candidatos:
+                resp = candidatos.pop(0)
+                try:
+                    payload = resp.json()
+                except Exception:
+                    continue
+                df = report_json_to_df(payload)
+                if df is not None:
+                    print(f"🛰️ Report lido da rede: {resp.url} ({len(df)} linha(s))")
+                    return df
+            page.wait_for_timeout(100)
+    finally:
+        page.remove_listener("response", on_response)
+
+    return None
+
+
+# ==============================
+# 🧹 Normalização do lote capturado
+# ==============================
+
+@cronometrar("normalizacao")
+def normalizar_report(df: pd.DataFrame) -> pd.DataFrame:
+    """Converte o DataFrame cru (texto) em tipado, na ordem de COLUNAS_ALVO e sem datas duplicadas."""
+    if df is None or df.empty:
+        return df
+
+    # ✅ normaliza Time como datetime
+    df = normalize_time_column(df, "Time")
+
+    # ✅ Converte numéricos por coluna
+    # (todas as colunas numa passada só: menos overhead por chamada em lotes pequenos)
+    numeric_cols = [c for c in COLUNAS_ALVO if c != "Time"]
+    for c in numeric_cols:
+        if c not in df.columns:
+            df[c] = None
+    valores = parse_number_series(pd.Series(df[numeric_cols].to_numpy(dtype=object).ravel(order="F")))
+    matriz = valores.fillna(0.0).to_numpy().reshape(len(numeric_cols), len(df))
+    for i, c in enumerate(numeric_cols):
+        df[c] = matriz[i]
+
+    # Inteiros “naturais”
+    int_cols = ["Registrations", "FTDs", "QFTDs, CPA"]
+    for c in int_cols:
+        if c in df.columns:
+            df[c] = df[c].fillna(0).astype(int)
+
+    # ✅ garante somente as colunas do script e na ordem
+    for c in COLUNAS_ALVO:
+        if c not in df.columns:
+            df[c] = None
+    df = df[COLUNAS_ALVO].copy()
+
+    # dedup dentro do lote (se vier duplicado do site)
+    df["_TimeSort"] = df["Time"]
+    df = df.drop_duplicates(subset=["Time"], keep="last").sort_values("_TimeSort", ascending=True).drop(columns=["_TimeSort"])
+    return df
+
 
-    return pd.DataFrame(data)
+def print_preview(df: pd.DataFrame, n: int = 20):
+    print("✅ Preview:")
+    df_preview = df.copy()
+    df_preview["Time"] = df_preview["Time"].dt.strftime("%Y-%m-%d")
+    print(df_preview.head(n))
 
 
 # ==============================
 # 🚀 CAPTURA PRINCIPAL
 # ==============================
 
-def capturar_report_7k():
+# Contadores de rede (somados entre navegadores/threads da execução).
+# bloqueaveis: {motivo: {"n", "bytes", "ms"}} do que o modo leve cortaria (medido com ele desligado)
+ESTATISTICAS_REDE = {"bloqueadas": 0, "liberadas": 0, "bytes_recebidos": 0, "por_motivo": {}, "bloqueaveis": {}}
+_REDE_LOCK = threading.Lock()
+# Últimas requests abortadas ("motivo url"): vão para o log quando uma espera de prontidão estoura
+BLOQUEADAS_RECENTES: deque = deque(maxlen=20)
+# Médias acumuladas por motivo (bytes/ms por request) das execuções sem modo leve
+REDE_MEDIAS = os.getenv("REDE_MEDIAS", os.path.join(JSON_DIR, "rede_medias.json"))
+
+
+def host_permitido(url: str) -> bool:
+    m = re.match(r"^[a-z]+://([^/:]+)", url or "", flags=re.I)
+    if not m:
+        return True  # data:, blob:, about:
+    host = m.group(1).lower()
+    return any(host == h or host.endswith("." + h) for h in HOSTS_PERMITIDOS)
+
+
+def motivo_bloqueio(url: str, resource_type: str) -> str | None:
+    """Por que a request deve ser abortada no modo leve (None = deixa passar)."""
+    if resource_type in TIPOS_BLOQUEADOS:
+        return resource_type
+    if HOSTS_PERMITIDOS and not host_permitido(url):
+        return "terceiro"
+    return None
+
+
+def contar_request(motivo: str | None, url: str | None = None):
+    with _REDE_LOCK:
+        if motivo is None:
+            ESTATISTICAS_REDE["liberadas"] += 1
+        else:
+            ESTATISTICAS_REDE["bloqueadas"] += 1
+            ESTATISTICAS_REDE["por_motivo"][motivo] = ESTATISTICAS_REDE["por_motivo"].get(motivo, 0) + 1
+            BLOQUEADAS_RECENTES.append(f"{motivo} {(url or '')[:160]}")
+
+
+def _bloqueavel(motivo: str) -> dict:
+    return ESTATISTICAS_REDE["bloqueaveis"].setdefault(motivo, {"n": 0, "bytes": 0, "ms": 0})
+
+
+def contar_bytes(resp):
+    """Listener de "response": bytes recebidos (e, sem modo leve, os que ele teria cortado)."""
+    try:
+        n = int(resp.headers.get("content-length") or 0)
+        motivo = None if MODO_LEVE else motivo_bloqueio(resp.url, resp.request.resource_type)
+    except Exception:
+        n, motivo = 0, None
+    with _REDE_LOCK:
+        ESTATISTICAS_REDE["bytes_recebidos"] += n
+        if motivo is not None:
+            b = _bloqueavel(motivo)
+            b["n"] += 1
+            b["bytes"] += n
+
+
+def contar_tempo(req):
+    """Listener de "requestfinished": sem modo leve, soma a duração das requests que ele cortaria."""
+    if MODO_LEVE:
+        return
+    try:
+        motivo = motivo_bloqueio(req.url, req.resource_type)
+        ms = req.timing.get("responseEnd", -1)
+    except Exception:
+        return
+    if motivo is not None and ms and ms > 0:
+        with _REDE_LOCK:
+            _bloqueavel(motivo)["ms"] += int(ms)
+
+
+def carregar_medias_rede(path: str | None = None) -> dict:
+    try:
+        with open(path or REDE_MEDIAS, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def somar_medias_rede(bloqueaveis: dict, path: str | None = None):
+    """Acumula o medido nesta execução (sem modo leve) nas médias por motivo."""
+    path = path or REDE_MEDIAS
+    medias = carregar_medias_rede(path)
+    for motivo, v in bloqueaveis.items():
+        m = medias.setdefault(motivo, {"n": 0, "bytes": 0, "ms": 0})
+        for k in ("n", "bytes", "ms"):
+            m[k] += v[k]
+    try:
+        ensure_dir(os.path.dirname(path) or ".")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(medias, f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"⚠️ Não consegui gravar as médias de rede em {path}: {e}")
+
+
+def estimar_economia(por_motivo: dict, medias: dict) -> dict | None:
+    """Bytes/ms economizados pelas requests bloqueadas, pelas médias medidas sem modo leve (None = sem medição)."""
+    medidos = {k: m for k, m in medias.items() if m.get("n")}
+    if not medidos:
+        return None
+    economia = {"bytes": 0, "ms": 0, "sem_media": 0}
+    for motivo, n in por_motivo.items():
+        m = medidos.get(motivo)
+        if m is None:
+            economia["sem_media"] += n
+            continue
+        economia["bytes"] += int(n * m["bytes"] / m["n"])
+        economia["ms"] += int(n * m["ms"] / m["n"])
+    return economia
+
+
+def resumo_rede(reset: bool = True) -> dict:
+    """
+    Resumo da rede da execução. Modo leve: bloqueadas + economia estimada (bytes e tempo de transferência
+    somado das requests, que correm em paralelo: é teto, não tempo de parede). Sem modo leve: o que ele cortaria.
+    """
+    with _REDE_LOCK:
+        resumo = {**ESTATISTICAS_REDE, "por_motivo": dict(ESTATISTICAS_REDE["por_motivo"]),
+                  "bloqueaveis": {k: dict(v) for k, v in ESTATISTICAS_REDE["bloqueaveis"].items()}}
+        if reset:
+            ESTATISTICAS_REDE.update({"bloqueadas": 0, "liberadas": 0, "bytes_recebidos": 0, "por_motivo": {},
+                                      "bloqueaveis": {}})
+
+    if resumo["bloqueadas"] or resumo["liberadas"]:
+        economia = estimar_economia(resumo["por_motivo"], carregar_medias_rede())
+        resumo["economia"] = economia
+        if economia is None:
+            txt = "economia: sem medição (rode uma vez com MODO_LEVE=0)"
+        else:
+            txt = f"economia estimada ~{economia['bytes'] / 1024:.0f} KB, ~{economia['ms'] / 1000:.1f}s de transferência"
+            if economia["sem_media"]:
+                txt += f" ({economia['sem_media']} sem média medida)"
+        print(f"🪶 Rede: {resumo['liberadas']} request(s) liberadas, {resumo['bloqueadas']} bloqueadas "
+              f"{resumo['por_motivo']}, {resumo['bytes_recebidos'] / 1024:.0f} KB recebidos; {txt}.")
+    elif resumo["bloqueaveis"]:
+        b = resumo["bloqueaveis"]
+        print(f"🪶 Rede: {resumo['bytes_recebidos'] / 1024:.0f} KB recebidos; o modo leve cortaria "
+              f"{sum(v['n'] for v in b.values())} request(s), {sum(v['bytes'] for v in b.values()) / 1024:.0f} KB, "
+              f"{sum(v['ms'] for v in b.values()) / 1000:.1f}s de transferência {({k: v['n'] for k, v in b.items()})}.")
+        somar_medias_rede(b)
+    return resumo
+
+
+def context_options(sessao_file: str | None = None) -> dict:
+    opts = {"locale": "pt-BR"}
+    sessao = carregar_sessao(sessao_file)
+    if sessao is not None:
+        opts["storage_state"] = sessao
+    if SEM_VIEWPORT:
+        opts["no_viewport"] = True
+    else:
+        opts["viewport"] = {"width": 1600, "height": 900}
+    return opts
+
+
+def route_leve(route):
+    req = route.request
+    motivo = motivo_bloqueio(req.url, req.resource_type)
+    contar_request(motivo, req.url)
+    if motivo is None:
+        route.continue_()
+    else:
+        route.abort()
+
+
+def abrir_navegador(p):
+    """Abre Chromium + context + page com as configurações padrão do report."""
+    browser = p.chromium.launch(headless=HEADLESS)
+
+    context = browser.new_context(**context_options())
+    if MODO_LEVE:
+        context.route("**/*", route_leve)
+    context.on("response", contar_bytes)
+    context.on("requestfinished", contar_tempo)
+    trace_iniciar(context)
+    page = context.new_page()
+    if INSTRUMENTAR:
+        page = ContadorPlaywright(page)
+    return browser, context, page
+
+
+# ==============================
+# 🔐 Sessão persistida (storage_state)
+# ==============================
+
+def carregar_sessao(path: str | None = None) -> dict | None:
+    """storage_state salvo (ou None se desligado / não existe / arquivo inválido)."""
+    path = path or SESSAO_FILE
+    if not REUSAR_SESSAO or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) and "cookies" in state else None
+    except Exception:
+        print(f"⚠️ Sessão salva ilegível ({path}), ignorando.")
+        return None
+
+
+def salvar_sessao(state: dict, path: str | None = None) -> bool:
+    """
+    Grava o storage_state de forma atômica e só legível pelo usuário (tem os cookies da conta).
+    Temporário único por chamada (vários workers logando juntos não disputam o mesmo arquivo).
+    Falha ao gravar só avisa: o login já deu certo, só não vai ser reaproveitado.
+    """
+    if not REUSAR_SESSAO:
+        return False
+    path = path or SESSAO_FILE
+    tmp = None
+    try:
+        ensure_dir(os.path.dirname(path) or ".")
+        # mkstemp já cria com permissão 0600
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".",
+                                   suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+        return True
+    except Exception as e:
+        print(f"⚠️ Não consegui salvar a sessão em {path}: {e}")
+        if tmp:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+        return False
+
+
+def descartar_sessao(path: str | None = None):
+    try:
+        os.remove(path or SESSAO_FILE)
+    except FileNotFoundError:
+        pass
+
+
+def sessao_expirada(page) -> bool:
+    """Sessão caiu = voltou a aparecer o campo de senha (ou a URL é de login)."""
+    try:
+        if "login" in (page.url or "").lower():
+            return True
+        return page.locator(SEL_SENHA).first.is_visible()
+    except Exception:
+        return True
+
+
+def sessao_ativa(page) -> bool:
+    """
+    Checagem barata na página já aberta: uma única espera pelo que aparecer primeiro
+    (menu do app = logado, campo de senha = sessão recusada).
+    """
+    wait_locator(page.locator(f"{SEL_SENHA}, {SEL_LOGADO}").first, "sessao")
+    if sessao_expirada(page):
+        return False
+    try:
+        return page.locator(SEL_LOGADO).first.is_visible()
+    except Exception:
+        return False
+
+
+@cronometrar("login")
+def fazer_login(page, email: str | None = None, senha: str | None = None, sessao_file: str | None = None):
+    """Login com EMAIL/SENHA (ou a conta informada); pula o formulário se a sessão salva for aceita."""
+    email = email or EMAIL
+    senha = senha or SENHA
+    print("🌐 Abrindo site...")
+    navegar(page, BASE_URL)
+
+    if sessao_ativa(page):
+        contar("login.sessao_reusada")
+        print("✅ Sessão salva aceita, pulando o formulário de login.")
+        return
+    if carregar_sessao(sessao_file) is not None:
+        print("🔐 Sessão salva recusada pelo site.")
+        descartar_sessao(sessao_file)
+
+    wait_network_idle(page, "site")
+    print("🔐 Fazendo login...")
+    try:
+        page.wait_for_selector(SEL_SENHA, timeout=25000)
+    except PlaywrightTimeoutError:
+        falha_diagnostico(page, "login_sem_password")
+        raise RuntimeError("Não encontrei o campo de senha na tela de login.")
+
+    for sel in SEL_EMAIL:
+        email_input = page.locator(sel).first
+        if email_input.count() > 0:
+            break
+
+    pass_input = page.locator(SEL_SENHA).first
+
+    if email_input.count() == 0 or pass_input.count() == 0:
+        falha_diagnostico(page, "login_seletores")
+        raise RuntimeError("Não encontrei campos de login (email/senha). Ajuste os seletores.")
+
+    safe_click(email_input, "campo email")
+    email_input.press("Control+A")
+    email_input.type(email, delay=20)
+
+    safe_click(pass_input, "campo senha")
+    pass_input.press("Control+A")
+    pass_input.type(senha, delay=20)
+
+    btn_login = page.locator(SEL_BTN_LOGIN).first
+    if btn_login.count() > 0:
+        safe_click(btn_login, "botão login", retries=6, timeout=15000)
+    else:
+        pass_input.press("Enter")
+
+    # logado = campo de senha saiu da tela; depois espera a SPA assentar
+    wait_locator(page.locator(SEL_SENHA).first, "login", state="detached")
+    wait_network_idle(page, "login")
+    print("✅ Pós-login URL:", page.url)
+    contar("login.formulario")
+    if REUSAR_SESSAO and not sessao_expirada(page):
+        try:
+            salvar_sessao(page.context.storage_state(), sessao_file)
+        except Exception as e:
+            print(f"⚠️ Não consegui ler a sessão para salvar: {e}")
+
+
+def capturar_periodo_em_lotes(page, data_inicio: str, data_fim: str, lote: int | None = None):
+    """Como capturar_periodo, mas gera lotes normalizados conforme o my_table vai sendo lido."""
+    lote = lote or STREAM_LOTE
+    if CAPTURA_REDE:
+        # o JSON da XHR já chega inteiro: só fatia (capturar_periodo já abre o passo de diagnóstico)
+        df = capturar_periodo(page, data_inicio, data_fim)
+        for i in range(0, len(df), lote):
+            yield df.iloc[i:i + lote]
+        return
+
+    diag_periodo(page, data_inicio, data_fim)
+    apply_period_and_group(page, data_inicio, data_fim)
+    print("📊 Capturando tabela (DIV my_table) em lotes...")
+    try:
+        for bruto in iterar_my_table(page, lote):
+            arquivar_bruto(bruto, data_inicio, data_fim, "dom")
+            yield normalizar_report(bruto)
+    except TabelaVazia:
+        print(f"⚠️ Sem linhas em {data_inicio} -> {data_fim}.")
+
+
+def capturar_periodo(page, data_inicio: str, data_fim: str) -> pd.DataFrame:
+    """Com a página já no Report: aplica o período, agrupa e devolve o lote normalizado."""
+    diag_periodo(page, data_inicio, data_fim)
+    origem = "dom"
+    if CAPTURA_REDE:
+        apply_period(page, data_inicio, data_fim)
+        before = my_table_signature(page)
+        df = capture_via_network(page)
+        origem = "rede"
+        if df is None:
+            print("⚠️ Resposta do report não vista na rede, usando captura do DOM.")
+            wait_grid_ready(page, data_inicio, data_fim, before)
+            df = capture_grid_my_table(page)
+            origem = "dom"
+    else:
+        apply_period_and_group(page, data_inicio, data_fim)
+        df = capture_grid_my_table(page)
+    arquivar_bruto(df, data_inicio, data_fim, origem)
+    return normalizar_report(df)
+
+
+# ==============================
+# 🧮 Range coalescido (vários dias por Group)
+# ==============================
+
+def planejar_janelas(inicio: str, fim: str, dias_max: int = JANELA_MAX_DIAS) -> list[tuple[datetime, datetime]]:
+    """Quebra [inicio, fim] (DD/MM/YYYY) em janelas de até dias_max dias sem atravessar a virada do mês."""
+    cur = parse_ddmmyyyy(inicio)
+    end = parse_ddmmyyyy(fim)
+    janelas = []
+    while cur <= end:
+        prox_mes = (cur.replace(day=28) + pd.Timedelta(days=4)).replace(day=1)
+        w_end = min(end, cur + pd.Timedelta(days=max(1, dias_max) - 1), prox_mes - pd.Timedelta(days=1))
+        janelas.append((cur, w_end))
+        cur = w_end + pd.Timedelta(days=1)
+    return janelas
+
+
+def dias_da_janela(ini: datetime, fim: datetime) -> list[str]:
+    return [d.strftime("%Y-%m-%d") for d in pd.date_range(ini, fim, freq="D")]
+
+
+def dias_sem_linha(ini: datetime, fim: datetime, capturados) -> list[str]:
+    """Dias (YYYY-MM-DD) de [ini, fim] que não vieram numa captura completa (vão para sem_dados no histórico)."""
+    return [d for d in dias_da_janela(ini, fim) if d not in capturados]
+
+
+def capturar_janela_verificada(page, ini: datetime, fim: datetime) -> tuple[pd.DataFrame, list[str], bool]:
+    """
+    Captura a janela inteira num Group e confere se veio uma linha por dia.
+    Só quebra ao meio se a tabela vier truncada (TabelaTruncada: menos linhas que o total da paginação,
+    que iterar_my_table já percorre página a página): recaptura só as metades com buraco.
+    Dia sem linha numa tabela completa é "sem dados" (o site não mostra dia zerado) e não quebra a janela.
+    Devolve (df, dias_sem_linha, houve_split).
+    """
+    ini, fim = pd.Timestamp(ini).normalize(), pd.Timestamp(fim).normalize()
+    try:
+        df = capturar_periodo(page, ini.strftime("%d/%m/%Y"), fim.strftime("%d/%m/%Y"))
+        truncada = False
+    except TabelaTruncada as e:
+        if ini == fim:
+            raise
+        print(f"⚠️ {e}")
+        df, truncada = None, True
+
+    if df is not None and not df.empty:
+        df = df[(df["Time"] >= ini) & (df["Time"] <= fim)]
+        got = set(df["Time"].dt.strftime("%Y-%m-%d"))
+    else:
+        got = set()
+
+    faltando = dias_sem_linha(ini, fim, got)
+    if not truncada or not faltando or ini == fim:
+        return (df if df is not None else pd.DataFrame(columns=COLUNAS_ALVO)), faltando, False
+
+    print(f"ℹ️ Tabela truncada em {ini:%d/%m/%Y} -> {fim:%d/%m/%Y} ({len(faltando)} dia(s) sem linha), "
+          "quebrando a janela.")
+    meio = ini + pd.Timedelta(days=(fim - ini).days // 2)
+    frames = [df]
+    faltando_final = []
+    for h_ini, h_fim in ((ini, meio), (meio + pd.Timedelta(days=1), fim)):
+        h_dias = set(dias_da_janela(h_ini, h_fim))
+        if not h_dias.intersection(faltando):
+            continue
+        sub_df, sub_falt, _ = capturar_janela_verificada(page, h_ini, h_fim)
+        frames.append(sub_df)
+        faltando_final += sub_falt
+
+    return combinar_lotes(frames), faltando_final, True
+
+
+def capturar_range_coalescido(inicio: str, fim: str, dias_max: int = JANELA_MAX_DIAS,
+                              blocos: list[tuple[str, str]] | None = None) -> pd.DataFrame:
+    """
+    Range em poucas queries: pede janelas de até dias_max dias (por mês) numa sessão única.
+    Cada janela truncada é quebrada só ali (capturar_janela_verificada); as próximas continuam com dias_max.
+    blocos: sub-períodos (DD/MM/YYYY) a capturar em vez de [inicio, fim] inteiro (ex.: só dias pendentes).
+    """
     if not EMAIL or not SENHA:
         raise RuntimeError("EMAIL/SENHA não definidos.")
 
+    frames = []
+    sem_dados = []
+    falhas = []
+    n_queries = 0
+    n_quebradas = 0
+
     with sync_playwright() as p:
-        browser = p.chromium.launch(headless=HEADLESS)
+        browser, context, page = abrir_navegador(p)
 
-        context = browser.new_context(
-            viewport={"width": 1600, "height": 900},
-            locale="pt-BR",
-        )
-        page = context.new_page()
+        fazer_login(page)
+        goto_report(page)
 
-        print("🌐 Abrindo site...")
-        page.goto(BASE_URL, wait_until="domcontentloaded")
-        page.wait_for_timeout(1200)
+        blocos = blocos if blocos is not None else [(inicio, fim)]
+        pendentes = [j for b_ini, b_fim in blocos for j in planejar_janelas(b_ini, b_fim, dias_max)]
+        while pendentes:
+            ini, w_fim = pendentes.pop(0)
+            print(f"\n=== Capturando janela {ini:%d/%m/%Y} -> {w_fim:%d/%m/%Y} ===")
+            try:
+                df_w, faltando, split = capturar_janela_verificada(page, ini, w_fim)
+            except Exception as e:
+                print(f"❌ Erro {ini:%d/%m/%Y} -> {w_fim:%d/%m/%Y}: {e}")
+                falhas.append(f"{ini:%d/%m/%Y}-{w_fim:%d/%m/%Y}")
+                try:
+                    page.keyboard.press("Escape")
+                    goto_report(page)
+                except Exception:
+                    pass
+                continue
+            n_queries += 1
+
+            n_quebradas += int(split)
+
+            frames.append(df_w)
+            sem_dados += faltando
+            print(f"✅ {len(df_w)} linha(s); sem linha: {len(faltando)} dia(s).")
+
+        url = page.url
+        context.close()
+        browser.close()
 
-        print("🔐 Fazendo login...")
-        try:
-            page.wait_for_selector("input[type='password']", timeout=25000)
-        except PlaywrightTimeoutError:
-            page.screenshot(path="erro_login_sem_password.png", full_page=True)
-            raise RuntimeError("Não encontrei o campo de senha na tela de login.")
-
-        email_input = page.locator("input[type='email']").first
-        if email_input.count() == 0:
-            email_input = page.locator("input[name='email']").first
-        if email_input.count() == 0:
-            email_input = page.locator("input[type='text']").first
-
-        pass_input = page.locator("input[type='password']").first
-
-        if email_input.count() == 0 or pass_input.count() == 0:
-            page.screenshot(path="erro_login_seletores.png", full_page=True)
-            raise RuntimeError("Não encontrei campos de login (email/senha). Ajuste os seletores.")
-
-        safe_click(email_input, "campo email")
-        email_input.press("Control+A")
-        email_input.type(EMAIL, delay=20)
-
-        safe_click(pass_input, "campo senha")
-        pass_input.press("Control+A")
-        pass_input.type(SENHA, delay=20)
-
-        btn_login = page.locator("button:has-text('Login'), button:has-text('Entrar'), button:has-text('Sign in')").first
-        if btn_login.count() > 0:
-            safe_click(btn_login, "botão login", retries=6, timeout=15000)
-        else:
-            pass_input.press("Enter")
+    return finalizar_lote(combinar_lotes(frames), meta={
+        "start": inicio,
+        "end": fim,
+        "url": url,
+        "janelas": n_queries,
+        "janela_dias": dias_max,
+        "janelas_quebradas": n_quebradas,
+        "sem_dados": sem_dados,
+        "falhas": falhas,
+    })
 
-        page.wait_for_timeout(1500)
-        print("✅ Pós-login URL:", page.url)
 
-        goto_report(page)
+def capturar_report_7k(so_datas: bool = False):
+    """
+    Captura DATA_INICIO..DATA_FIM em lotes (Sheets e histórico recebem cada lote assim que chega).
+    Devolve o DataFrame normalizado (Time + métricas). so_datas=True devolve só a coluna Time e não
+    guarda os lotes na memória (os valores ficam no histórico). Se a captura cair no meio, os lotes já
+    gravados ficam e a execução é marcada como parcial no histórico.
+    """
+    if not EMAIL or not SENHA:
+        raise RuntimeError("EMAIL/SENHA não definidos.")
 
-        apply_period_and_group(page, DATA_INICIO, DATA_FIM)
+    with sync_playwright() as p:
+        browser, context, page = abrir_navegador(p)
 
-        df = capture_grid_my_table(page)
+        fazer_login(page)
+        goto_report(page)
 
-        if df is None or df.empty:
-            print("⚠️ Sem dados retornados.")
-            dump_json_history(pd.DataFrame(), meta={
-                "start": DATA_INICIO, "end": DATA_FIM, "url": page.url, "ts": datetime.now().isoformat()
+        # ✅ UPSERT e histórico lote a lote: o Sheets e o SQLite recebem as linhas enquanto o resto da
+        # tabela ainda está sendo lido (meta fechada no fim, com as métricas); com so_datas, na memória
+        # ficam só as datas
+        stats = {}
+        sem_dados = []
+        completo, erro = False, None
+        hist = HistoricoLotes(meta={"start": DATA_INICIO, "end": DATA_FIM}, guardar_linhas=not so_datas)
+        writer = SheetsUpsertBuffer(SHEET_ID, SHEET_TAB, max_rows=STREAM_LOTE)
+        try:
+            for lote in capturar_periodo_em_lotes(page, DATA_INICIO, DATA_FIM):
+                writer.add(lote)
+                hist.add(lote)
+            # só com a captura completa os dias sem linha contam como "sem dados"
+            sem_dados = dias_sem_linha(parse_ddmmyyyy(DATA_INICIO), parse_ddmmyyyy(DATA_FIM), hist.chaves)
+            stats = writer.close()
+            completo = True
+        except Exception as e:
+            erro = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if not completo:
+                # o que já foi para o Sheets antes da falha (flushes automáticas)
+                stats = dict(writer.totais)
+            if hist.preview.empty:
+                print("⚠️ Sem dados retornados.")
+            else:
+                print_preview(hist.preview)
+            df = hist.close(meta={
+                "start": DATA_INICIO,
+                "end": DATA_FIM,
+                "url": page.url,
+                "ts": datetime.now().isoformat(),
+                "sheets": stats,
+                "sem_dados": sem_dados,
+                "parcial": not completo,
+                "erro": erro,
+                "esperas": resumo_esperas(),
+                "rede": resumo_rede(),
             })
-            context.close()
-            browser.close()
-            return df
-
-        # ✅ normaliza Time como datetime
-        df = normalize_time_column(df, "Time")
-
-        # ✅ Converte numéricos por coluna
-        numeric_cols = [c for c in COLUNAS_ALVO if c != "Time"]
-        for c in numeric_cols:
-            df[c] = df[c].apply(parse_number)
-            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0.0)
-
-        # Inteiros “naturais”
-        int_cols = ["Registrations", "FTDs", "QFTDs, CPA"]
-        for c in int_cols:
-            if c in df.columns:
-                df[c] = df[c].fillna(0).astype(int)
-
-        # ✅ garante somente as colunas do script e na ordem
-        for c in COLUNAS_ALVO:
-            if c not in df.columns:
-                df[c] = None
-        df = df[COLUNAS_ALVO].copy()
-
-        # dedup dentro do lote (se vier duplicado do site)
-        df["_TimeSort"] = df["Time"]
-        df = df.drop_duplicates(subset=["Time"], keep="last").sort_values("_TimeSort", ascending=True).drop(columns=["_TimeSort"])
-
-        print("✅ Preview:")
-        df_preview = df.copy()
-        df_preview["Time"] = df_preview["Time"].dt.strftime("%Y-%m-%d")
-        print(df_preview.head(20))
+        if not df.empty:
+            print(f"✅ Sheets atualizado por UPSERT: {stats.get('updated', 0)} atualizada(s), "
+                  f"{stats.get('appended', 0)} nova(s), {stats.get('unchanged', 0)} sem mudança.")
 
-        dump_json_history(df, meta={
-            "start": DATA_INICIO,
-            "end": DATA_FIM,
-            "url": page.url,
-            "ts": datetime.now().isoformat(),
-            "rows": int(len(df)),
-        })
+        context.close()
+        browser.close()
+        return df
 
-        # ✅ UPSERT (não bug-a visualização / não recria tudo)
-        upsert_sheet_by_time(df, SHEET_ID, SHEET_TAB)
 
+def capturar_range_7k(dias: list[str]) -> pd.DataFrame:
+    """
+    Modo range: UM navegador, UM login e UMA ida ao Report para todos os dias.
+    Para cada dia só repete datepicker -> Group -> captura.
+    No final faz um único dump JSON e um único UPSERT com o lote combinado.
+    """
+    if not EMAIL or not SENHA:
+        raise RuntimeError("EMAIL/SENHA não definidos.")
+    if not dias:
+        return pd.DataFrame(columns=COLUNAS_ALVO)
+
+    frames = []
+    falhas = []
+    sem_dados = []
+
+    with sync_playwright() as p:
+        browser, context, page = abrir_navegador(p)
+
+        fazer_login(page)
+        goto_report(page)
+
+        for day in dias:
+            print(f"\n=== Capturando {day} (sessão única) ===")
+            try:
+                df_day = capturar_periodo(page, day, day)
+            except Exception as e:
+                print(f"❌ Erro {day}: {e}")
+                falhas.append(day)
+                # tenta voltar para um estado limpo do Report antes do próximo dia
+                try:
+                    page.keyboard.press("Escape")
+                    goto_report(page)
+                except Exception:
+                    pass
+                continue
+
+            if df_day is not None and not df_day.empty:
+                print(f"✅ OK {day}: {len(df_day)} linha(s).")
+                frames.append(df_day)
+            else:
+                print(f"⚠️ Sem dados em {day}.")
+                sem_dados += dias_sem_linha(parse_ddmmyyyy(day), parse_ddmmyyyy(day), ())
+
+        url = page.url
         context.close()
         browser.close()
+
+    meta = {
+        "start": dias[0],
+        "end": dias[-1],
+        "url": url,
+        "falhas": falhas,
+        "sem_dados": sem_dados,
+    }
+    return finalizar_lote(combinar_lotes(frames), meta)
+
+
+def combinar_lotes(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """Junta lotes já normalizados, deduplica por Time (último vence) e ordena."""
+    frames = [f for f in frames if f is not None and not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=COLUNAS_ALVO)
+    df = pd.concat(frames, ignore_index=True)
+    return df.drop_duplicates(subset=["Time"], keep="last").sort_values("Time", ascending=True).reset_index(drop=True)
+
+
+def finalizar_lote(df: pd.DataFrame, meta: dict) -> pd.DataFrame:
+    """Preview + um único dump JSON + um único UPSERT para o lote combinado."""
+    meta = {**meta, "ts": datetime.now().isoformat(), "rows": int(len(df)), "esperas": resumo_esperas(),
+            "rede": resumo_rede()}
+
+    if df.empty:
+        print("⚠️ Sem dados retornados no range.")
+        dump_json_history(pd.DataFrame(), meta=meta)
         return df
 
+    print_preview(df)
+    try:
+        upsert_sheet_by_time(df, SHEET_ID, SHEET_TAB)
+    finally:
+        dump_json_history(df, meta=meta)
+    return df
+
 
 if __name__ == "__main__":
-    capturar_report_7k()
+    capturar_report_7k(so_datas=True)
@@ -0,0 +1,51 @@
+"""
+Reprocessa o report 7k a partir do arquivo bruto (texto das células guardado a cada captura),
+sem abrir o navegador. Use quando uma regra de parse_number / datas mudar: normaliza de novo
+todos os dias do período numa passada só e refaz o UPSERT no Sheets + histórico.
+
+Uso:
+    python reprocessar_7k.py 01/01/2025 31/12/2025
+    python reprocessar_7k.py 01/01/2025 31/12/2025 --sem-sheets --csv exportacao/
+    python reprocessar_7k.py 01/01/2025 31/12/2025 --aba BET7K_A --db history_7k/historico_parceiro_a.sqlite3
+
+--csv grava bet7k_raw.csv (texto cru) e bet7k_processed.csv (normalizado) no diretório informado.
+"""
+import argparse
+import os
+
+import report_7k_partners as R
+
+
+def exportar_csv(destino: str, inicio: str, fim: str, df, db: str | None = None):
+    R.ensure_dir(destino)
+    bruto = R.carregar_brutos(inicio, fim, db)
+    raw_path = os.path.join(destino, "bet7k_raw.csv")
+    proc_path = os.path.join(destino, "bet7k_processed.csv")
+    bruto.to_csv(raw_path, index=False)
+
+    out = df.copy()
+    if not out.empty:
+        out["Time"] = out["Time"].dt.strftime("%Y-%m-%d")
+    out.to_csv(proc_path, index=False)
+    print(f"🧾 CSV: {raw_path} ({len(bruto)} linha(s)), {proc_path} ({len(out)} linha(s))")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Reprocessa o report 7k a partir do arquivo bruto, sem navegador.")
+    ap.add_argument("inicio", help="DD/MM/YYYY")
+    ap.add_argument("fim", help="DD/MM/YYYY")
+    ap.add_argument("--sem-sheets", action="store_true", help="não faz UPSERT no Sheets (só histórico/CSV)")
+    ap.add_argument("--aba", default=None, help=f"aba do Sheets (padrão: {R.SHEET_TAB})")
+    ap.add_argument("--db", default=None, help=f"SQLite do histórico (padrão: {R.HISTORY_DB})")
+    ap.add_argument("--csv", default=None, metavar="DIR", help="exporta bet7k_raw.csv e bet7k_processed.csv")
+    args = ap.parse_args(argv)
+
+    df = R.reprocessar_periodo(args.inicio, args.fim, sheets=not args.sem_sheets, tab_name=args.aba,
+                               history_db=args.db)
+    if args.csv:
+        exportar_csv(args.csv, args.inicio, args.fim, df, args.db)
+    return df
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,31 @@
 from datetime import datetime, timedelta
-import time
+import argparse
+import queue
+import threading
 import report_7k_partners as R
+from playwright.sync_api import sync_playwright
 
 # ✅ Use DD/MM/YYYY (igual o site)
 PERIODO_INICIO = "18/01/2026"
 PERIODO_FIM = "19/01/2026"
-INTERVALO_ESPERA = 10  # segundos
+# Sem pausa fixa entre datas: o ritmo vem do limite por minuto do report (R.SITE_REQ_POR_MIN / R.SHEETS_REQ_POR_MIN)
+
+# ✅ Modo de execução:
+# "sessao_unica" = um navegador/login para o período todo (R.capturar_range_7k)
+# "coalescido"   = sessão única pedindo até R.JANELA_MAX_DIAS dias por Group (quebra só janela truncada)
+# "shards"       = período dividido em janelas capturadas em paralelo (N navegadores isolados)
+# "async"        = sessão única assíncrona, UPSERT de cada dia em paralelo com o scraping
+# "por_dia"      = modo antigo, um capturar_report_7k() por dia
+MODO = "sessao_unica"
+
+# Shards (modo "shards")
+DIAS_POR_SHARD = 7      # tamanho de cada janela de datas
+MAX_CONCORRENCIA = 3    # quantos navegadores/contexts capturando ao mesmo tempo
+SHARD_RETRIES = 2       # novas tentativas por shard antes de desistir dele
+
+# ✅ Incremental: pula dias já assentados no histórico (ver R.HORIZONTE_ASSENTAMENTO_DIAS).
+# Para auditoria/recaptura completa: python rodar_range_7k.py --force
+INCREMENTAL = True
 
 
 def parse_ddmmyyyy(s: str) -> datetime:
@@ -25,11 +45,152 @@ def daterange(inicio: str, fim: str):
         cur += timedelta(days=1)
 
 
-def main():
-    fim_dt = parse_ddmmyyyy(PERIODO_FIM)
+def split_windows(inicio: str, fim: str, dias_por_shard: int) -> list[tuple[str, str]]:
+    """Divide [inicio, fim] em janelas (DD/MM/YYYY, DD/MM/YYYY) de até dias_por_shard dias."""
+    dias = list(daterange(inicio, fim))
+    step = max(1, int(dias_por_shard))
+    return [
+        (fmt_ddmmyyyy(dias[i]), fmt_ddmmyyyy(dias[min(i + step, len(dias)) - 1]))
+        for i in range(0, len(dias), step)
+    ]
+
+
+# ==============================
+# 🧵 Shards em paralelo
+# ==============================
+
+def shard_worker(worker_id: int, fila: queue.Queue, resultados: list, sem_dados: list, falhas: list,
+                 lock: threading.Lock):
+    """
+    Cada worker tem seu próprio Playwright/navegador/context (a API sync não é compartilhável entre threads),
+    faz login uma vez e consome janelas da fila. Falha de um shard volta para a fila até SHARD_RETRIES.
+    """
+    with sync_playwright() as p:
+        browser, context, page = R.abrir_navegador(p)
+        try:
+            R.fazer_login(page)
+            R.goto_report(page)
+        except Exception as e:
+            print(f"❌ [w{worker_id}] Falha no login/Report: {e}")
+            context.close()
+            browser.close()
+            return
+
+        while True:
+            try:
+                inicio, fim, tentativa = fila.get_nowait()
+            except queue.Empty:
+                break
+
+            print(f"\n=== [w{worker_id}] Shard {inicio} -> {fim} (tentativa {tentativa + 1}) ===")
+            try:
+                df, faltando, _ = R.capturar_janela_verificada(page, parse_ddmmyyyy(inicio), parse_ddmmyyyy(fim))
+                with lock:
+                    resultados.append(df)
+                    sem_dados.extend(faltando)
+                n = 0 if df is None else len(df)
+                print(f"✅ [w{worker_id}] OK {inicio} -> {fim}: {n} linha(s).")
+            except Exception as e:
+                print(f"❌ [w{worker_id}] Erro {inicio} -> {fim}: {e}")
+                if tentativa < SHARD_RETRIES:
+                    fila.put((inicio, fim, tentativa + 1))
+                else:
+                    with lock:
+                        falhas.append(f"{inicio}-{fim}")
+                try:
+                    page.keyboard.press("Escape")
+                    R.goto_report(page)
+                except Exception:
+                    pass
+            finally:
+                fila.task_done()
+
+        context.close()
+        browser.close()
+
+
+def capturar_shards(inicio: str, fim: str, dias_por_shard: int = DIAS_POR_SHARD, concorrencia: int = MAX_CONCORRENCIA,
+                    blocos: list[tuple[str, str]] | None = None):
+    if not R.EMAIL or not R.SENHA:
+        raise RuntimeError("EMAIL/SENHA não definidos.")
+
+    blocos = blocos if blocos is not None else [(inicio, fim)]
+    janelas = [j for b_ini, b_fim in blocos for j in split_windows(b_ini, b_fim, dias_por_shard)]
+    fila = queue.Queue()
+    for ini, f in janelas:
+        fila.put((ini, f, 0))
+
+    resultados = []
+    sem_dados = []
+    falhas = []
+    lock = threading.Lock()
+
+    n_workers = max(1, min(int(concorrencia), len(janelas)))
+    print(f"\n=== {len(janelas)} shard(s) de até {dias_por_shard} dia(s), {n_workers} navegador(es) em paralelo ===")
+
+    threads = [
+        threading.Thread(target=shard_worker, args=(i, fila, resultados, sem_dados, falhas, lock), daemon=True)
+        for i in range(n_workers)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # se todos os workers morreram no login, o que sobrou na fila também é falha
+    while not fila.empty():
+        ini, f, _ = fila.get_nowait()
+        falhas.append(f"{ini}-{f}")
+
+    df = R.combinar_lotes(resultados)
+    return R.finalizar_lote(df, meta={
+        "start": inicio,
+        "end": fim,
+        "shards": len(janelas),
+        "concorrencia": n_workers,
+        "falhas": falhas,
+        "sem_dados": sorted(sem_dados),
+    })
+
+
+# ==============================
+# ▶️ Modos
+# ==============================
+
+def _resultado(df):
+    if df is not None and not df.empty:
+        print(f"✅ OK: {len(df)} linha(s) no total.")
+    else:
+        print("⚠️ Sem dados no período.")
+
+    print("\n=== Finalizado ===")
+
+
+def main_coalescido(dias: list[str]):
+    blocos = R.agrupar_contiguos(dias)
+    print(f"\n=== Rodando captura coalescida: {len(dias)} dia(s) em {len(blocos)} bloco(s) ===")
+    _resultado(R.capturar_range_coalescido(PERIODO_INICIO, PERIODO_FIM, blocos=blocos))
+
 
-    for d in daterange(PERIODO_INICIO, PERIODO_FIM):
-        day = fmt_ddmmyyyy(d)
+def main_shards(dias: list[str]):
+    _resultado(capturar_shards(PERIODO_INICIO, PERIODO_FIM, blocos=R.agrupar_contiguos(dias)))
+
+
+def main_async(dias: list[str]):
+    import asyncio
+    import report_7k_async as RA
+
+    print(f"\n=== Rodando pipeline async: {dias[0]} -> {dias[-1]} ({len(dias)} dia(s)) ===")
+    _resultado(asyncio.run(RA.capturar_range_async([(d, d) for d in dias])))
+
+
+def main_sessao_unica(dias: list[str]):
+    print(f"\n=== Rodando captura em sessão única: {dias[0]} -> {dias[-1]} ({len(dias)} dia(s)) ===")
+    _resultado(R.capturar_range_7k(dias))
+
+
+def main_por_dia(dias: list[str]):
+    for day in dias:
         print(f"\n=== Rodando captura para {day} ===")
 
         # Ajusta datas no módulo do report
@@ -37,7 +198,7 @@ def main():
         R.DATA_FIM = day
 
         try:
-            df = R.capturar_report_7k()
+            df = R.capturar_report_7k(so_datas=True)
             if df is not None and not df.empty:
                 print(f"✅ OK {day}: {len(df)} linha(s).")
             else:
@@ -45,13 +206,33 @@ def main():
         except Exception as e:
             print(f"❌ Erro {day}: {e}")
 
-        # ✅ Evita comparar string vs string (pode dar ruim em outros formatos)
-        if d.date() != fim_dt.date():
-            print(f"Aguardando {INTERVALO_ESPERA}s para a próxima data...")
-            time.sleep(INTERVALO_ESPERA)
-
     print("\n=== Finalizado ===")
 
 
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Captura o report 7k para um período.")
+    ap.add_argument("--force", action="store_true", help="recaptura todos os dias, mesmo os já assentados")
+    args = ap.parse_args(argv)
+
+    if INCREMENTAL:
+        dias = R.dias_pendentes(PERIODO_INICIO, PERIODO_FIM, force=args.force)
+    else:
+        dias = [fmt_ddmmyyyy(d) for d in daterange(PERIODO_INICIO, PERIODO_FIM)]
+
+    if not dias:
+        print("✅ Nada para capturar: todos os dias do período já estão assentados.")
+        return None
+
+    if MODO == "coalescido":
+        return main_coalescido(dias)
+    if MODO == "shards":
+        return main_shards(dias)
+    if MODO == "async":
+        return main_async(dias)
+    if MODO == "sessao_unica":
+        return main_sessao_unica(dias)
+    return main_por_dia(dias)
+
+
 if __name__ == "__main__":
     main()
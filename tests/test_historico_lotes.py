@@ -0,0 +1,42 @@
+"""HistoricoLotes: contrato do retorno (linhas ou só datas) e execução interrompida marcada como parcial."""
+import json
+
+import pandas as pd
+
+import historico_7k as H
+import report_7k_partners as R
+
+
+def lote(inicio: str, n: int) -> pd.DataFrame:
+    df = pd.DataFrame({c: [1.0] * n for c in R.COLUNAS_ALVO})
+    df["Time"] = pd.date_range(inicio, periods=n)
+    return df
+
+
+def metas(db: str) -> list[dict]:
+    conn = H.abrir(db)
+    try:
+        return [json.loads(m) for (m,) in conn.execute("SELECT meta FROM runs ORDER BY id")]
+    finally:
+        conn.close()
+
+
+def test_guardar_linhas_devolve_lotes_normalizados(tmp_path, monkeypatch):
+    monkeypatch.setattr(R, "JSON_DIR", str(tmp_path))
+    db = str(tmp_path / "h.sqlite3")
+    hist = R.HistoricoLotes(history_db=db, latest_path=str(tmp_path / "latest.json"), guardar_linhas=True)
+    hist.add(lote("2026-01-01", 3))
+    hist.add(lote("2026-01-04", 2))
+    df = hist.close(meta={"metricas": None})
+    assert list(df.columns) == R.COLUNAS_ALVO and len(df) == 5
+    assert metas(db)[-1]["parcial"] is False
+
+
+def test_so_datas_e_parcial(tmp_path, monkeypatch):
+    monkeypatch.setattr(R, "JSON_DIR", str(tmp_path))
+    db = str(tmp_path / "h.sqlite3")
+    hist = R.HistoricoLotes(history_db=db, latest_path=str(tmp_path / "latest.json"))
+    hist.add(lote("2026-01-01", 3))
+    df = hist.close(meta={"metricas": None, "parcial": True, "erro": "TabelaTruncada: x"})
+    assert list(df.columns) == ["Time"] and len(df) == 3
+    assert metas(db)[-1]["parcial"] is True and metas(db)[-1]["rows"] == 3
@@ -0,0 +1,33 @@
+"""Dia capturado sem linha conta como capturado para o assentamento (não é recapturado a cada execução)."""
+from datetime import datetime, timedelta
+
+import historico_7k as H
+import report_7k_partners as R
+
+
+def test_dia_sem_dados_assenta(tmp_path, monkeypatch):
+    monkeypatch.setattr(R, "HISTORY_DB", str(tmp_path / "h.sqlite3"))
+    dia = (datetime.now() - timedelta(days=20)).replace(hour=0, minute=0, second=0, microsecond=0)
+    ddmm, iso = dia.strftime("%d/%m/%Y"), dia.strftime("%Y-%m-%d")
+    assert R.dias_pendentes(ddmm, ddmm) == [ddmm]
+
+    conn = H.abrir(R.HISTORY_DB)
+    try:
+        H.gravar_lote(conn, [], {"sem_dados": [iso]}, captured_at=datetime.now().isoformat())
+    finally:
+        conn.close()
+    assert R.dias_pendentes(ddmm, ddmm) == []
+
+
+def test_dia_com_valor_sai_de_sem_dados(tmp_path):
+    conn = H.abrir(str(tmp_path / "h.sqlite3"))
+    try:
+        H.gravar_sem_dados(conn, ["2026-01-01", "2026-01-02"], "2026-01-10T00:00:00")
+        H.gravar_valores(conn, [{"Time": "2026-01-01", "Registrations": 1.0}], "2026-01-11T00:00:00")
+        # dia que já tem valor não volta a ser marcado
+        assert H.gravar_sem_dados(conn, ["2026-01-01"], "2026-01-12T00:00:00") == 0
+        assert conn.execute("SELECT time FROM sem_dados").fetchall() == [("2026-01-02",)]
+        assert H.ultima_captura_por_dia(conn) == {"2026-01-01": "2026-01-11T00:00:00",
+                                                  "2026-01-02": "2026-01-10T00:00:00"}
+    finally:
+        conn.close()
@@ -0,0 +1,27 @@
+"""Jobs da mesma conta compartilham login: credenciais divergentes são rejeitadas no spec."""
+import json
+
+import pytest
+
+import multi_contas_7k as M
+
+
+def _spec(tmp_path, jobs):
+    path = tmp_path / "spec.json"
+    path.write_text(json.dumps({"jobs": jobs}), encoding="utf-8")
+    return str(path)
+
+
+def _job(**kw):
+    return {"conta": "a", "email": "a@x.com", "senha": "s", "aba": "A",
+            "inicio": "01/01/2026", "fim": "31/01/2026", **kw}
+
+
+def test_mesma_conta_mesmas_credenciais(tmp_path):
+    jobs, _ = M.carregar_spec(_spec(tmp_path, [_job(), _job(aba="B"), _job(conta="b", email="b@x.com")]))
+    assert [len(v) for v in M.agrupar_por_conta(jobs).values()] == [2, 1]
+
+
+def test_mesma_conta_credenciais_diferentes(tmp_path):
+    with pytest.raises(ValueError, match="Job 1"):
+        M.carregar_spec(_spec(tmp_path, [_job(), _job(aba="B", email="outro@x.com")]))
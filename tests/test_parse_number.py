@@ -0,0 +1,25 @@
+"""Números do JSON (captura via rede) não podem passar pela adivinhação de separador de milhar."""
+import pandas as pd
+
+import report_7k_partners as R
+
+
+def test_parse_number_mantem_numeros():
+    assert R.parse_number(1.234) == 1.234
+    assert R.parse_number(-0.125) == -0.125
+    assert R.parse_number(1e-05) == 1e-05
+    assert R.parse_number("1,412") == 1412.0
+
+
+def test_parse_number_series_mista():
+    s = pd.Series([1.234, -0.125, 1e-05, "1,412", "$-2,335.21", None, 7], dtype=object)
+    out = R.parse_number_series(s).tolist()
+    assert out[:5] == [1.234, -0.125, 1e-05, 1412.0, -2335.21]
+    assert pd.isna(out[5]) and out[6] == 7.0
+
+
+def test_report_json_to_df_preserva_valores():
+    payload = {"data": [{"date": "2026-01-01", "registrations": 3, "ftds": 1, "qftds": 1,
+                         "ftds_amount": 1.234, "deposits_amount": -0.125, "revshare": 1e-05, "cpa": "1,500.00"}]}
+    df = R.normalizar_report(R.report_json_to_df(payload))
+    assert df.iloc[0][["FTDs Amount", "Deposits Amount", "RevShare", "CPA"]].tolist() == [1.234, -0.125, 1e-05, 1500.0]
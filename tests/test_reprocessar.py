@@ -0,0 +1,32 @@
+"""Reprocessar o arquivo bruto não pode "recapturar" o dia: ele segue pendente se foi capturado antes de assentar."""
+from datetime import datetime, timedelta
+
+import historico_7k as H
+import report_7k_partners as R
+
+
+def test_reprocessar_mantem_captured_at_original(tmp_path, monkeypatch):
+    monkeypatch.setattr(R, "JSON_DIR", str(tmp_path))
+    monkeypatch.setattr(R, "JSON_LATEST", str(tmp_path / "latest.json"))
+    monkeypatch.setattr(R, "HISTORY_DB", str(tmp_path / "h.sqlite3"))
+    dia = (datetime.now() - timedelta(days=20)).replace(hour=0, minute=0, second=0, microsecond=0)
+    ddmm, iso = dia.strftime("%d/%m/%Y"), dia.strftime("%Y-%m-%d")
+    capturado = (dia + timedelta(days=1)).isoformat()
+
+    conn = H.abrir(R.HISTORY_DB)
+    try:
+        linha = [ddmm, "1", "1", "1", "10.00", "20.00", "0.50", "0"]
+        H.gravar_bruto(conn, R.COLUNAS_ALVO, [linha], iso, iso, captured_at=capturado)
+        H.gravar_lote(conn, [{"Time": iso, "Registrations": 1.0}], {}, captured_at=capturado)
+    finally:
+        conn.close()
+    assert R.dias_pendentes(ddmm, ddmm) == [ddmm]
+
+    df = R.reprocessar_periodo(ddmm, ddmm, sheets=False)
+    assert len(df) == 1
+    assert R.dias_pendentes(ddmm, ddmm) == [ddmm]
+    conn = H.abrir(R.HISTORY_DB)
+    try:
+        assert H.ultima_captura_por_dia(conn) == {iso: capturado}
+    finally:
+        conn.close()
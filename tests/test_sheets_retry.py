@@ -0,0 +1,73 @@
+"""Retry da Sheets API: append não é idempotente, então não pode ser reenviado em 5xx/queda de rede."""
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+import report_7k_partners as R
+
+
+class ReqFalhaUmaVez:
+    """Request fake do googleapiclient: a 1ª execute() falha com `status`, as seguintes respondem `resp`."""
+
+    def __init__(self, status: int, resp: dict):
+        self.status = status
+        self.resp = resp
+        self.body = "{}"
+        self.chamadas = 0
+
+    def execute(self):
+        self.chamadas += 1
+        if self.chamadas == 1:
+            raise HttpError(httplib2.Response({"status": self.status}), b"erro do servidor")
+        return self.resp
+
+
+class ServiceFake:
+    def __init__(self, req):
+        self.req = req
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def append(self, **kwargs):
+        return self.req
+
+
+@pytest.fixture(autouse=True)
+def sem_espera(monkeypatch):
+    monkeypatch.setitem(R.LIMITES, "sheets", R.TokenBucket("sheets", 0))
+    monkeypatch.setattr(R, "RETRY_BASE_S", 0)
+    monkeypatch.setattr(R.time, "sleep", lambda s: None)
+
+
+def test_append_com_5xx_nao_e_reenviado(tmp_path, monkeypatch):
+    monkeypatch.setattr(R, "ROW_INDEX_DIR", str(tmp_path))
+    req = ReqFalhaUmaVez(503, {"updates": {"updatedRange": "'BET7K'!A2:H2"}})
+    buf = R.SheetsUpsertBuffer("planilha", "BET7K")
+    buf._time_to_row = {}
+
+    with pytest.raises(HttpError):
+        buf._append(ServiceFake(req), [[45658, 1, 2, 3, 1.0, 2.0, 3.0, 4.0]], ["2025-01-01"])
+    assert req.chamadas == 1
+
+
+def test_executar_sheets_append_nao_repete_5xx():
+    req = ReqFalhaUmaVez(503, {})
+    with pytest.raises(HttpError):
+        R.executar_sheets(req, "values.append")
+    assert req.chamadas == 1
+
+
+def test_append_repete_em_quota():
+    req = ReqFalhaUmaVez(429, {"ok": True})
+    assert R.executar_sheets(req, "values.append") == {"ok": True}
+    assert req.chamadas == 2
+
+
+def test_leitura_repete_5xx():
+    req = ReqFalhaUmaVez(503, {"valueRanges": []})
+    assert R.executar_sheets(req, "values.batchGet") == {"valueRanges": []}
+    assert req.chamadas == 2
@@ -0,0 +1,101 @@
+"""UPSERT contra o stand-in da Sheets API (bench/fake_sheets): contagens, flushes e índice Time->linha."""
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import report_7k_partners as R
+from bench.fake_sheets import iniciar_fake_sheets, sheets_service_local
+
+EXISTENTES = 30  # dias 01/01/2025.. já na planilha (valores zerados)
+
+
+@pytest.fixture
+def srv(tmp_path, monkeypatch):
+    srv = iniciar_fake_sheets(R.SHEET_TAB, R.COLUNAS_ALVO, linhas_existentes=EXISTENTES)
+    monkeypatch.setattr(R, "_SHEETS_SERVICE", sheets_service_local(srv))
+    monkeypatch.setattr(R, "ROW_INDEX_DIR", str(tmp_path))
+    monkeypatch.setitem(R.LIMITES, "sheets", R.TokenBucket("sheets", 0))
+    R.invalidate_sheet_ids()
+    yield srv
+    R.invalidate_sheet_ids()
+    srv.shutdown()
+
+
+def lote(inicio: datetime, n: int, valor: float = 1.0) -> pd.DataFrame:
+    df = pd.DataFrame({c: [valor] * n for c in R.COLUNAS_ALVO})
+    df["Time"] = pd.date_range(inicio, periods=n)
+    return df
+
+
+def requests(srv) -> int:
+    return sum(v["requests"] for v in srv.stats.values())
+
+
+def test_upsert_acima_de_max_rows_conta_tudo(srv):
+    stats = R.upsert_sheet_by_time(lote(datetime(2025, 1, 1) + pd.Timedelta(days=EXISTENTES), 600),
+                                   R.SHEET_ID, R.SHEET_TAB)
+    assert stats == {"unchanged": 0, "updated": 0, "appended": 600}
+    assert len(srv.planilha.abas[R.SHEET_TAB]) == 1 + EXISTENTES + 600
+
+
+def test_buffer_flush_automatico_entra_nos_totais(srv):
+    buf = R.SheetsUpsertBuffer(R.SHEET_ID, R.SHEET_TAB, max_rows=10, max_seconds=float("inf"))
+    buf.add(lote(datetime(2025, 1, 1), 12))       # 12 existentes: flush automática (atualiza)
+    assert not buf._pending and buf.totais["updated"] == 12
+    buf.add(lote(datetime(2025, 1, 25), 9))       # 6 existentes + 3 novas: abaixo do limite, fica pendente
+    assert len(buf._pending) == 9
+    assert buf.close() == {"unchanged": 0, "updated": 18, "appended": 3}
+
+
+def test_diff_so_envia_o_que_mudou(srv):
+    buf = R.SheetsUpsertBuffer(R.SHEET_ID, R.SHEET_TAB)
+    buf.add(lote(datetime(2025, 1, 1), 5))
+    buf.flush()
+    srv.stats.clear()
+
+    df = lote(datetime(2025, 1, 1), 5)
+    df.loc[2, "Registrations"] = 9
+    buf.add(df)
+    assert buf.flush() == {"unchanged": 4, "updated": 1, "appended": 0}
+    # 1 batchGet (sondagem + linhas-alvo) + 1 batchUpdate só com a célula alterada
+    assert requests(srv) == 2
+    assert srv.planilha.abas[R.SHEET_TAB][3][R.COLUNAS_ALVO.index("Registrations")] == 9
+
+
+def test_indice_local_reaproveitado_entre_execucoes(srv):
+    R.upsert_sheet_by_time(lote(datetime(2025, 1, 1), 3), R.SHEET_ID, R.SHEET_TAB)
+    assert R.load_row_index(R.SHEET_ID, R.SHEET_TAB)["2025-01-01"] == 2
+    srv.stats.clear()
+
+    R.upsert_sheet_by_time(lote(datetime(2025, 1, 1), 3, valor=2.0), R.SHEET_ID, R.SHEET_TAB)
+    # o preparo sonda o índice salvo em vez de reler a coluna A inteira
+    assert srv.stats["values.batchGet"]["requests"] == 2
+
+
+def test_indice_com_drift_e_reconstruido(srv):
+    R.upsert_sheet_by_time(lote(datetime(2025, 1, 1), 3), R.SHEET_ID, R.SHEET_TAB)
+    # linha inserida por fora no topo: todas as datas descem uma linha
+    grid = srv.planilha.abas[R.SHEET_TAB]
+    grid.insert(1, [45000] + [0] * (len(R.COLUNAS_ALVO) - 1))
+
+    df = lote(datetime(2025, 1, 2), 1, valor=7.0)
+    assert R.upsert_sheet_by_time(df, R.SHEET_ID, R.SHEET_TAB)["updated"] == 1
+    linha = R.load_row_index(R.SHEET_ID, R.SHEET_TAB)["2025-01-02"]
+    assert linha == 4 and grid[linha - 1][1] == 7.0
+
+
+def test_token_bucket_rajada_e_taxa(monkeypatch):
+    agora = [100.0]
+    monkeypatch.setattr(R.time, "monotonic", lambda: agora[0])
+    balde = R.TokenBucket("teste", por_minuto=60, capacidade=2)
+    assert [balde.reservar() for _ in range(2)] == [0.0, 0.0]
+    assert balde.reservar() == pytest.approx(1.0)   # sem token: 1 req/s
+    agora[0] += 5
+    assert balde.reservar() == 0.0                  # repôs (até a capacidade)
+    balde.segurar(3)
+    assert balde.reservar() == pytest.approx(3.0)
+
+
+def test_token_bucket_sem_limite():
+    assert R.TokenBucket("livre", 0).reservar() == 0.0